@@ -54,7 +54,12 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'login.authentication.UsuarioJWTAuthentication',
-    )
+    ),
+    # Mismos bytes que el JSONRenderer de DRF, con orjson si esta instalado.
+    'DEFAULT_RENDERER_CLASSES': (
+        'login.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 MIDDLEWARE = [
@@ -66,6 +71,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'login.auditoria.AuditoriaMiddleware',
 ]
 CORS_ALLOWED_ORIGINS = [
     "http://192.168.1.50:8081",
@@ -95,8 +101,69 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Kivo_Asistencia.wsgi.application'
 
+# Cache local por proceso. Con varios workers conviene un backend compartido para que
+# las invalidaciones (p. ej. del mapa de autorizacion) se vean en todos los procesos.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "kivo",
+    },
+    # Respuestas de empresas y turnos (ver login/cache_referencia.py). Con
+    # REFERENCIA_CACHE_DIR se usa un cache en archivos compartido por los procesos del host.
+    "referencia": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ["REFERENCIA_CACHE_DIR"],
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+    if os.environ.get("REFERENCIA_CACHE_DIR")
+    else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "kivo-referencia",
+    },
+}
+REFERENCIA_CACHE_TIMEOUT = 3600
+# Segundos que se reutiliza el mapa empresa -> rol de un usuario. Con el LocMemCache
+# de "default" es tambien la demora maxima con que los otros workers ven un cambio de
+# empresas del usuario (ver login/autorizacion.py).
+AUTORIZACION_CACHE_TIMEOUT = 60
+# Segundos que cada proceso confia en la version de token cacheada antes de releerla.
+TOKEN_VERSION_TTL = 30
+# Escritura de auditoria con buffer por proceso (ver login/auditoria.py).
+# MODO "sincrono" vuelve a insertar cada registro en el momento.
+AUDITORIA = {
+    "MODO": os.environ.get("AUDITORIA_MODO", "buffer"),
+    "TAMANO_LOTE": 200,
+    "INTERVALO_SEGUNDOS": 5,
+    "DURABLE": False,
+    "SPOOL_DIR": BASE_DIR / "auditoria_spool",
+}
+# Segundos tras los que un reporte en "procesando" se da por abandonado y
+# procesar_reportes lo vuelve a tomar (ver login/reportes.py).
+REPORTES_TIMEOUT_SEGUNDOS = 2 * 3600
+# Segundos tras los que una importacion de usuarios en "procesando" se da por
+# abandonada y queda en error (ver login/importacion.py).
+IMPORTACIONES_TIMEOUT_SEGUNDOS = 2 * 3600
+# Segundos sin avance tras los que una verificacion de marcas en "procesando" se da
+# por abandonada y verify_marcas --pendientes la reanuda (ver login/verificacion.py).
+VERIFICACION_TIMEOUT_SEGUNDOS = 30 * 60
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Descarga de archivos de MEDIA_ROOT (ver login/descargas.py). Con MODO "nginx" se
+# necesita una location interna que apunte a MEDIA_ROOT, p. ej.:
+#   location /media-protegido/ { internal; alias /ruta/a/media/; }
+# MODO "sendfile" usa X-Sendfile (Apache mod_xsendfile, lighttpd).
+DESCARGAS = {
+    "MODO": os.environ.get("DESCARGAS_MODO", "django"),
+    "PREFIJO_INTERNO": "/media-protegido/",
+    "FIRMA_SEGUNDOS": 3600,
+}
+# Archivo de marcas antiguas en archivos columnares por empresa y mes (ver
+# login/archivo_marcas.py y el comando archivar_marcas).
+ARCHIVO_MARCAS = {
+    "DIRECTORIO": os.environ.get("ARCHIVO_MARCAS_DIR", str(BASE_DIR / "archivo_marcas")),
+    "MESES_VIGENTES": 13,
+}
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -1,18 +1,22 @@
 from django.contrib import admin
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from django.conf import settings
-from django.conf.urls.static import static
 
 from login.views import (
     MyTokenObtainPairView,
+    MyTokenRefreshView,
     AsistenciasListView,
+    ExportarAsistenciasView,
     TrabajadorProfileView,
+    MarcasTrabajadorView,
     TrabajadoresPorEmpresaView,
     AsistenciasView,
+    SincronizarMarcasView,
     AprobacionLicenciaView,
     LicenciasView,
+    DocumentoLicenciaView,
+    LicenciaArchivoView,
     CrearUsuarioView,
+    ImportarUsuariosView,
     ActualizarUsuarioView,
     TurnoPorEmpresaView,
     EmpresaListView,
@@ -20,19 +24,39 @@ from login.views import (
     VacacionesView,
     AprobacionVacacionesView,
     AuditoriaListView,
+    ExportarAuditoriaView,
     UsuariosEmpresaListView,
+    DirectorioUsuariosView,
+    ReporteJobView,
+    ReporteArchivoView,
+    VerificacionMarcasView,
+    PruebaInclusionMarcaView,
+    RaicesMerkleView,
+    CierrePeriodoView,
+    NominaEmpresaView,
 )
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/token/", MyTokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/refresh/", MyTokenRefreshView.as_view(), name="token_refresh"),
     path("api/asistencias/", AsistenciasListView.as_view(), name="asistencias_list"),
+    path("api/asistencias/exportar/", ExportarAsistenciasView.as_view(), name="asistencias_exportar"),
     path("api/trabajadores/<int:pk>/perfil/", TrabajadorProfileView.as_view(), name="trabajador_perfil"),
+    path("api/trabajadores/<int:pk>/marcas/", MarcasTrabajadorView.as_view(), name="trabajador_marcas"),
     path("api/asistencias/marcar/", AsistenciasView.as_view(), name="asistencias_marcar"),
+    path("api/asistencias/sincronizar/", SincronizarMarcasView.as_view(), name="asistencias_sincronizar"),
     path("api/licencias/", LicenciasView.as_view(), name="licencias"),
+    path(
+        "api/licencias/documentos/<str:sha256>/",
+        DocumentoLicenciaView.as_view(),
+        name="licencias_documento",
+    ),
+    path("api/licencias/<int:pk>/archivo/", LicenciaArchivoView.as_view(), name="licencia_archivo"),
     path("api/licencias/<int:pk>/resolver/", AprobacionLicenciaView.as_view(), name="licencias_resolver"),
     path("api/rrhh/usuarios/crear/", CrearUsuarioView.as_view()),
+    path("api/rrhh/usuarios/importar/", ImportarUsuariosView.as_view()),
+    path("api/rrhh/usuarios/importar/<int:pk>/", ImportarUsuariosView.as_view()),
     path("api/rrhh/usuarios/<int:pk>/actualizar/", ActualizarUsuarioView.as_view()),
     path("api/empresas/", EmpresaListView.as_view()),
     path("api/empresas/asignadas/", EmpresaAsignadaListView.as_view()),
@@ -42,10 +66,22 @@ urlpatterns = [
         name="trabajadores_por_empresa",
     ),
     path("api/empresas/<int:empresa_id>/turnos/", TurnoPorEmpresaView.as_view()),
+    path("api/empresas/<int:empresa_id>/cierre/", CierrePeriodoView.as_view(), name="cierre_periodo"),
+    path("api/empresas/<int:empresa_id>/nomina/", NominaEmpresaView.as_view(), name="nomina_empresa"),
     path("api/vacaciones/", VacacionesView.as_view()),
     path("api/vacaciones/<int:pk>/resolver/", AprobacionVacacionesView.as_view()),
     path("api/auditoria/", AuditoriaListView.as_view()),
+    path("api/auditoria/exportar/", ExportarAuditoriaView.as_view(), name="auditoria_exportar"),
     path("api/usuarios/", UsuariosEmpresaListView.as_view(), name="usuarios_empresa"),
+    path("api/usuarios/directorio/", DirectorioUsuariosView.as_view(), name="usuarios_directorio"),
+    path("api/reportes/", ReporteJobView.as_view(), name="reportes"),
+    path("api/reportes/<int:pk>/", ReporteJobView.as_view(), name="reporte_estado"),
+    path("api/reportes/<int:pk>/archivo/", ReporteArchivoView.as_view(), name="reporte_archivo"),
+    path("api/marcas/verificaciones/", VerificacionMarcasView.as_view(), name="verificaciones_marcas"),
+    path("api/marcas/verificaciones/<int:pk>/", VerificacionMarcasView.as_view(), name="verificacion_marcas"),
+    path("api/marcas/<int:pk>/prueba/", PruebaInclusionMarcaView.as_view(), name="marca_prueba_inclusion"),
+    path("api/empresas/<int:empresa_id>/raices-merkle/", RaicesMerkleView.as_view(), name="raices_merkle"),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# MEDIA_ROOT no se publica: licencias y reportes se descargan por las vistas
+# LicenciaArchivoView y ReporteArchivoView, que validan el acceso.
@@ -0,0 +1,512 @@
+"""
+Archivo de marcas antiguas fuera de la tabla Marcas.
+
+Cada mes local cerrado de una empresa se guarda en un archivo columnar
+<DIRECTORIO>/<empresa_id>/<AAAA-MM>.<sha>.kma. Las filas van ordenadas por (timestamp, id).
+Las columnas de ancho fijo quedan sin comprimir para leerlas con mmap sin copiarlas:
+- id: int64
+- timestamp: int64, microsegundos UTC
+- trabajador_id: int64, -1 si es nulo
+- tipo: uint8
+- hash: 32 bytes, el SHA-256 original en binario
+
+Las claves de idempotencia, de largo variable y casi nunca leidas, van comprimidas con
+zlib. PeriodoArchivado dice que archivo vale para cada (empresa, mes). El archivo y el
+borrado de las filas se confirman en la misma transaccion. Las filas de un trabajador
+que se cambio de empresa no se mueven de archivo: TrabajadorArchivado.empresa dice a que
+empresa pertenecen y los filtros por empresa lo respetan.
+
+Los listados de marcas y la exportacion combinan estas filas con las de la tabla (ver
+KeysetPagination y ExportarAsistenciasView), asi que la API no cambia para el cliente.
+Los resumenes diarios (ResumenDiario.recalcular, recalcular_resumen_diario), el libro
+de asistencia (reportes.datos_lote) y el cierre (motor_asistencia.calcular_periodo)
+tambien las leen, para no perder los dias de un mes archivado.
+Los datos del trabajador se leen de Trabajador al responder, igual que con el join.
+"""
+
+import heapq
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import groupby
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import versiones
+from .models import EstadoJornada, Marcas, PeriodoArchivado, Trabajador, TrabajadorArchivado
+
+MAGICO = b"KMA1"
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+TIPOS = ("entrada", "salida")
+COLUMNAS = (("id", "<i8", 8), ("timestamp", "<i8", 8), ("trabajador_id", "<i8", 8), ("tipo", "u1", 1), ("hash", "u1", 32))
+MAX_ABIERTOS = 256
+
+
+def configuracion():
+    return {"DIRECTORIO": str(settings.BASE_DIR / "archivo_marcas"), "MESES_VIGENTES": 13, **getattr(settings, "ARCHIVO_MARCAS", {})}
+
+
+def ruta_absoluta(relativa):
+    return os.path.join(configuracion()["DIRECTORIO"], relativa)
+
+
+def a_microsegundos(momento):
+    return (momento - EPOCA) // timedelta(microseconds=1)
+
+
+def desde_microsegundos(valor):
+    return EPOCA + timedelta(microseconds=int(valor))
+
+
+def corte_vigente(meses=None):
+    """
+    Inicio del mes local mas antiguo que se mantiene en la tabla (el actual y los
+    MESES_VIGENTES - 1 anteriores). archivar_periodo no archiva desde ahi en adelante,
+    asi que ResumenDiario.recalcular no consulta el archivo para fechas posteriores.
+    Por lo mismo MESES_VIGENTES solo se puede bajar: al subirlo, los meses ya archivados
+    quedarian despues del corte y los resumenes dejarian de verlos.
+    """
+    if meses is None:
+        meses = configuracion()["MESES_VIGENTES"]
+    hoy = timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - meses
+    return rango_mes(indice // 12, indice % 12 + 1)[0]
+
+
+def rango_mes(anio, mes):
+    """[inicio, fin) del mes local."""
+    tz = timezone.get_current_timezone()
+    siguiente = date(anio + mes // 12, mes % 12 + 1, 1)
+    return (
+        timezone.make_aware(datetime.combine(date(anio, mes, 1), time.min), tz),
+        timezone.make_aware(datetime.combine(siguiente, time.min), tz),
+    )
+
+
+def _alinear(posicion):
+    return (posicion + 7) & ~7
+
+
+def escribir(ruta, filas):
+    """
+    Escribe `filas` [(id, timestamp, trabajador_id, tipo_marca, hash, clave_idempotencia)],
+    ya ordenadas por (timestamp, id). Escribe un temporal y lo renombra.
+    Devuelve (sha256, tamano) del archivo.
+    """
+    n = len(filas)
+    hashes = b"".join(bytes.fromhex(f[4]) for f in filas)
+    if len(hashes) != n * 32:
+        raise ValueError("Hay hashes que no son SHA-256 en hexadecimal.")
+    columnas = {
+        "id": np.fromiter((f[0] for f in filas), "<i8", n),
+        "timestamp": np.fromiter((a_microsegundos(f[1]) for f in filas), "<i8", n),
+        "trabajador_id": np.fromiter((-1 if f[2] is None else f[2] for f in filas), "<i8", n),
+        "tipo": np.fromiter((TIPOS.index(f[3]) for f in filas), "u1", n),
+        "hash": np.frombuffer(hashes, "u1"),
+    }
+    claves = zlib.compress(json.dumps([f[5] for f in filas], separators=(",", ":")).encode("utf-8"), 9)
+
+    desplazamientos = {}
+    posicion = 0
+    for nombre, _, ancho in COLUMNAS:
+        desplazamientos[nombre] = posicion
+        posicion = _alinear(posicion + n * ancho)
+    cabecera = json.dumps(
+        {
+            "version": 1,
+            "filas": n,
+            "columnas": desplazamientos,
+            "claves": [posicion, len(claves)],
+        }
+    ).encode("utf-8")
+    inicio_datos = _alinear(8 + len(cabecera))
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as destino:
+
+            def escribir_bloque(datos, hasta=None):
+                digest.update(datos)
+                destino.write(datos)
+                if hasta is not None and destino.tell() < hasta:
+                    relleno = b"\0" * (hasta - destino.tell())
+                    digest.update(relleno)
+                    destino.write(relleno)
+
+            escribir_bloque(MAGICO + struct.pack("<I", len(cabecera)) + cabecera, inicio_datos)
+            for nombre, _, _ in COLUMNAS:
+                escribir_bloque(columnas[nombre].tobytes(), inicio_datos + _alinear(desplazamientos[nombre] + columnas[nombre].nbytes))
+            escribir_bloque(claves)
+            destino.flush()
+            os.fsync(destino.fileno())
+            tamano = destino.tell()
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return digest.hexdigest(), tamano
+
+
+class ArchivoMarcas:
+    """Lectura de un archivo .kma con mmap: las columnas son vistas de numpy sobre el mapa."""
+
+    def __init__(self, ruta):
+        with open(ruta, "rb") as origen:
+            self._mapa = mmap.mmap(origen.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:4] != MAGICO:
+            raise ValueError(f"{ruta} no es un archivo de marcas")
+        largo = struct.unpack_from("<I", self._mapa, 4)[0]
+        self.cabecera = json.loads(self._mapa[8 : 8 + largo])
+        self.filas = n = self.cabecera["filas"]
+        inicio = _alinear(8 + largo)
+        for nombre, tipo, ancho in COLUMNAS:
+            vista = np.frombuffer(self._mapa, tipo, n * (ancho if tipo == "u1" and ancho > 1 else 1),
+                                  inicio + self.cabecera["columnas"][nombre])
+            setattr(self, nombre, vista.reshape(n, ancho) if nombre == "hash" else vista)
+        self._inicio = inicio
+
+    def tramo(self, inicio=None, fin=None):
+        """(a, b): posiciones con inicio <= timestamp < fin."""
+        a = int(np.searchsorted(self.timestamp, a_microsegundos(inicio), "left")) if inicio else 0
+        b = int(np.searchsorted(self.timestamp, a_microsegundos(fin), "left")) if fin else self.filas
+        return a, max(a, b)
+
+    def antes_de(self, a, b, valor, ultimo_id):
+        """Recorta el tramo a las filas con (timestamp, id) < (valor, ultimo_id)."""
+        us = a_microsegundos(valor)
+        igual = int(np.searchsorted(self.timestamp, us, "left"))
+        mayor = int(np.searchsorted(self.timestamp, us, "right"))
+        corte = igual + int(np.count_nonzero(self.id[igual:mayor] < ultimo_id))
+        return a, max(a, min(b, corte))
+
+    def posiciones(self, a, b, trabajador_id=None, trabajadores=None):
+        seleccion = np.ones(b - a, dtype=bool)
+        if trabajador_id is not None:
+            seleccion &= self.trabajador_id[a:b] == trabajador_id
+        if trabajadores is not None:
+            seleccion &= np.isin(self.trabajador_id[a:b], trabajadores)
+        return a + np.flatnonzero(seleccion)
+
+    def fila(self, i):
+        """(id, timestamp, trabajador_id, tipo_marca, hash)"""
+        trabajador_id = int(self.trabajador_id[i])
+        return (
+            int(self.id[i]),
+            desde_microsegundos(self.timestamp[i]),
+            None if trabajador_id < 0 else trabajador_id,
+            TIPOS[self.tipo[i]],
+            self.hash[i].tobytes().hex(),
+        )
+
+    def claves(self):
+        posicion, largo = self.cabecera["claves"]
+        return json.loads(zlib.decompress(self._mapa[self._inicio + posicion : self._inicio + posicion + largo]))
+
+    def todas(self):
+        """Filas completas en el formato de escribir()."""
+        return [(*self.fila(i), clave) for i, clave in zip(range(self.filas), self.claves())]
+
+
+@lru_cache(maxsize=MAX_ABIERTOS)
+def _abrir(ruta, sha256):
+    return ArchivoMarcas(ruta)
+
+
+def abrir(periodo):
+    # El sha en la clave hace que un archivo reescrito se vuelva a mapear.
+    return _abrir(ruta_absoluta(periodo.archivo), periodo.sha256)
+
+
+@dataclass
+class Filtro:
+    """
+    Equivalente de los filtros de marcas_autorizadas(); empresas=None no restringe por
+    empresa. `trabajadores` limita a varios trabajadores a la vez (lotes de reportes).
+    """
+
+    empresas: list | None = None
+    trabajador_id: int | None = None
+    trabajadores: list | None = None
+    inicio: datetime | None = None
+    fin: datetime | None = None
+
+
+def periodos(filtro):
+    """
+    Periodos que pueden tener marcas del filtro, cada uno con `movidos`: {trabajador_id:
+    empresa_id} de sus trabajadores que hoy pertenecen a otra empresa.
+    """
+    qs = PeriodoArchivado.objects.all()
+    if filtro.empresas is not None:
+        qs = qs.filter(Q(empresa_id__in=filtro.empresas) | Q(trabajadores__empresa_id__in=filtro.empresas))
+    if filtro.trabajador_id is not None:
+        qs = qs.filter(trabajadores__trabajador_id=filtro.trabajador_id)
+    if filtro.trabajadores is not None:
+        qs = qs.filter(trabajadores__trabajador_id__in=filtro.trabajadores)
+    if filtro.inicio:
+        local = timezone.localtime(filtro.inicio)
+        qs = qs.filter(Q(anio__gt=local.year) | Q(anio=local.year, mes__gte=local.month))
+    if filtro.fin:
+        local = timezone.localtime(filtro.fin - timedelta(microseconds=1))
+        qs = qs.filter(Q(anio__lt=local.year) | Q(anio=local.year, mes__lte=local.month))
+    resultado = list(qs.distinct().order_by("anio", "mes", "empresa_id"))
+
+    movidos = {}
+    if resultado:
+        for periodo_id, trabajador_id, empresa_id in (
+            TrabajadorArchivado.objects.filter(periodo__in=[periodo.id for periodo in resultado])
+            .exclude(empresa_id=F("periodo__empresa_id"))
+            .values_list("periodo_id", "trabajador_id", "empresa_id")
+        ):
+            movidos.setdefault(periodo_id, {})[trabajador_id] = empresa_id
+    for periodo in resultado:
+        periodo.movidos = movidos.get(periodo.id, {})
+    return resultado
+
+
+def _filas_periodo(periodo, filtro, cursor=None):
+    archivo = abrir(periodo)
+    a, b = archivo.tramo(filtro.inicio, filtro.fin)
+    if cursor:
+        a, b = archivo.antes_de(a, b, *cursor)
+    trabajadores = None if filtro.trabajadores is None else np.asarray(filtro.trabajadores, dtype=np.int64)
+    posiciones = archivo.posiciones(a, b, filtro.trabajador_id, trabajadores)
+    if filtro.empresas is not None and periodo.movidos:
+        trabajador_filas = archivo.trabajador_id[posiciones]
+        empresa_filas = np.full(len(posiciones), periodo.empresa_id, dtype=np.int64)
+        for trabajador_id, empresa_id in periodo.movidos.items():
+            empresa_filas[trabajador_filas == trabajador_id] = empresa_id
+        posiciones = posiciones[np.isin(empresa_filas, filtro.empresas)]
+    return archivo, posiciones
+
+
+def pagina(filtro, cursor, limite):
+    """
+    Hasta `limite` marcas archivadas anteriores a `cursor` (timestamp, id), en orden
+    (timestamp, id) descendente. Recorre los meses desde el mas reciente y se detiene
+    cuando un mes completo ya aporta las filas pedidas.
+    """
+    resultado = []
+    por_mes = groupby(reversed(periodos(filtro)), key=lambda p: (p.anio, p.mes))
+    for (anio, mes), grupo in por_mes:
+        if cursor and rango_mes(anio, mes)[0] > cursor[0]:
+            continue
+        for periodo in grupo:
+            archivo, posiciones = _filas_periodo(periodo, filtro, cursor)
+            resultado.extend(archivo.fila(i) for i in posiciones[-limite:][::-1])
+        if len(resultado) >= limite:
+            break
+    resultado.sort(key=lambda fila: (fila[1], fila[0]), reverse=True)
+    return resultado[:limite]
+
+
+def iterar(filtro):
+    """Todas las marcas archivadas del filtro en orden (timestamp, id) ascendente, sin cargarlas en memoria."""
+    for _, grupo in groupby(periodos(filtro), key=lambda p: (p.anio, p.mes)):
+        fuentes = []
+        for periodo in grupo:
+            archivo, posiciones = _filas_periodo(periodo, filtro)
+            fuentes.append(archivo.fila(int(i)) for i in posiciones)
+        yield from heapq.merge(*fuentes, key=lambda fila: (fila[1], fila[0]))
+
+
+def columnas(filtro):
+    """
+    (trabajador_id, epoch en segundos, tipo) de las marcas archivadas del filtro como
+    arreglos de numpy, sin orden y sin las marcas sin trabajador: la entrada del motor
+    de cierre, que ordena por su cuenta. tipo es el indice en TIPOS (0 = entrada).
+    """
+    trabajadores, epochs, tipos = [], [], []
+    for periodo in periodos(filtro):
+        archivo, posiciones = _filas_periodo(periodo, filtro)
+        posiciones = posiciones[archivo.trabajador_id[posiciones] >= 0]
+        trabajadores.append(archivo.trabajador_id[posiciones])
+        epochs.append(archivo.timestamp[posiciones] // 1_000_000)
+        tipos.append(archivo.tipo[posiciones])
+    return (
+        np.concatenate(trabajadores or [np.empty(0, np.int64)]).astype(np.int64),
+        np.concatenate(epochs or [np.empty(0, np.int64)]).astype(np.int64),
+        np.concatenate(tipos or [np.empty(0, np.uint8)]).astype(np.int8),
+    )
+
+
+def buscar(marca_id, filtro):
+    """
+    (empresa_id, fila) de la marca archivada `marca_id` dentro del filtro, o None. Solo
+    abre los archivos cuyo rango de ids incluye la marca.
+    """
+    candidatos = [
+        periodo
+        for periodo in periodos(filtro)
+        if periodo.id_minimo is None or periodo.id_minimo <= marca_id <= periodo.id_maximo
+    ]
+    for periodo in candidatos:
+        archivo = abrir(periodo)
+        posiciones = np.flatnonzero(archivo.id == marca_id)
+        if len(posiciones):
+            fila = archivo.fila(int(posiciones[0]))
+            empresa_id = periodo.movidos.get(fila[2], periodo.empresa_id)
+            if filtro.trabajador_id is not None and fila[2] != filtro.trabajador_id:
+                continue
+            if filtro.empresas is not None and empresa_id not in filtro.empresas:
+                continue
+            return empresa_id, fila
+    return None
+
+
+def marcas_trabajador(trabajador_id, inicio, fin):
+    """
+    [(timestamp, id, tipo_marca)] archivadas del trabajador en [inicio, fin), en orden: se
+    mezclan con heapq.merge con las de la tabla para recalcular sus resumenes diarios.
+    """
+    filtro = Filtro(trabajador_id=trabajador_id, inicio=inicio, fin=fin)
+    return [(fila[1], fila[0], fila[3]) for fila in iterar(filtro)]
+
+
+_BASICOS = {"id": 0, "timestamp": 1, "trabajador_id": 2, "tipo_marca": 3, "hash": 4}
+
+
+def resolver(filas, campos, bloque=2000):
+    """
+    Tuplas con los valores de `campos` (nombres de values_list de Marcas) para filas
+    archivadas. Los campos trabajador__* se leen de Trabajador, una consulta por bloque.
+    """
+    relacionados = [campo.split("__", 1)[1] for campo in campos if campo.startswith("trabajador__")]
+    filas = iter(filas)
+    while True:
+        lote = [fila for _, fila in zip(range(bloque), filas)]
+        if not lote:
+            return
+        trabajadores = {}
+        if relacionados:
+            ids = {fila[2] for fila in lote if fila[2] is not None}
+            trabajadores = {
+                valores[0]: dict(zip(relacionados, valores[1:]))
+                for valores in Trabajador.objects.filter(id__in=ids).values_list("id", *relacionados)
+            }
+        for fila in lote:
+            datos = trabajadores.get(fila[2], {})
+            yield tuple(
+                fila[_BASICOS[campo]] if campo in _BASICOS else datos.get(campo.split("__", 1)[1])
+                for campo in campos
+            )
+        if len(lote) < bloque:
+            return
+
+
+@lru_cache(maxsize=None)
+def _tupla(campos):
+    return namedtuple("Fila", campos)
+
+
+def proyectar(filas, campos):
+    """Como resolver(), pero con filas iguales a values_list(*campos, named=True)."""
+    tipo = _tupla(tuple(campos))
+    return [tipo._make(valores) for valores in resolver(filas, campos)]
+
+
+def archivar_periodo(empresa_id, anio, mes, lote=1000):
+    """
+    Mueve las marcas de la empresa en el mes al archivo del periodo; si ya existia, se
+    reescribe con sus filas mas las nuevas. Devuelve el PeriodoArchivado, o None si la
+    tabla no tenia marcas de ese periodo. Solo archiva meses anteriores a corte_vigente().
+    """
+    inicio, fin = rango_mes(anio, mes)
+    if fin > corte_vigente():
+        raise ValueError(f"{anio}-{mes:02d} esta dentro de los meses vigentes y no se puede archivar")
+    nuevas = list(
+        Marcas.objects.filter(empresa_id=empresa_id, timestamp__gte=inicio, timestamp__lt=fin)
+        .order_by("timestamp", "id")
+        .values_list("id", "timestamp", "trabajador_id", "tipo_marca", "hash", "clave_idempotencia")
+    )
+    if not nuevas:
+        return None
+
+    anterior = PeriodoArchivado.objects.filter(empresa_id=empresa_id, anio=anio, mes=mes).first()
+    filas = nuevas
+    if anterior is not None:
+        ids = {fila[0] for fila in nuevas}
+        filas = sorted(
+            [fila for fila in abrir(anterior).todas() if fila[0] not in ids] + nuevas,
+            key=lambda fila: (fila[1], fila[0]),
+        )
+
+    base = os.path.join(str(empresa_id), f"{anio}-{mes:02d}")
+    temporal = ruta_absoluta(f"{base}.escribiendo.kma")
+    sha256, tamano = escribir(temporal, filas)
+    relativa = f"{base}.{sha256[:12]}.kma"
+    os.replace(temporal, ruta_absoluta(relativa))
+
+    # Antes de borrar se relee el archivo: si no devuelve exactamente lo esperado, no se borra nada.
+    copia = ArchivoMarcas(ruta_absoluta(relativa))
+    if [fila[:5] for fila in copia.todas()] != [
+        (f[0], f[1], f[2], f[3], f[4]) for f in filas
+    ]:
+        os.remove(ruta_absoluta(relativa))
+        raise ValueError(f"El archivo de {base} no coincide con las marcas leidas")
+
+    try:
+        with transaction.atomic():
+            periodo, _ = PeriodoArchivado.objects.update_or_create(
+                empresa_id=empresa_id,
+                anio=anio,
+                mes=mes,
+                defaults={
+                    "archivo": relativa,
+                    "sha256": sha256,
+                    "filas": len(filas),
+                    "tamano": tamano,
+                    "id_minimo": min(fila[0] for fila in filas),
+                    "id_maximo": max(fila[0] for fila in filas),
+                    "archivado_en": timezone.now(),
+                },
+            )
+            conteo = {}
+            for fila in filas:
+                if fila[2] is not None:
+                    conteo[fila[2]] = conteo.get(fila[2], 0) + 1
+            # Los trabajadores que se fueron a otra empresa conservan su reasignacion; los
+            # que traen filas nuevas de la tabla son de esta empresa.
+            empresas = dict(periodo.trabajadores.values_list("trabajador_id", "empresa_id"))
+            empresas.update({fila[2]: empresa_id for fila in nuevas})
+            periodo.trabajadores.all().delete()
+            TrabajadorArchivado.objects.bulk_create(
+                [
+                    TrabajadorArchivado(periodo=periodo, trabajador_id=t, empresa_id=empresas.get(t, empresa_id), filas=n)
+                    for t, n in conteo.items()
+                ]
+            )
+            ids = [fila[0] for fila in nuevas]
+            tabla = connection.ops.quote_name(Marcas._meta.db_table)
+            for i in range(0, len(ids), lote):
+                parte = ids[i : i + lote]
+                EstadoJornada.objects.filter(ultima_marca_id__in=parte).update(ultima_marca=None)
+                # DELETE directo: Marcas.delete() cargaria y enviaria signals fila por fila.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {tabla} WHERE id IN ({', '.join(['%s'] * len(parte))})", parte
+                    )
+            versiones.incrementar("marcas", empresa_id)
+    except BaseException:
+        if anterior is None or anterior.archivo != relativa:
+            os.remove(ruta_absoluta(relativa))
+        raise
+
+    if anterior is not None and anterior.archivo != relativa and os.path.exists(ruta_absoluta(anterior.archivo)):
+        os.remove(ruta_absoluta(anterior.archivo))
+    return periodo
@@ -0,0 +1,248 @@
+"""
+Escritura de AuditoriaCambio con buffer por proceso.
+
+Cada registro se agrega a un buffer en memoria y a un spool local (una linea JSON por
+registro, un archivo por proceso). El buffer se inserta con bulk_create al llegar a
+TAMANO_LOTE registros, al terminar el request si algun registro se pidio durable o
+paso INTERVALO_SEGUNDOS desde el ultimo vaciado, y en todo caso desde un temporizador
+a los INTERVALO_SEGUNDOS del primer registro pendiente (un worker sin requests no
+retiene registros). Si el proceso muere, el comando recuperar_auditoria reinserta el
+spool (la clave unica evita duplicados).
+
+Con MODO = "sincrono", o si el spool no se puede abrir, cada registro se inserta
+en el momento como antes.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditoriaCambio
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACION = {
+    "MODO": "buffer",
+    "TAMANO_LOTE": 200,
+    "INTERVALO_SEGUNDOS": 5,
+    "DURABLE": False,
+    "FSYNC": False,
+    "SPOOL_DIR": None,
+}
+
+CAMPOS = ("clave", "usuario_id", "empresa_id", "accion", "modelo_afectado", "registro_id", "motivo", "fecha")
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, "AUDITORIA", {})}
+
+
+def directorio_spool():
+    return str(configuracion()["SPOOL_DIR"] or os.path.join(settings.BASE_DIR, "auditoria_spool"))
+
+
+def _a_linea(entrada):
+    return json.dumps({**entrada, "fecha": entrada["fecha"].isoformat()}, ensure_ascii=False) + "\n"
+
+
+def leer_spool(ruta):
+    """Entradas de un archivo de spool; ignora una ultima linea incompleta."""
+    entradas = []
+    with open(ruta, encoding="utf-8") as archivo:
+        for linea in archivo:
+            try:
+                entrada = json.loads(linea)
+            except ValueError:
+                continue
+            entrada["fecha"] = parse_datetime(entrada["fecha"])
+            entradas.append(entrada)
+    return entradas
+
+
+def insertar(entradas):
+    """
+    Inserta en un solo bulk_create. Si falla por integridad, omite las claves que ya
+    existen (reinserciones desde el spool) e inserta el resto de a una; las que aun
+    fallan (p. ej. una FK invalida) se descartan y quedan completas en el log.
+    """
+    filas = [AuditoriaCambio(**{campo: entrada.get(campo) for campo in CAMPOS}) for entrada in entradas]
+    try:
+        with transaction.atomic():
+            AuditoriaCambio.objects.bulk_create(filas)
+        return
+    except IntegrityError:
+        pass
+    claves = [fila.clave for fila in filas]
+    existentes = set(AuditoriaCambio.objects.filter(clave__in=claves).values_list("clave", flat=True))
+    for fila, entrada in zip(filas, entradas):
+        if fila.clave in existentes:
+            continue
+        try:
+            with transaction.atomic():
+                AuditoriaCambio.objects.bulk_create([fila])
+        except IntegrityError:
+            if not AuditoriaCambio.objects.filter(clave=fila.clave).exists():
+                logger.exception("Registro de auditoria descartado: %s", _a_linea(entrada).strip())
+                continue
+        existentes.add(fila.clave)
+
+
+class EscritorAuditoria:
+    def __init__(self):
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._ultimo_vaciado = time.monotonic()
+        self._temporizador = None
+        self._spool = None
+        self.ruta_spool = os.path.join(directorio_spool(), f"auditoria-{self.pid}.jsonl")
+        try:
+            os.makedirs(os.path.dirname(self.ruta_spool), exist_ok=True)
+            if os.path.exists(self.ruta_spool):
+                # Restos de un proceso anterior con el mismo pid.
+                self._buffer = leer_spool(self.ruta_spool)
+            self._spool = open(self.ruta_spool, "a", encoding="utf-8")
+        except OSError:
+            logger.exception("No se pudo abrir el spool de auditoria; se escribira en modo sincrono.")
+        atexit.register(self._al_salir)
+
+    def _al_salir(self):
+        if os.getpid() == self.pid:
+            self.vaciar()
+
+    @property
+    def sincrono(self):
+        return self._spool is None or configuracion()["MODO"] == "sincrono"
+
+    def registrar(self, entrada):
+        if self.sincrono:
+            insertar([entrada])
+            return
+        conf = configuracion()
+        with self._lock:
+            self._spool.write(_a_linea(entrada))
+            self._spool.flush()
+            if conf["FSYNC"]:
+                os.fsync(self._spool.fileno())
+            self._buffer.append(entrada)
+            lleno = len(self._buffer) >= conf["TAMANO_LOTE"]
+            if not lleno:
+                self._programar_vaciado()
+        if lleno:
+            self.vaciar()
+        else:
+            self.vaciar_si_vencido()
+
+    def _programar_vaciado(self):
+        """Arranca el temporizador de vaciado si no hay uno pendiente. Requiere self._lock."""
+        if self._temporizador is not None:
+            return
+        self._temporizador = threading.Timer(configuracion()["INTERVALO_SEGUNDOS"], self._vaciar_programado)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    def _vaciar_programado(self):
+        with self._lock:
+            self._temporizador = None
+        try:
+            self.vaciar()
+        finally:
+            # Las conexiones de Django son por hilo: se cierra la que abrio el temporizador.
+            connections.close_all()
+        with self._lock:
+            if self._buffer:
+                # La base de datos fallo o llegaron registros durante el vaciado.
+                self._programar_vaciado()
+
+    def vaciar_si_vencido(self):
+        if self._buffer and time.monotonic() - self._ultimo_vaciado >= configuracion()["INTERVALO_SEGUNDOS"]:
+            self.vaciar()
+
+    def vaciar(self):
+        """Inserta el buffer completo. Si la base de datos falla, los registros quedan en buffer y spool."""
+        with self._lock:
+            if not self._buffer:
+                return
+            try:
+                insertar(self._buffer)
+            except DatabaseError:
+                logger.exception("No se pudo vaciar el buffer de auditoria (%d registros).", len(self._buffer))
+                return
+            self._buffer = []
+            self._ultimo_vaciado = time.monotonic()
+            if self._spool is not None:
+                self._spool.seek(0)
+                self._spool.truncate()
+
+    @property
+    def pendientes(self):
+        return len(self._buffer)
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+_local = threading.local()
+
+
+def escritor():
+    """Escritor del proceso actual (se recrea despues de un fork)."""
+    global _escritor
+    if _escritor is None or _escritor.pid != os.getpid():
+        with _escritor_lock:
+            if _escritor is None or _escritor.pid != os.getpid():
+                _escritor = EscritorAuditoria()
+    return _escritor
+
+
+def registrar(usuario_id, empresa_id, accion, modelo_afectado, registro_id, motivo=None, durable=None):
+    """
+    Encola un registro de auditoria. Dentro de una transaccion se encola al confirmarla,
+    asi una accion revertida no deja auditoria. `durable` (por defecto AUDITORIA["DURABLE"])
+    obliga a insertarlo antes de responder el request.
+    """
+    entrada = {
+        "clave": uuid.uuid4().hex,
+        "usuario_id": usuario_id,
+        "empresa_id": empresa_id,
+        "accion": accion,
+        "modelo_afectado": modelo_afectado,
+        "registro_id": registro_id,
+        "motivo": motivo,
+        "fecha": timezone.now(),
+    }
+    if durable is None:
+        durable = configuracion()["DURABLE"]
+
+    def encolar():
+        escritor().registrar(entrada)
+        if durable:
+            _local.durable = True
+
+    transaction.on_commit(encolar)
+
+
+class AuditoriaMiddleware:
+    """Al terminar cada request vacia el buffer si hubo registros durables o vencio el intervalo."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.durable = False
+        response = self.get_response(request)
+        if _escritor is not None:
+            if _local.durable:
+                escritor().vaciar()
+            else:
+                escritor().vaciar_si_vencido()
+        _local.durable = False
+        return response
@@ -1,15 +1,118 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from rest_framework_simplejwt.settings import api_settings
-from .models import Usuario
+from .models import Trabajador, Usuario
+
+# usuario_id -> (expira_en, token_version, estado). Cada proceso guarda su copia por
+# TOKEN_VERSION_TTL segundos: una revocacion tarda a lo mas eso en verse en los demas.
+_versiones = {}
+_versiones_lock = threading.Lock()
+MAX_VERSIONES = 10000
+
+
+def _ttl():
+    return getattr(settings, "TOKEN_VERSION_TTL", 30)
+
+
+def version_token(usuario_id):
+    """(token_version, estado) vigentes del usuario, o None si no existe."""
+    ahora = time.monotonic()
+    entrada = _versiones.get(usuario_id)
+    if entrada and entrada[0] > ahora:
+        return entrada[1], entrada[2]
+
+    datos = Usuario.objects.filter(pk=usuario_id).values_list("token_version", "estado").first()
+    if datos is None:
+        return None
+    with _versiones_lock:
+        if len(_versiones) >= MAX_VERSIONES:
+            _versiones.clear()
+        _versiones[usuario_id] = (ahora + _ttl(), *datos)
+    return datos
+
+
+def olvidar_version(*usuario_ids):
+    """Descarta la version cacheada en este proceso (tras revocar o bloquear)."""
+    with _versiones_lock:
+        for usuario_id in usuario_ids:
+            _versiones.pop(usuario_id, None)
+
+
+class UsuarioToken:
+    """
+    Usuario autenticado armado con los claims del JWT (id, rol, estado, trabajador_id).
+    La fila Usuario solo se lee si la vista pide un atributo que no viene en el token.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.id = self.pk = Usuario._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        self.rol = token["rol"]
+        self.estado = token["estado"]
+        self.trabajador_id = token.get("trabajador_id")
+        self.token_version = token["tv"]
+
+    @property
+    def is_active(self):
+        return self.estado == "activo"
+
+    @cached_property
+    def usuario(self):
+        return Usuario.objects.get(pk=self.id)
+
+    @cached_property
+    def trabajador(self):
+        if not self.trabajador_id:
+            return None
+        return Trabajador.objects.select_related("turno", "empresa").filter(pk=self.trabajador_id).first()
+
+    # La autorizacion por empresa solo necesita id, rol y trabajador_id.
+    mapa_autorizacion = Usuario.mapa_autorizacion
+    empresas_ids = Usuario.empresas_ids
+    tiene_acceso_empresa = Usuario.tiene_acceso_empresa
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return getattr(self.usuario, nombre)
+
+    def __str__(self):
+        return f"Usuario {self.id}"
+
 
 class UsuarioJWTAuthentication(JWTAuthentication):
     def get_user(self, validated_token):
         try:
-            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            user_id = Usuario._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
         except KeyError:
             raise InvalidToken("Token inválido: no contiene user_id")
+        except ValidationError:
+            raise InvalidToken("Token inválido: user_id mal formado")
+
+        if "tv" not in validated_token:
+            # Tokens emitidos antes de incluir los claims: se valida contra la base de datos.
+            return self._usuario_desde_bd(user_id)
+
+        vigente = version_token(user_id)
+        if vigente is None:
+            raise AuthenticationFailed("Usuario no encontrado", code="user_not_found")
+        token_version, estado = vigente
+        if estado != "activo":
+            raise AuthenticationFailed("Usuario inactivo o bloqueado", code="user_inactive")
+        if validated_token["tv"] != token_version:
+            raise AuthenticationFailed("Token revocado", code="token_revoked")
+
+        return UsuarioToken(validated_token)
 
+    def _usuario_desde_bd(self, user_id):
         try:
             user = Usuario.objects.get(pk=user_id)
         except Usuario.DoesNotExist:
@@ -0,0 +1,40 @@
+"""
+Versionado en cache del mapa de autorizacion (empresa_id -> rol) de cada usuario.
+El mapa se arma en Usuario.mapa_autorizacion(); aqui solo vive la llave versionada,
+que los signals incrementan cuando cambian EmpresaUsuario o la empresa del trabajador.
+
+La invalidacion solo llega a los procesos que comparten el cache por defecto. Con el
+LocMemCache de settings cada worker tiene su propia copia: los demas siguen usando el
+mapa anterior hasta AUTORIZACION_CACHE_TIMEOUT segundos, asi que quitar una empresa a un
+usuario puede tardar ese plazo en aplicarse. Con varios workers y necesidad de efecto
+inmediato, configurar CACHES["default"] con un backend compartido (Redis o Memcached).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIJO = "authz"
+
+
+def timeout():
+    return getattr(settings, "AUTORIZACION_CACHE_TIMEOUT", 60)
+
+
+def _clave_version(usuario_id):
+    return f"{PREFIJO}:version:{usuario_id}"
+
+
+def clave_mapa(usuario_id):
+    version = cache.get(_clave_version(usuario_id))
+    if version is None:
+        version = 1
+        cache.add(_clave_version(usuario_id), version, None)
+    return f"{PREFIJO}:mapa:{usuario_id}:{version}"
+
+
+def invalidar(*usuario_ids):
+    for usuario_id in usuario_ids:
+        try:
+            cache.incr(_clave_version(usuario_id))
+        except ValueError:
+            cache.set(_clave_version(usuario_id), 2, None)
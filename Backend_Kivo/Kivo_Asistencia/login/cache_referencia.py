@@ -0,0 +1,108 @@
+"""
+Cache de las respuestas de datos de referencia (empresas y turnos).
+
+La clave de cada respuesta se arma con las empresas que cubre y sus contadores de
+VersionRecurso, que RespuestaCondicionalMixin ya leyo para el ETag: cuando un signal
+de Empresa o Turno sube la version, la clave cambia y la entrada vieja deja de usarse
+(expira sola). Un cambio en EmpresaUsuario cambia el conjunto de empresas autorizadas
+y con el la clave.
+
+Usa el alias CACHES["referencia"] si existe (ver settings) y si no el cache por defecto.
+Los aciertos y fallos se cuentan en el mismo cache; con el backend local son por proceso.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from . import versiones
+
+ALIAS = "referencia"
+PREFIJO = "ref"
+CONTADORES = ("aciertos", "fallos")
+
+
+def cache():
+    return caches[ALIAS if ALIAS in settings.CACHES else "default"]
+
+
+def timeout():
+    return getattr(settings, "REFERENCIA_CACHE_TIMEOUT", 3600)
+
+
+def clave_respuesta(tipo, recursos, empresa_ids, leidas):
+    """Clave de la respuesta `tipo` para esas empresas con las versiones leidas."""
+    empresa_ids = sorted(empresa_ids)
+    partes = [
+        (empresa_id, [leidas.get((recurso, empresa_id), (0, None))[0] for recurso in recursos])
+        for empresa_id in empresa_ids
+    ]
+    digest = hashlib.sha256(repr((versiones.VERSION_FORMATO, partes)).encode("utf-8")).hexdigest()[:32]
+    return f"{PREFIJO}:{tipo}:{digest}"
+
+
+def _contar(nombre):
+    clave = f"{PREFIJO}:stats:{nombre}"
+    try:
+        cache().incr(clave)
+    except ValueError:
+        cache().add(clave, 0, None)
+        cache().incr(clave)
+
+
+def obtener_o_calcular(clave, calcular):
+    """(datos, acierto). En un fallo guarda lo que devuelve `calcular()`."""
+    datos = cache().get(clave)
+    if datos is not None:
+        _contar("aciertos")
+        return datos, True
+    _contar("fallos")
+    datos = calcular()
+    cache().set(clave, datos, timeout())
+    return datos, False
+
+
+def estadisticas():
+    valores = cache().get_many([f"{PREFIJO}:stats:{nombre}" for nombre in CONTADORES])
+    return {nombre: valores.get(f"{PREFIJO}:stats:{nombre}", 0) for nombre in CONTADORES}
+
+
+def reiniciar_estadisticas():
+    cache().delete_many([f"{PREFIJO}:stats:{nombre}" for nombre in CONTADORES])
+
+
+class ReferenciaCacheadaMixin(versiones.RespuestaCondicionalMixin):
+    """
+    ListAPIView de datos de referencia: responde desde el cache y, en un fallo, serializa
+    get_queryset() y lo guarda. Agrega la cabecera X-Cache (HIT o MISS).
+
+    La clave se arma con la empresa de la URL (la misma que filtra get_queryset()) o, en
+    las vistas que no filtran por empresa, con las del usuario. Un get_queryset() vacio
+    por falta de acceso (none()) no se guarda.
+    """
+
+    tipo_referencia = None
+
+    def empresas_referencia(self, request):
+        if self.filtra_por_empresa and "empresa_id" in self.kwargs:
+            return {int(self.kwargs["empresa_id"])}
+        return self.empresas_version(request)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if queryset.query.is_empty():
+            response = Response([])
+            response["X-Cache"] = "MISS"
+            return response
+
+        clave = clave_respuesta(
+            self.tipo_referencia, self.recursos_version, self.empresas_referencia(request), self.versiones_leidas
+        )
+        datos, acierto = obtener_o_calcular(
+            clave, lambda: [dict(fila) for fila in self.get_serializer(queryset, many=True).data]
+        )
+        response = Response(datos)
+        response["X-Cache"] = "HIT" if acierto else "MISS"
+        return response
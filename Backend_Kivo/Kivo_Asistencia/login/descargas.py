@@ -0,0 +1,159 @@
+"""
+Entrega de archivos de MEDIA_ROOT despues de validar el acceso en la vista.
+
+Segun DESCARGAS["MODO"] la transferencia la hace el servidor web ("nginx": cabecera
+X-Accel-Redirect hacia una location `internal`; "sendfile": cabecera X-Sendfile para
+Apache/lighttpd) o Django ("django"): FileResponse con soporte de Range, que bajo
+gunicorn se envia con os.sendfile. En todos los modos las peticiones condicionales
+(If-None-Match, If-Modified-Since, ...) se responden antes de abrir el archivo.
+
+Los enlaces que el navegador abre directamente (sin cabecera Authorization) llevan
+una firma temporal en `?firma=` generada por url_firmada().
+"""
+
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+CONFIGURACION = {
+    "MODO": "django",
+    "PREFIJO_INTERNO": "/media-protegido/",
+    "FIRMA_SEGUNDOS": 3600,
+}
+
+SAL_FIRMA = "login.descargas"
+RE_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, "DESCARGAS", {})}
+
+
+def url_firmada(request, nombre_ruta, pk):
+    """URL absoluta (si hay request) de la descarga `nombre_ruta` con una firma temporal."""
+    firma = signing.dumps([nombre_ruta, pk], salt=SAL_FIRMA, compress=True)
+    url = f"{reverse(nombre_ruta, args=[pk])}?firma={quote(firma)}"
+    return request.build_absolute_uri(url) if request else url
+
+
+def firma_valida(request, nombre_ruta, pk):
+    firma = request.query_params.get("firma")
+    if not firma:
+        return False
+    try:
+        datos = signing.loads(firma, salt=SAL_FIRMA, max_age=configuracion()["FIRMA_SEGUNDOS"])
+    except signing.BadSignature:
+        return False
+    return datos == [nombre_ruta, pk]
+
+
+class _Tramo:
+    """
+    Vista de solo lectura de [inicio, inicio + largo) de un archivo. Expone fileno()
+    para que el servidor WSGI pueda usar sendfile; sin tell()/seek() FileResponse no
+    recalcula Content-Length.
+    """
+
+    def __init__(self, archivo, inicio, largo):
+        archivo.seek(inicio)
+        self.archivo = archivo
+        self.restante = largo
+
+    def fileno(self):
+        return self.archivo.fileno()
+
+    def read(self, tamano=-1):
+        if self.restante <= 0:
+            return b""
+        if tamano is None or tamano < 0 or tamano > self.restante:
+            tamano = self.restante
+        datos = self.archivo.read(tamano)
+        self.restante -= len(datos)
+        return datos
+
+    def close(self):
+        self.archivo.close()
+
+
+def _rango(request, tamano, etag, ultima_modificacion):
+    """
+    (inicio, fin) pedido en Range, None para enviar el archivo completo o "invalido"
+    si no es satisfacible. Solo se atiende un rango; varios rangos reciben el archivo entero.
+    """
+    cabecera = request.META.get("HTTP_RANGE", "").replace(" ", "")
+    coincidencia = RE_RANGO.match(cabecera)
+    if not coincidencia or not any(coincidencia.groups()):
+        return None
+    si_rango = request.META.get("HTTP_IF_RANGE")
+    if si_rango and si_rango != etag and parse_http_date_safe(si_rango) != ultima_modificacion:
+        return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        largo = int(fin)
+        if largo == 0:
+            return "invalido"
+        return max(0, tamano - largo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        return "invalido"
+    return inicio, fin
+
+
+def servir_archivo(request, nombre, nombre_descarga=None, tipo_contenido=None, etag=None, adjunto=False):
+    """
+    Respuesta que entrega el archivo `nombre` de default_storage. `etag` (sin comillas)
+    debe identificar el contenido; por defecto se deriva de mtime y tamano.
+    """
+    ruta = default_storage.path(nombre)
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
+    ultima_modificacion = int(estado.st_mtime)
+    etag = quote_etag(etag or f"{estado.st_mtime_ns:x}-{estado.st_size:x}")
+    condicional = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if condicional is not None:
+        return condicional
+
+    nombre_descarga = nombre_descarga or os.path.basename(nombre)
+    tipo_contenido = tipo_contenido or "application/octet-stream"
+    modo = configuracion()["MODO"]
+    if modo in ("nginx", "sendfile"):
+        response = HttpResponse(content_type=tipo_contenido)
+        if modo == "nginx":
+            response["X-Accel-Redirect"] = quote(configuracion()["PREFIJO_INTERNO"].rstrip("/") + "/" + nombre)
+        else:
+            response["X-Sendfile"] = ruta
+    else:
+        rango = _rango(request, estado.st_size, etag, ultima_modificacion)
+        if rango == "invalido":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{estado.st_size}"
+            return response
+        archivo = open(ruta, "rb")
+        if rango is None:
+            response = FileResponse(archivo, content_type=tipo_contenido)
+            response["Content-Length"] = estado.st_size
+        else:
+            inicio, fin = rango
+            response = FileResponse(_Tramo(archivo, inicio, fin - inicio + 1), status=206, content_type=tipo_contenido)
+            response["Content-Length"] = fin - inicio + 1
+            response["Content-Range"] = f"bytes {inicio}-{fin}/{estado.st_size}"
+        response["Accept-Ranges"] = "bytes"
+
+    response["Content-Disposition"] = content_disposition_header(adjunto, nombre_descarga)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(ultima_modificacion)
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,123 @@
+"""
+Almacenamiento direccionado por contenido para los PDF de licencias.
+
+Cada subida se copia por bloques a un temporal en MEDIA_ROOT mientras se calcula su
+SHA-256. Si el hash ya existe se descarta la copia y se reutiliza el documento; si no,
+el temporal se mueve (os.replace) a documentos/<aa>/<bb>/<sha256><ext>. Las filas que
+usan un documento se cuentan en DocumentoAlmacenado.referencias.
+
+Un hash solo se resuelve (para consultarlo o reutilizarlo sin subir el archivo) si el
+documento ya lo usa una licencia de las empresas del usuario; si no, hay que subirlo.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+
+from .models import DocumentoAlmacenado, Licencia
+
+DIRECTORIO = "documentos"
+TAMANO_BLOQUE = 1024 * 1024
+RE_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+RE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+
+def ruta_documento(sha256, extension=""):
+    return f"{DIRECTORIO}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def _extension(nombre):
+    extension = os.path.splitext(nombre or "")[1].lower()
+    return extension if RE_EXTENSION.match(extension) else ""
+
+
+def hash_archivo(archivo):
+    """SHA-256 de un archivo abierto en modo binario, leido por bloques."""
+    digest = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b""):
+        digest.update(bloque)
+    return digest.hexdigest()
+
+
+def buscar(sha256, empresa_ids):
+    """
+    Documento con ese hash que ya usa alguna licencia de `empresa_ids`, o None (tambien
+    si el hash no tiene formato valido). Asi un hash no revela si otra empresa tiene el
+    documento ni permite adjuntarlo y descargarlo desde una licencia propia.
+    """
+    sha256 = (sha256 or "").strip().lower()
+    if not RE_SHA256.match(sha256) or not empresa_ids:
+        return None
+    en_empresas = Licencia.objects.filter(documento=OuterRef("pk"), empresa_id__in=empresa_ids)
+    return DocumentoAlmacenado.objects.filter(Exists(en_empresas), sha256=sha256).first()
+
+
+def almacenar(archivo):
+    """
+    Guarda un UploadedFile (o cualquier File de Django) y devuelve su DocumentoAlmacenado.
+    No suma referencias: eso ocurre al guardar la fila que lo usa.
+    """
+    directorio = default_storage.path(DIRECTORIO)
+    os.makedirs(directorio, exist_ok=True)
+    digest = hashlib.sha256()
+    tamano = 0
+    fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".parcial")
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            for bloque in archivo.chunks(TAMANO_BLOQUE):
+                digest.update(bloque)
+                destino.write(bloque)
+                tamano += len(bloque)
+        sha256 = digest.hexdigest()
+        documento = DocumentoAlmacenado.objects.filter(sha256=sha256).first()
+        if documento is None:
+            tipo = getattr(archivo, "content_type", None) or mimetypes.guess_type(archivo.name or "")[0]
+            documento = _registrar(sha256, temporal, tamano, _extension(archivo.name), tipo or "")
+        return documento
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _registrar(sha256, temporal, tamano, extension, tipo_contenido):
+    nombre = ruta_documento(sha256, extension)
+    destino = default_storage.path(nombre)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Mismo contenido, mismo nombre: si dos subidas llegan a la vez el reemplazo es inocuo.
+    os.replace(temporal, destino)
+    os.chmod(destino, default_storage.file_permissions_mode or 0o644)
+    try:
+        with transaction.atomic():
+            return DocumentoAlmacenado.objects.create(
+                sha256=sha256, archivo=nombre, tamano=tamano, tipo_contenido=tipo_contenido
+            )
+    except IntegrityError:
+        documento = DocumentoAlmacenado.objects.get(sha256=sha256)
+        if documento.archivo.name != nombre:
+            os.remove(destino)
+        return documento
+
+
+def ajustar_referencias(agregar=None, quitar=None):
+    """Suma una referencia al documento `agregar` y resta una a `quitar` (ids o None)."""
+    if agregar:
+        DocumentoAlmacenado.objects.filter(pk=agregar).update(referencias=F("referencias") + 1)
+    if quitar:
+        DocumentoAlmacenado.objects.filter(pk=quitar, referencias__gt=0).update(referencias=F("referencias") - 1)
+
+
+def eliminar(documento):
+    """Borra la fila y el archivo de un documento sin referencias."""
+    with transaction.atomic():
+        borrados, _ = DocumentoAlmacenado.objects.filter(
+            pk=documento.pk, referencias=0, licencias__isnull=True
+        ).delete()
+    if borrados:
+        documento.archivo.delete(save=False)
+    return bool(borrados)
@@ -0,0 +1,175 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+COLUMNAS_MARCAS = [
+    ("id", "id"),
+    ("fecha_hora", "timestamp"),
+    ("tipo_marca", "tipo_marca"),
+    ("rut", "trabajador__rut"),
+    ("nombres", "trabajador__nombres"),
+    ("apellidos", "trabajador__apellidos"),
+    ("empresa", "trabajador__empresa__razon_social"),
+    ("hash", "hash"),
+]
+
+COLUMNAS_AUDITORIA = [
+    ("id", "id"),
+    ("fecha", "fecha"),
+    ("usuario_rut", "usuario__rut"),
+    ("usuario_email", "usuario__email"),
+    ("empresa", "empresa__razon_social"),
+    ("accion", "accion"),
+    ("modelo_afectado", "modelo_afectado"),
+    ("registro_id", "registro_id"),
+    ("motivo", "motivo"),
+]
+
+_CARACTERES_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def iterar_por_bloques(queryset, campos, campo_orden="timestamp", bloque=2000):
+    """
+    Recorre un queryset en orden (campo_orden, id) ascendente, por bloques de `bloque` filas.
+    Cada bloque es una consulta acotada leida con iterator(chunk_size=bloque), asi la memoria
+    no depende del total aunque el driver (MySQL) no haga streaming del resultado.
+    Entrega tuplas con los valores de `campos`.
+    """
+    campos = list(campos)
+    consulta = queryset.order_by(campo_orden, "id").values_list("id", campo_orden, *campos)
+    ultimo = None
+    while True:
+        qs = consulta
+        if ultimo:
+            valor, ultimo_id = ultimo
+            qs = qs.filter(Q(**{f"{campo_orden}__gt": valor}) | Q(**{campo_orden: valor, "id__gt": ultimo_id}))
+        leidas = 0
+        for fila in qs[:bloque].iterator(chunk_size=bloque):
+            leidas += 1
+            ultimo = (fila[1], fila[0])
+            yield fila[2:]
+        if leidas < bloque:
+            return
+
+
+def formatear_valor(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "tzinfo") and hasattr(valor, "isoformat"):
+        return timezone.localtime(valor).isoformat()
+    return valor
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_stream(encabezados, filas):
+    """Genera el CSV linea a linea (UTF-8 con BOM para que Excel respete los acentos)."""
+    writer = csv.writer(_Echo())
+    yield "\ufeff".encode("utf-8")
+    yield writer.writerow(encabezados).encode("utf-8")
+    for fila in filas:
+        yield writer.writerow([formatear_valor(valor) for valor in fila]).encode("utf-8")
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no buscable para ZipFile: acumula lo escrito hasta que se vacia."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def vaciar(self):
+        data = b"".join(self._partes)
+        self._partes.clear()
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    "</Types>"
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    "</Relationships>"
+)
+
+
+def _celda_xlsx(valor):
+    valor = formatear_valor(valor)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        texto = escape(_CARACTERES_INVALIDOS_XML.sub("", str(valor)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+    return f"<c><v>{valor}</v></c>"
+
+
+def _fila_xlsx(valores):
+    return ("<row>" + "".join(_celda_xlsx(valor) for valor in valores) + "</row>").encode("utf-8")
+
+
+def xlsx_stream(encabezados, filas, hoja="Marcas", filas_por_envio=1000):
+    """
+    Genera un XLSX (una hoja, celdas inline) escribiendo el zip sobre la marcha:
+    se entrega cada `filas_por_envio` filas lo que ya se comprimio.
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_RELS)
+        zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(hoja=escape(hoja)))
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        yield salida.vaciar()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_fila_xlsx(encabezados))
+            for n, fila in enumerate(filas, start=1):
+                sheet.write(_fila_xlsx(fila))
+                if n % filas_por_envio == 0:
+                    yield salida.vaciar()
+            sheet.write(b"</sheetData></worksheet>")
+        yield salida.vaciar()
+    yield salida.vaciar()
@@ -0,0 +1,357 @@
+"""
+Importacion masiva de trabajadores y usuarios desde CSV.
+
+El archivo se lee por lotes: cada lote se valida con consultas por conjunto
+(RUT, correo, empresas y turnos), las contrasenas se hashean (en un pool de
+procesos si se pide) y Trabajador, Usuario, EmpresaUsuario y su auditoria se
+insertan con bulk_create. Cada lote se confirma por separado, por eso
+comprobar_csv() lee el archivo completo antes de importar.
+
+Hashear con PBKDF2 toma cerca de medio segundo por fila: la API no importa dentro del
+request, encola un ImportacionJob que procesa el comando procesar_importaciones.
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import chain, islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import versiones
+from .models import AuditoriaCambio, Empresa, EmpresaUsuario, ImportacionJob, Trabajador, Turno, Usuario
+from .normalizacion import normalizar_email, normalizar_rut
+from .serializers import FilaImportacionSerializer
+
+COLUMNAS = [campo for campo in FilaImportacionSerializer().fields]
+
+
+def leer_csv(archivo):
+    """
+    Recorre un CSV binario (UTF-8, con o sin BOM; separado por ',' o ';') entregando
+    (numero_de_fila, dict). Los valores vacios se omiten para que cuenten como ausentes.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        encabezado = texto.readline()
+        delimitador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+        lector = csv.DictReader(chain([encabezado], texto), delimiter=delimitador)
+        lector.fieldnames = [(nombre or "").strip().lower() for nombre in lector.fieldnames or []]
+        for numero, fila in enumerate(lector, start=2):
+            yield numero, {
+                clave: valor.strip()
+                for clave, valor in fila.items()
+                if clave in COLUMNAS and isinstance(valor, str) and valor.strip()
+            }
+    finally:
+        # El archivo es del llamador: al descartar el wrapper no debe cerrarse.
+        texto.detach()
+
+
+def comprobar_csv(archivo):
+    """
+    Lee el CSV binario completo sin importar nada y lo deja al inicio. Lanza
+    UnicodeDecodeError o csv.Error si alguna parte no se puede leer, antes de que
+    ImportacionUsuarios confirme el primer lote.
+    """
+    for _ in leer_csv(archivo):
+        pass
+    archivo.seek(0)
+
+
+def _hashear(passwords):
+    return [make_password(password) for password in passwords]
+
+
+class ImportacionUsuarios:
+    """
+    Importa filas de leer_csv(). `empresas_permitidas` (None = sin restriccion) limita las
+    empresas que pueden aparecer en el archivo; `empresa_id` es la empresa por defecto para
+    las filas que no la indican. Con `procesos` > 1 las contrasenas se hashean en un pool
+    de procesos. Con `auditor_id` cada usuario creado se audita en la transaccion de su lote.
+    """
+
+    def __init__(self, empresas_permitidas=None, empresa_id=None, procesos=1, tamano_lote=500, auditor_id=None):
+        self.empresas_permitidas = set(empresas_permitidas) if empresas_permitidas is not None else None
+        self.empresa_id = empresa_id
+        self.auditor_id = auditor_id
+        self.procesos = procesos or 1
+        self.tamano_lote = tamano_lote
+        self.total = 0
+        self.errores = []
+        self.creados = []  # (usuario_id, trabajador_id, empresa_id)
+        self._ruts = {}
+        self._emails = {}
+        self._empresas = {}
+        self._turnos = {}
+        self._pool = None
+
+    def ejecutar(self, filas):
+        filas = iter(filas)
+        try:
+            while True:
+                lote = list(islice(filas, self.tamano_lote))
+                if not lote:
+                    break
+                self.total += len(lote)
+                self._procesar_lote(lote)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+        return self.reporte()
+
+    def reporte(self):
+        return {
+            "total": self.total,
+            "creados": len(self.creados),
+            "con_errores": len(self.errores),
+            "errores": sorted(self.errores, key=lambda error: error["fila"]),
+        }
+
+    def _error(self, numero, datos, errores):
+        self.errores.append({"fila": numero, "rut": datos.get("rut"), "errores": errores})
+
+    def _procesar_lote(self, lote):
+        validas = self._validar_formato(lote)
+        validas = self._validar_contra_bd(validas)
+        if not validas:
+            return
+
+        passwords = self._hashear([datos["password"] for _, datos in validas])
+        try:
+            with transaction.atomic():
+                creados = self._insertar(validas, passwords)
+        except IntegrityError:
+            # Otro proceso creo alguno de estos RUT/correos entre la validacion y el insert.
+            for numero, datos in validas:
+                self._error(numero, datos, {"detail": "Conflicto con datos existentes; reintente la fila."})
+        else:
+            self.creados.extend(creados)
+
+    def _validar_formato(self, lote):
+        validas = []
+        for numero, fila in lote:
+            if self.empresa_id and "empresa_id" not in fila:
+                fila["empresa_id"] = self.empresa_id
+            serializer = FilaImportacionSerializer(data=fila)
+            if not serializer.is_valid():
+                self._error(numero, fila, serializer.errors)
+                continue
+            datos = serializer.validated_data
+
+            rut = normalizar_rut(datos["rut"])
+            email = normalizar_email(datos["email"])
+            errores = {}
+            if rut in self._ruts:
+                errores["rut"] = f"RUT repetido en el archivo (fila {self._ruts[rut]})"
+            if email in self._emails:
+                errores["email"] = f"Correo repetido en el archivo (fila {self._emails[email]})"
+            self._ruts.setdefault(rut, numero)
+            self._emails.setdefault(email, numero)
+            if errores:
+                self._error(numero, datos, errores)
+                continue
+            validas.append((numero, datos))
+        return validas
+
+    def _validar_contra_bd(self, validas):
+        ruts = {normalizar_rut(datos["rut"]) for _, datos in validas}
+        emails = {normalizar_email(datos["email"]) for _, datos in validas}
+        ruts_usuario = set(Usuario.objects.filter(rut_normalizado__in=ruts).values_list("rut_normalizado", flat=True))
+        ruts_trabajador = set(
+            Trabajador.objects.filter(rut_normalizado__in=ruts).values_list("rut_normalizado", flat=True)
+        )
+        emails_usados = set(
+            Usuario.objects.filter(email_normalizado__in=emails).values_list("email_normalizado", flat=True)
+        )
+
+        empresas = {datos["empresa_id"] for _, datos in validas if datos.get("empresa_id")} - self._empresas.keys()
+        self._empresas.update(dict.fromkeys(empresas, False))
+        self._empresas.update(dict.fromkeys(Empresa.objects.filter(id__in=empresas).values_list("id", flat=True), True))
+        turnos = {datos["turno_id"] for _, datos in validas if datos.get("turno_id")} - self._turnos.keys()
+        self._turnos.update(dict.fromkeys(turnos))
+        self._turnos.update(Turno.objects.filter(id__in=turnos).values_list("id", "empresa_id"))
+
+        resultado = []
+        for numero, datos in validas:
+            rut = normalizar_rut(datos["rut"])
+            empresa_id = datos.get("empresa_id")
+            errores = {}
+            if rut in ruts_usuario:
+                errores["rut"] = "El RUT ya esta registrado como usuario"
+            elif datos["rol"] == "trabajador" and rut in ruts_trabajador:
+                errores["rut"] = "El RUT ya esta registrado como trabajador"
+            if normalizar_email(datos["email"]) in emails_usados:
+                errores["email"] = "El correo ya esta registrado como usuario"
+            if empresa_id and not self._empresas[empresa_id]:
+                errores["empresa_id"] = "La empresa no existe"
+            elif empresa_id and self.empresas_permitidas is not None and empresa_id not in self.empresas_permitidas:
+                errores["empresa_id"] = "Empresa no autorizada"
+            if datos.get("turno_id"):
+                turno_empresa = self._turnos[datos["turno_id"]]
+                if turno_empresa is None:
+                    errores["turno_id"] = "Turno no encontrado"
+                elif turno_empresa != empresa_id:
+                    errores["turno_id"] = "El turno no pertenece a la empresa"
+            if errores:
+                self._error(numero, datos, errores)
+                continue
+            resultado.append((numero, datos))
+        return resultado
+
+    def _hashear(self, passwords):
+        if self.procesos <= 1 or len(passwords) < 2:
+            return _hashear(passwords)
+        if self._pool is None:
+            # spawn: los procesos hijos no heredan las conexiones abiertas a la base de datos.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.procesos,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        tamano = max(1, -(-len(passwords) // self.procesos))
+        partes = [passwords[i : i + tamano] for i in range(0, len(passwords), tamano)]
+        return [hashed for parte in self._pool.map(_hashear, partes) for hashed in parte]
+
+    def _insertar(self, validas, passwords):
+        hoy = timezone.localdate()
+        trabajadores = []
+        for _, datos in validas:
+            if datos["rol"] != "trabajador":
+                continue
+            trabajador = Trabajador(
+                empresa_id=datos["empresa_id"],
+                rut=datos["rut"],
+                nombres=datos["nombres"],
+                apellidos=datos["apellidos"],
+                cargo=datos.get("cargo"),
+                area_trabajador=datos.get("area_trabajador"),
+                tipo_contrato=datos.get("tipo_contrato", "contrato_indefinido"),
+                correo=datos.get("correo"),
+                turno_id=datos.get("turno_id"),
+                fecha_ingreso=datos.get("fecha_ingreso", hoy),
+            )
+            trabajador.actualizar_busqueda()
+            trabajadores.append(trabajador)
+        Trabajador.objects.bulk_create(trabajadores)
+        versiones.incrementar("trabajadores", *{trabajador.empresa_id for trabajador in trabajadores})
+        # MySQL no devuelve los ids de bulk_create: se releen por RUT.
+        trabajador_ids = dict(
+            Trabajador.objects.filter(rut__in=[t.rut for t in trabajadores]).values_list("rut", "id")
+        )
+
+        usuarios = []
+        for (_, datos), password in zip(validas, passwords):
+            usuario = Usuario(
+                trabajador_id=trabajador_ids.get(datos["rut"]) if datos["rol"] == "trabajador" else None,
+                rut=datos["rut"],
+                email=datos["email"],
+                password=password,
+                rol=datos["rol"],
+            )
+            usuario.actualizar_busqueda()
+            usuarios.append(usuario)
+        Usuario.objects.bulk_create(usuarios)
+        usuario_ids = dict(Usuario.objects.filter(rut__in=[u.rut for u in usuarios]).values_list("rut", "id"))
+
+        relaciones = []
+        creados = []
+        for _, datos in validas:
+            if datos.get("empresa_id"):
+                relaciones.append(
+                    EmpresaUsuario(usuario_id=usuario_ids[datos["rut"]], empresa_id=datos["empresa_id"], rol=datos["rol"])
+                )
+            creados.append((usuario_ids[datos["rut"]], trabajador_ids.get(datos["rut"]), datos.get("empresa_id")))
+        EmpresaUsuario.objects.bulk_create(relaciones)
+
+        if self.auditor_id:
+            # En la misma transaccion: un lote confirmado nunca queda sin auditoria.
+            AuditoriaCambio.objects.bulk_create(
+                [
+                    AuditoriaCambio(
+                        clave=uuid.uuid4().hex,
+                        usuario_id=self.auditor_id,
+                        empresa_id=empresa_id,
+                        accion="crear_usuario",
+                        modelo_afectado="Usuario",
+                        registro_id=usuario_id,
+                        motivo="Importacion masiva CSV",
+                    )
+                    for usuario_id, _, empresa_id in creados
+                ]
+            )
+        return creados
+
+
+def timeout_procesando():
+    """Segundos tras los que una importacion en 'procesando' se da por abandonada."""
+    return getattr(settings, "IMPORTACIONES_TIMEOUT_SEGUNDOS", 2 * 3600)
+
+
+def tomar_siguiente_importacion():
+    """
+    Marca como 'procesando' la importacion pendiente mas antigua y la devuelve (None si no
+    hay). Las abandonadas quedan en 'error' en vez de reintentarse: sus lotes confirmados
+    ya estan creados y repetirlos los reportaria como duplicados.
+    """
+    ahora = timezone.now()
+    abandonadas = ImportacionJob.objects.filter(
+        estado="procesando", iniciado_en__lt=ahora - timedelta(seconds=timeout_procesando())
+    )
+    for job in abandonadas:
+        job.archivo.delete(save=False)
+    abandonadas.update(
+        estado="error", archivo="", error="Importacion interrumpida; revise los usuarios creados.", terminado_en=ahora
+    )
+    with transaction.atomic():
+        qs = ImportacionJob.objects.filter(estado="pendiente").order_by("creado_en", "id")
+        qs = qs.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        job = qs.first()
+        if job is None:
+            return None
+        job.estado = "procesando"
+        job.iniciado_en = timezone.now()
+        job.save(update_fields=["estado", "iniciado_en"])
+    return job
+
+
+def ejecutar_importacion(job, procesos=None):
+    """Importa el CSV del job con los permisos actuales de quien lo solicito y borra el archivo."""
+    importacion = ImportacionUsuarios(
+        empresas_permitidas=job.solicitado_por.empresas_ids(roles={"admin_rrhh"}),
+        empresa_id=job.empresa_id,
+        procesos=procesos or os.cpu_count(),
+        auditor_id=job.solicitado_por_id,
+    )
+    error = None
+    try:
+        with job.archivo.open("rb"):
+            importacion.ejecutar(leer_csv(job.archivo.file))
+    except Exception as exc:
+        error = exc
+    finally:
+        # El CSV trae contrasenas en texto plano: no queda en disco, termine como termine.
+        job.archivo.delete(save=False)
+
+    reporte = importacion.reporte()
+    job.estado = "error" if error else "completado"
+    job.error = str(error) if error else None
+    job.total = reporte["total"]
+    job.creados = reporte["creados"]
+    job.con_errores = reporte["con_errores"]
+    job.errores = reporte["errores"]
+    job.terminado_en = timezone.now()
+    job.save(
+        update_fields=["estado", "error", "archivo", "total", "creados", "con_errores", "errores", "terminado_en"]
+    )
+    if error:
+        raise error
+    return job
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from login import archivo_marcas, particiones
+from login.models import Marcas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las marcas de meses cerrados y antiguos a archivos columnares por empresa y mes "
+        "(ARCHIVO_MARCAS['DIRECTORIO']) y las borra de la tabla. Programarlo una vez al mes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=None,
+                            help="Meses que se mantienen en la tabla, incluido el actual "
+                                 "(def. ARCHIVO_MARCAS['MESES_VIGENTES']).")
+        parser.add_argument("--empresa", type=int, default=None, help="Archivar solo esta empresa.")
+        parser.add_argument("--simular", action="store_true", help="Mostrar los periodos sin archivarlos.")
+
+    def handle(self, *args, **options):
+        vigentes = archivo_marcas.configuracion()["MESES_VIGENTES"]
+        meses = options["meses"]
+        if meses is None:
+            meses = vigentes
+        if meses < vigentes:
+            # Los resumenes diarios no buscan en el archivo las fechas de los meses vigentes.
+            raise CommandError(f"--meses no puede ser menor que ARCHIVO_MARCAS['MESES_VIGENTES'] ({vigentes}).")
+
+        limite = particiones.inicio_mes(timezone.localdate(), 1 - meses)
+        corte = archivo_marcas.corte_vigente(meses)
+        qs = Marcas.objects.filter(timestamp__lt=corte, empresa__isnull=False)
+        if options["empresa"]:
+            qs = qs.filter(empresa_id=options["empresa"])
+        primeras = qs.order_by().values("empresa_id").annotate(primera=Min("timestamp"))
+
+        archivadas = 0
+        for fila in sorted(primeras, key=lambda f: f["empresa_id"]):
+            mes = particiones.inicio_mes(timezone.localtime(fila["primera"]).date())
+            while mes < limite:
+                if options["simular"]:
+                    inicio, fin = archivo_marcas.rango_mes(mes.year, mes.month)
+                    total = Marcas.objects.filter(
+                        empresa_id=fila["empresa_id"], timestamp__gte=inicio, timestamp__lt=fin
+                    ).count()
+                    if total:
+                        self.stdout.write(f"Empresa {fila['empresa_id']} {mes:%Y-%m}: {total} marcas")
+                else:
+                    periodo = archivo_marcas.archivar_periodo(fila["empresa_id"], mes.year, mes.month)
+                    if periodo is not None:
+                        self.stdout.write(
+                            f"Empresa {periodo.empresa_id} {mes:%Y-%m}: {periodo.archivo} "
+                            f"({periodo.filas} marcas, {periodo.tamano} bytes)"
+                        )
+                        archivadas += 1
+                mes = particiones.inicio_mes(mes, 1)
+
+        if not options["simular"]:
+            self.stdout.write(f"Periodos archivados: {archivadas}")
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from login.motor_asistencia import ENTRADA, SALIDA, calcular_metricas, inicios_de_dia
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento del motor de cierre con marcas sinteticas (no usa la base de datos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--marcas", type=int, default=1_000_000)
+        parser.add_argument("--trabajadores", type=int, default=5000)
+        parser.add_argument("--repeticiones", type=int, default=3)
+        parser.add_argument("--semilla", type=int, default=0)
+
+    def handle(self, *args, **options):
+        total = options["marcas"] - options["marcas"] % 2
+        n_trabajadores = options["trabajadores"]
+        rng = np.random.default_rng(options["semilla"])
+
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=30)
+        inicios = inicios_de_dia(desde, hasta)
+        dias = len(inicios) - 1
+
+        # Pares entrada/salida: entrada entre 07:30 y 09:30, jornada de 7 a 10 horas.
+        pares = total // 2
+        trabajador = rng.integers(1, n_trabajadores + 1, size=pares, dtype=np.int64)
+        dia = rng.integers(0, dias, size=pares)
+        entrada = inicios[dia] + rng.integers(7 * 3600 + 1800, 9 * 3600 + 1800, size=pares)
+        salida = entrada + rng.integers(7 * 3600, 10 * 3600, size=pares)
+
+        columnas = (
+            np.concatenate([trabajador, trabajador]),
+            np.concatenate([entrada, salida]),
+            np.concatenate([np.full(pares, ENTRADA, np.int8), np.full(pares, SALIDA, np.int8)]),
+        )
+        turnos = {t: (8 * 3600, 17 * 3600, 5 * 60) for t in range(1, n_trabajadores + 1)}
+
+        tiempos = []
+        for _ in range(options["repeticiones"]):
+            inicio = time.perf_counter()
+            calcular_metricas(*columnas, inicios, turnos)
+            tiempos.append(time.perf_counter() - inicio)
+
+        mejor = min(tiempos)
+        self.stdout.write(
+            f"marcas={total} trabajadores={n_trabajadores} dias={dias} "
+            f"mejor={mejor:.3f}s mediana={sorted(tiempos)[len(tiempos) // 2]:.3f}s "
+            f"throughput={total / mejor:,.0f} marcas/s"
+        )
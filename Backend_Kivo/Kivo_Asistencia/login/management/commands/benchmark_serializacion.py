@@ -0,0 +1,92 @@
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from login.models import Empresa, Marcas, Trabajador
+from login.renderers import JSONRapidoRenderer, orjson
+from login.serializers import MarcaProyeccion, MarcaSerializer
+
+
+def _mejor(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el listado de marcas con MarcaSerializer + JSONRenderer de DRF contra "
+        "MarcaProyeccion + JSONRapidoRenderer sobre filas sinteticas (no usa la base de datos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=50_000)
+        parser.add_argument("--trabajadores", type=int, default=500)
+        parser.add_argument("--repeticiones", type=int, default=3)
+
+    def handle(self, *args, **options):
+        total = options["filas"]
+        empresas = [Empresa(id=i, razon_social=f"Empresa Ñuñoa {i}  ") for i in range(1, 6)]
+        trabajadores = [
+            Trabajador(id=i, rut=f"{i}-K", nombres="José", apellidos="Pérez", empresa=empresas[i % len(empresas)])
+            for i in range(1, options["trabajadores"] + 1)
+        ]
+        ahora = timezone.now().replace(microsecond=123456)
+        instancias = [
+            Marcas(
+                id=i,
+                tipo_marca="entrada" if i % 2 else "salida",
+                timestamp=ahora - timedelta(minutes=i),
+                hash=f"{i:064x}",
+                trabajador=trabajadores[i % len(trabajadores)] if i % 1000 else None,
+            )
+            for i in range(1, total + 1)
+        ]
+        Fila = namedtuple("Fila", MarcaProyeccion.columnas)
+        filas = [
+            Fila(
+                m.id,
+                m.tipo_marca,
+                m.timestamp,
+                m.hash,
+                m.trabajador_id,
+                *(
+                    (m.trabajador.rut, m.trabajador.nombres, m.trabajador.apellidos, m.trabajador.empresa_id,
+                     m.trabajador.empresa.razon_social)
+                    if m.trabajador
+                    else (None,) * 5
+                ),
+            )
+            for m in instancias
+        ]
+        repeticiones = options["repeticiones"]
+
+        t_serializer, datos_drf = _mejor(lambda: MarcaSerializer(instancias, many=True).data, repeticiones)
+        t_proyeccion, datos_proyeccion = _mejor(lambda: MarcaProyeccion().filas(filas), repeticiones)
+        t_json, bytes_drf = _mejor(lambda: JSONRenderer().render(datos_drf), repeticiones)
+        t_rapido, bytes_rapido = _mejor(lambda: JSONRapidoRenderer().render(datos_proyeccion), repeticiones)
+
+        if bytes_drf != bytes_rapido:
+            raise CommandError("La proyeccion y el renderer rapido no producen los mismos bytes que DRF.")
+
+        self.stdout.write(f"filas={total} orjson={'si' if orjson else 'no (usa json)'} bytes={len(bytes_drf):,}")
+        for nombre, serializar, renderizar in (
+            ("DRF (MarcaSerializer + JSONRenderer)", t_serializer, t_json),
+            ("Proyeccion + JSONRapidoRenderer", t_proyeccion, t_rapido),
+        ):
+            self.stdout.write(
+                f"{nombre}: serializar={serializar:.3f}s renderizar={renderizar:.3f}s "
+                f"throughput={total / (serializar + renderizar):,.0f} filas/s"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Mejora: x{(t_serializer + t_json) / (t_proyeccion + t_rapido):.1f} (salida identica byte a byte)"
+            )
+        )
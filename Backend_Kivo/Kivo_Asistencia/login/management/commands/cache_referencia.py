@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from login import cache_referencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra los aciertos y fallos del cache de empresas y turnos. Con el backend local "
+        "los contadores son por proceso; con REFERENCIA_CACHE_DIR se comparten en el host."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reiniciar", action="store_true", help="Poner los contadores en cero.")
+        parser.add_argument("--vaciar", action="store_true", help="Eliminar todas las entradas del cache.")
+
+    def handle(self, *args, **options):
+        datos = cache_referencia.estadisticas()
+        total = datos["aciertos"] + datos["fallos"]
+        tasa = f"{datos['aciertos'] / total:.1%}" if total else "-"
+        self.stdout.write(f"Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  Tasa de aciertos: {tasa}")
+
+        if options["vaciar"]:
+            cache_referencia.cache().clear()
+            self.stdout.write(self.style.SUCCESS("Cache de referencia vaciado."))
+        elif options["reiniciar"]:
+            cache_referencia.reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from login import merkle
+from login.models import RaizMerkle
+
+
+class Command(BaseCommand):
+    help = (
+        "Proceso nocturno: calcula y guarda la raiz de Merkle de las marcas de cada empresa por dia "
+        "y reconstruye los dias anteriores para detectar marcas tardias, editadas o borradas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fecha", default=None, help="Ultimo dia a procesar, YYYY-MM-DD (def. ayer).")
+        parser.add_argument("--dias", type=int, default=7,
+                            help="Dias hacia atras a reconstruir, incluida --fecha (def. 7).")
+        parser.add_argument("--empresa", type=int, default=None, help="Procesar solo esta empresa.")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        fecha = hoy - timedelta(days=1)
+        if options["fecha"]:
+            fecha = parse_date(options["fecha"])
+            if fecha is None:
+                raise CommandError("--fecha debe tener formato YYYY-MM-DD.")
+        if fecha >= hoy:
+            raise CommandError("Solo se calculan raices de dias terminados.")
+
+        conteo = {"creada": 0, "igual": 0, "alterada": 0}
+        for n in range(max(options["dias"], 1)):
+            dia = fecha - timedelta(days=n)
+            empresas = merkle.empresas_con_marcas(dia) | set(
+                RaizMerkle.objects.filter(fecha=dia).values_list("empresa_id", flat=True)
+            )
+            if options["empresa"]:
+                empresas &= {options["empresa"]}
+            for empresa_id in sorted(empresas):
+                raiz, resultado = merkle.construir_dia(empresa_id, dia)
+                if raiz is None:
+                    continue
+                conteo[resultado] += 1
+                if resultado == "alterada":
+                    self.stderr.write(self.style.ERROR(
+                        f"Empresa {empresa_id} {dia}: la raiz publicada {raiz.raiz} ({raiz.hojas} marcas) "
+                        f"no coincide con la recalculada {raiz.raiz_recalculada} ({raiz.hojas_recalculadas} marcas)"
+                    ))
+
+        self.stdout.write(
+            f"Raices nuevas: {conteo['creada']}, sin cambios: {conteo['igual']}, alteradas: {conteo['alterada']}"
+        )
+        if conteo["alterada"]:
+            raise CommandError(f"{conteo['alterada']} dias con marcas tardias, editadas o borradas")
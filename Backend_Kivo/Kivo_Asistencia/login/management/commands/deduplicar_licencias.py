@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from login import documentos, versiones
+from login.models import DocumentoAlmacenado, Licencia
+
+
+def recontar_referencias():
+    """Recalcula DocumentoAlmacenado.referencias desde Licencia en un solo UPDATE."""
+    usos = (
+        Licencia.objects.filter(documento=OuterRef("pk"))
+        .order_by()
+        .values("documento")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return DocumentoAlmacenado.objects.update(
+        referencias=Coalesce(Subquery(usos, output_field=IntegerField()), 0)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los PDF de licencias subidos antes del almacen por contenido a documentos/, "
+        "unificando los repetidos, recalcula las referencias y opcionalmente purga los documentos sin uso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--simular", action="store_true", help="Solo calcular hashes e informar, sin mover nada.")
+        parser.add_argument("--purgar", action="store_true", help="Eliminar documentos sin referencias.")
+        parser.add_argument("--antiguedad-horas", type=int, default=24,
+                            help="Antiguedad minima de un documento sin referencias para purgarlo (def. 24).")
+
+    def handle(self, *args, **options):
+        simular = options["simular"]
+        pendientes = Licencia.objects.filter(documento__isnull=True).exclude(archivo="").exclude(archivo__isnull=True)
+        vistos = set(DocumentoAlmacenado.objects.values_list("sha256", flat=True))
+        migradas = repetidas = faltantes = 0
+        bytes_liberados = 0
+        empresas = set()
+
+        for licencia_id, nombre, empresa_id in pendientes.values_list(
+            "id", "archivo", "empresa_id"
+        ).iterator(chunk_size=500):
+            if not default_storage.exists(nombre):
+                faltantes += 1
+                self.stderr.write(f"Licencia #{licencia_id}: no existe {nombre}")
+                continue
+            with default_storage.open(nombre, "rb") as archivo:
+                if simular:
+                    sha256 = documentos.hash_archivo(archivo)
+                    documento = None
+                else:
+                    documento = documentos.almacenar(File(archivo, name=nombre))
+                    sha256 = documento.sha256
+            if sha256 in vistos:
+                repetidas += 1
+                bytes_liberados += default_storage.size(nombre)
+            vistos.add(sha256)
+            migradas += 1
+            if simular:
+                continue
+
+            Licencia.objects.filter(pk=licencia_id).update(documento=documento, archivo=documento.archivo.name)
+            empresas.add(empresa_id)
+            if nombre != documento.archivo.name and not Licencia.objects.filter(archivo=nombre).exists():
+                default_storage.delete(nombre)
+
+        self.stdout.write(
+            f"Licencias {'revisadas' if simular else 'migradas'}: {migradas} "
+            f"(repetidas: {repetidas}, archivos faltantes: {faltantes}, "
+            f"espacio {'recuperable' if simular else 'recuperado'}: {bytes_liberados / 1024 / 1024:.1f} MB)"
+        )
+        if simular:
+            return
+
+        versiones.incrementar("licencias", *empresas)
+        recontar_referencias()
+        if options["purgar"]:
+            limite = timezone.now() - timedelta(hours=options["antiguedad_horas"])
+            purgados = sum(
+                documentos.eliminar(documento)
+                for documento in DocumentoAlmacenado.objects.filter(referencias=0, creado_en__lt=limite).iterator()
+            )
+            self.stdout.write(f"Documentos sin uso eliminados: {purgados}")
+        self.stdout.write(self.style.SUCCESS("Referencias recalculadas."))
@@ -0,0 +1,45 @@
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from login.importacion import ImportacionUsuarios, comprobar_csv, leer_csv
+
+
+class Command(BaseCommand):
+    help = "Importa trabajadores y usuarios desde un CSV (mismas columnas que api/rrhh/usuarios/importar/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del CSV (UTF-8, separado por ',' o ';').")
+        parser.add_argument("--empresa", type=int, help="Empresa para las filas sin empresa_id.")
+        parser.add_argument("--procesos", type=int, help="Procesos para hashear contrasenas (por defecto, CPUs).")
+        parser.add_argument("--lote", type=int, default=500, help="Filas por lote/transaccion.")
+        parser.add_argument("--reporte", help="Guardar el detalle de errores en este archivo JSON.")
+
+    def handle(self, *args, **options):
+        importacion = ImportacionUsuarios(
+            empresa_id=options["empresa"],
+            procesos=options["procesos"] or os.cpu_count(),
+            tamano_lote=options["lote"],
+        )
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                comprobar_csv(archivo)
+                reporte = importacion.ejecutar(leer_csv(archivo))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f"El archivo debe ser un CSV en UTF-8: {exc}")
+
+        if options["reporte"]:
+            with open(options["reporte"], "w", encoding="utf-8") as salida:
+                json.dump(reporte, salida, ensure_ascii=False, indent=2, default=str)
+        else:
+            for error in reporte["errores"]:
+                self.stdout.write(f"Fila {error['fila']} ({error['rut']}): {json.dumps(error['errores'], ensure_ascii=False, default=str)}")
+
+        estilo = self.style.SUCCESS if not reporte["con_errores"] else self.style.WARNING
+        self.stdout.write(
+            estilo(f"Filas: {reporte['total']}  creados: {reporte['creados']}  con errores: {reporte['con_errores']}")
+        )
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from login import particiones
+from login.models import Marcas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene el particionado mensual de Marcas en MySQL: crea por adelantado las particiones "
+        "de los proximos meses y retira las vencidas que archivar_marcas ya vacio. Programarlo una "
+        "vez al dia o a la semana. --convertir es EXPERIMENTAL: no se ha probado contra una base "
+        "MySQL real; ensayarlo con --simular y en una copia de la base antes de usarlo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convertir", action="store_true",
+                            help="EXPERIMENTAL. Particionar la tabla por primera vez (reescribe la tabla "
+                                 "completa).")
+        parser.add_argument("--meses-adelante", type=int, default=3,
+                            help="Meses futuros que deben tener particion propia (def. 3).")
+        parser.add_argument("--retener-meses", type=int, default=None,
+                            help="Retirar las particiones de meses anteriores a este numero de meses, si "
+                                 "estan vacias. Sin esta opcion no se retira nada.")
+        parser.add_argument("--simular", action="store_true", help="Mostrar las sentencias sin ejecutarlas.")
+
+    def handle(self, *args, **options):
+        if not particiones.soportado():
+            self.stdout.write(
+                f"Motor {connection.vendor}: Marcas se mantiene como tabla sin particiones; nada que hacer."
+            )
+            return
+
+        hoy = timezone.now().date()
+        hasta = particiones.inicio_mes(hoy, options["meses_adelante"] + 1)
+        actuales = particiones.particiones()
+
+        if not actuales:
+            if not options["convertir"]:
+                raise CommandError("Marcas no esta particionada; use --convertir para particionarla.")
+            self.stderr.write(self.style.WARNING(
+                "--convertir es experimental: no se ha probado contra MySQL. Ensayarlo antes en una copia."
+            ))
+            primera = Marcas.objects.aggregate(primera=Min("timestamp"))["primera"]
+            desde = particiones.inicio_mes(primera.date() if primera else hoy)
+            self._ejecutar(particiones.sql_particionar(desde, hasta), options)
+        elif options["convertir"]:
+            self.stdout.write("Marcas ya esta particionada.")
+
+        self._ejecutar(particiones.sql_crear_futuras(particiones.particiones(), hasta), options)
+
+        if options["retener_meses"] is not None:
+            limite = particiones.inicio_mes(hoy, -options["retener_meses"])
+            for particion in particiones.vencidas(particiones.particiones(), limite):
+                if particiones.tiene_filas(particion):
+                    # Sus filas aun se leen en listados, resumenes, verificaciones y raices de Merkle.
+                    self.stderr.write(
+                        f"Se mantiene {particion.nombre}: tiene marcas sin archivar (ejecutar archivar_marcas)."
+                    )
+                    continue
+                self.stdout.write(f"Retirando {particion.nombre}")
+                self._ejecutar(particiones.sql_retirar(particion), options)
+
+        for particion in particiones.particiones():
+            self.stdout.write(f"  {particion.nombre:<8} hasta {particion.hasta or 'MAXVALUE'}  ~{particion.filas} marcas")
+
+    def _ejecutar(self, sentencias, options):
+        for sql in sentencias:
+            self.stdout.write(sql)
+            if not options["simular"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from login.importacion import ejecutar_importacion, tomar_siguiente_importacion
+
+
+class Command(BaseCommand):
+    help = "Worker local de la cola de importaciones de usuarios (tabla import_jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos para hashear contrasenas (por defecto, uno por CPU).")
+        parser.add_argument("--intervalo", type=float, default=5.0,
+                            help="Segundos de espera cuando no hay importaciones pendientes.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Procesa las importaciones pendientes y termina.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = tomar_siguiente_importacion()
+            if job is None:
+                if options["una_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Procesando {job}")
+            try:
+                ejecutar_importacion(job, procesos=options["procesos"])
+            except Exception as exc:
+                self.stderr.write(self.style.ERROR(f"Importacion #{job.id} fallo: {exc}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Importacion #{job.id} lista: {job.creados} creados, {job.con_errores} con errores"
+                ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from login.reportes import ejecutar_job, tomar_siguiente_job
+
+
+class Command(BaseCommand):
+    help = "Worker local de la cola de reportes (tabla report_jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos para renderizar (por defecto, uno por CPU).")
+        parser.add_argument("--intervalo", type=float, default=5.0,
+                            help="Segundos de espera cuando no hay trabajos pendientes.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Procesa los trabajos pendientes y termina.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = tomar_siguiente_job()
+            if job is None:
+                if options["una_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Procesando {job}")
+            try:
+                ejecutar_job(job, procesos=options["procesos"])
+            except Exception as exc:
+                self.stderr.write(self.style.ERROR(f"Reporte #{job.id} fallo: {exc}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Reporte #{job.id} listo: {job.archivo.name}"))
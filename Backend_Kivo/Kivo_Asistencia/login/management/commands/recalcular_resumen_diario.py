@@ -0,0 +1,95 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from login import archivo_marcas
+from login.models import Marcas, ResumenDiario, Trabajador
+from login.resumen import JORNADA_MAXIMA, agrupar_por_jornada
+
+
+class Command(BaseCommand):
+    help = "Reconstruye ResumenDiario para un rango de fechas a partir de Marcas y de las marcas archivadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", required=True, help="Fecha inicial YYYY-MM-DD (inclusive).")
+        parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (inclusive). Por defecto, hoy.")
+        parser.add_argument("--empresa", type=int, help="Limitar a una empresa.")
+        parser.add_argument("--trabajador", type=int, action="append", dest="trabajadores",
+                            help="Limitar a un trabajador (se puede repetir).")
+        parser.add_argument("--lote", type=int, default=200, help="Trabajadores por transaccion.")
+
+    def handle(self, *args, **options):
+        desde = parse_date(options["desde"])
+        hasta = parse_date(options["hasta"]) if options["hasta"] else timezone.localdate()
+        if not desde or not hasta or hasta < desde:
+            raise CommandError("Rango de fechas invalido.")
+
+        trabajadores = Trabajador.objects.select_related("turno").order_by("id")
+        if options["empresa"]:
+            trabajadores = trabajadores.filter(empresa_id=options["empresa"])
+        if options["trabajadores"]:
+            trabajadores = trabajadores.filter(id__in=options["trabajadores"])
+
+        # Margen para las jornadas que cruzan medianoche en los extremos del rango.
+        tz = timezone.get_current_timezone()
+        self.desde, self.hasta = desde, hasta
+        self.inicio = timezone.make_aware(datetime.combine(desde, time.min), tz) - JORNADA_MAXIMA
+        self.fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min), tz) + JORNADA_MAXIMA
+        # Las marcas archivadas se buscan por trabajador solo si hay meses archivados en el rango.
+        filtro = archivo_marcas.Filtro(
+            empresas=[options["empresa"]] if options["empresa"] else None, inicio=self.inicio, fin=self.fin
+        )
+        self.con_archivo = bool(archivo_marcas.periodos(filtro))
+
+        lote = []
+        total = 0
+        for trabajador in trabajadores.iterator(chunk_size=options["lote"]):
+            lote.append(trabajador)
+            if len(lote) >= options["lote"]:
+                total += self._procesar(lote)
+                lote = []
+        if lote:
+            total += self._procesar(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"Resumenes diarios recalculados: {total}"))
+
+    def _procesar(self, trabajadores):
+        por_id = {trabajador.id: trabajador for trabajador in trabajadores}
+        marcas = (
+            Marcas.objects.filter(trabajador_id__in=por_id, timestamp__gte=self.inicio, timestamp__lt=self.fin)
+            .order_by("trabajador_id", "timestamp", "id")
+            .values_list("trabajador_id", "timestamp", "id", "tipo_marca")
+        )
+
+        resumenes = []
+        sin_marcas = set(por_id)
+        for trabajador_id, filas in groupby(marcas.iterator(chunk_size=5000), key=lambda fila: fila[0]):
+            sin_marcas.discard(trabajador_id)
+            resumenes.extend(self._resumenes(por_id[trabajador_id], (fila[1:] for fila in filas)))
+        if self.con_archivo:
+            # Los que en el rango solo tienen marcas archivadas.
+            for trabajador_id in sorted(sin_marcas):
+                resumenes.extend(self._resumenes(por_id[trabajador_id], ()))
+
+        with transaction.atomic():
+            ResumenDiario.objects.filter(
+                trabajador_id__in=por_id, fecha__gte=self.desde, fecha__lte=self.hasta
+            ).delete()
+            ResumenDiario.objects.bulk_create(resumenes, batch_size=1000)
+        return len(resumenes)
+
+    def _resumenes(self, trabajador, filas):
+        """Resumenes del rango a partir de filas (timestamp, id, tipo_marca) de la tabla y del archivo."""
+        if self.con_archivo:
+            filas = heapq.merge(filas, archivo_marcas.marcas_trabajador(trabajador.id, self.inicio, self.fin))
+        dias = agrupar_por_jornada((ts, tipo) for ts, _, tipo in filas)
+        return [
+            ResumenDiario.calcular(trabajador, fecha, marcas_dia)
+            for fecha, marcas_dia in sorted(dias.items())
+            if self.desde <= fecha <= self.hasta
+        ]
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from login.models import EstadoJornada, Marcas, Trabajador
+
+
+class Command(BaseCommand):
+    help = "Recalcula EstadoJornada de cada trabajador a partir del historial de Marcas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabajador", type=int, action="append", dest="trabajadores",
+                            help="ID de trabajador a recalcular (se puede repetir).")
+        parser.add_argument("--lote", type=int, default=1000, help="Filas por insercion.")
+
+    def handle(self, *args, **options):
+        trabajadores = Trabajador.objects.all()
+        if options["trabajadores"]:
+            trabajadores = trabajadores.filter(id__in=options["trabajadores"])
+
+        ultimas = Marcas.objects.filter(trabajador=OuterRef("pk")).order_by("-timestamp", "-id")
+        ultima_entrada = ultimas.filter(tipo_marca="entrada")
+        filas = (
+            trabajadores.annotate(
+                ultima_marca_pk=Subquery(ultimas.values("id")[:1]),
+                ultima_marca_tipo=Subquery(ultimas.values("tipo_marca")[:1]),
+                ultima_marca_ts=Subquery(ultimas.values("timestamp")[:1]),
+                ultima_entrada_ts=Subquery(ultima_entrada.values("timestamp")[:1]),
+            )
+            .filter(ultima_marca_pk__isnull=False)
+            .values_list("id", "ultima_marca_pk", "ultima_marca_tipo", "ultima_marca_ts", "ultima_entrada_ts")
+        )
+
+        lote = options["lote"]
+        total = 0
+        with transaction.atomic():
+            # NOT EXISTS y no NOT IN: una sola marca con trabajador_id NULL haria que
+            # NOT IN no coincida con ninguna fila.
+            sin_marcas = EstadoJornada.objects.filter(trabajador__in=trabajadores).exclude(
+                Exists(Marcas.objects.filter(trabajador_id=OuterRef("trabajador_id")))
+            )
+            sin_marcas.delete()
+
+            pendientes = []
+            for trabajador_id, marca_id, tipo, ts, inicio in filas.iterator(chunk_size=lote):
+                pendientes.append(
+                    EstadoJornada(
+                        trabajador_id=trabajador_id,
+                        ultima_marca_id=marca_id,
+                        ultimo_tipo=tipo,
+                        ultimo_timestamp=ts,
+                        entrada_abierta=tipo == "entrada",
+                        inicio_jornada=inicio,
+                    )
+                )
+                if len(pendientes) >= lote:
+                    total += self._guardar(pendientes)
+                    pendientes = []
+            if pendientes:
+                total += self._guardar(pendientes)
+
+        self.stdout.write(self.style.SUCCESS(f"Estados de jornada recalculados: {total}"))
+
+    def _guardar(self, estados):
+        EstadoJornada.objects.bulk_create(
+            estados,
+            update_conflicts=True,
+            unique_fields=["trabajador"],
+            update_fields=[
+                "ultima_marca",
+                "ultimo_tipo",
+                "ultimo_timestamp",
+                "entrada_abierta",
+                "inicio_jornada",
+                "actualizado_en",
+            ],
+        )
+        return len(estados)
@@ -0,0 +1,39 @@
+import glob
+import os
+import re
+
+from django.core.management.base import BaseCommand
+
+from login.auditoria import directorio_spool, insertar, leer_spool
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Command(BaseCommand):
+    help = "Reinserta en AuditoriaCambio los registros del spool de auditoria de procesos terminados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--todos", action="store_true",
+                            help="Incluir spools de procesos que siguen vivos (p. ej. de otro host).")
+
+    def handle(self, *args, **options):
+        total = 0
+        for ruta in sorted(glob.glob(os.path.join(directorio_spool(), "auditoria-*.jsonl"))):
+            pid = int(re.search(r"auditoria-(\d+)\.jsonl$", ruta).group(1))
+            if pid == os.getpid() or (not options["todos"] and _proceso_vivo(pid)):
+                continue
+            entradas = leer_spool(ruta)
+            if entradas:
+                insertar(entradas)
+            os.remove(ruta)
+            total += len(entradas)
+            self.stdout.write(f"{os.path.basename(ruta)}: {len(entradas)} registros")
+        self.stdout.write(self.style.SUCCESS(f"Registros recuperados: {total}"))
@@ -0,0 +1,99 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from login.models import Empresa, VerificacionMarcas
+from login.verificacion import ESTADOS_REANUDABLES, VerificadorMarcas, tomar_siguiente_verificacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el hash de las marcas y lo compara con el guardado. Registra un punto de control "
+        "por bloque: una corrida interrumpida se continua con --reanudar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, default=None, help="Verificar solo las marcas de esta empresa.")
+        parser.add_argument("--incremental", action="store_true",
+                            help="Solo las marcas creadas despues de la ultima corrida sin discrepancias.")
+        parser.add_argument("--reanudar", type=int, nargs="?", const=0, default=None, metavar="ID",
+                            help="Continuar la corrida ID, o sin ID la ultima interrumpida del mismo alcance.")
+        parser.add_argument("--pendientes", action="store_true",
+                            help="Procesar las verificaciones solicitadas por la API y terminar.")
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos para calcular hashes (por defecto, uno por CPU).")
+        parser.add_argument("--tamano-bloque", type=int, default=5000, help="Marcas por bloque (def. 5000).")
+        parser.add_argument("--intervalo", type=float, default=5.0,
+                            help="Segundos minimos entre lineas de progreso (def. 5).")
+
+    def handle(self, *args, **options):
+        if options["pendientes"]:
+            while (verificacion := tomar_siguiente_verificacion()) is not None:
+                try:
+                    self._ejecutar(verificacion, options)
+                except Exception as exc:
+                    self.stderr.write(self.style.ERROR(f"Verificacion #{verificacion.id} fallo: {exc}"))
+            return
+
+        if options["reanudar"] is not None:
+            verificacion = self._a_reanudar(options["reanudar"], options["empresa"])
+        else:
+            if options["empresa"] and not Empresa.objects.filter(id=options["empresa"]).exists():
+                raise CommandError(f"No existe la empresa {options['empresa']}")
+            verificacion = VerificacionMarcas.objects.create(
+                empresa_id=options["empresa"], incremental=options["incremental"]
+            )
+        if self._ejecutar(verificacion, options).discrepancias:
+            raise CommandError(f"Verificacion #{verificacion.id}: {verificacion.discrepancias} discrepancias")
+
+    def _a_reanudar(self, verificacion_id, empresa_id):
+        qs = VerificacionMarcas.objects.filter(estado__in=ESTADOS_REANUDABLES)
+        if verificacion_id:
+            verificacion = qs.filter(id=verificacion_id).first()
+        else:
+            verificacion = qs.filter(empresa_id=empresa_id).order_by("-creado_en", "-id").first()
+        if verificacion is None:
+            raise CommandError("No hay una verificacion para reanudar")
+        return verificacion
+
+    def _ejecutar(self, verificacion, options):
+        ultima_linea = [0.0]
+
+        def progreso(v, velocidad):
+            ahora = time.monotonic()
+            if ahora - ultima_linea[0] < options["intervalo"] and v.ultimo_id < v.hasta_id:
+                return
+            ultima_linea[0] = ahora
+            avance = f"{v.revisadas / v.total:.1%}" if v.total else "-"
+            restante = (v.total - v.revisadas) / velocidad if velocidad else 0
+            self.stdout.write(
+                f"  {avance} {v.revisadas}/{v.total} marcas, {velocidad:,.0f} marcas/s, "
+                f"discrepancias: {v.discrepancias}, restante ~{restante:.0f} s"
+            )
+
+        self.stdout.write(f"Procesando {verificacion}")
+        verificador = VerificadorMarcas(
+            verificacion, procesos=options["procesos"], tamano_bloque=options["tamano_bloque"], progreso=progreso
+        )
+        try:
+            verificador.ejecutar()
+        except KeyboardInterrupt:
+            self.stderr.write(
+                f"Verificacion #{verificacion.id} interrumpida en el id {verificacion.ultimo_id}; "
+                f"continuar con --reanudar {verificacion.id}"
+            )
+            raise CommandError("Interrumpida") from None
+
+        v = verificacion
+        promedio = v.revisadas / v.segundos if v.segundos else 0
+        resumen = (
+            f"Verificacion #{v.id}: {v.revisadas} marcas (ids {v.desde_id + 1}-{v.hasta_id}) en "
+            f"{v.segundos:.1f} s, {promedio:,.0f} marcas/s, discrepancias: {v.discrepancias}"
+        )
+        if v.discrepancias:
+            self.stderr.write(self.style.ERROR(resumen))
+            for marca_id in v.detalle_discrepancias.order_by("marca_id").values_list("marca_id", flat=True)[:20]:
+                self.stderr.write(f"  marca #{marca_id}")
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
+        return v
@@ -0,0 +1,154 @@
+"""
+Arboles de Merkle diarios sobre los hashes de las marcas de cada empresa.
+
+Las hojas son los Marcas.hash del dia local ordenados por (timestamp, id), incluidas las
+marcas ya archivadas (archivo_marcas). Hojas y nodos
+internos se hashean con prefijos distintos (0x00 y 0x01, como RFC 6962) para que una hoja
+no pueda hacerse pasar por un nodo. Un nodo sin pareja sube tal cual al nivel siguiente.
+
+Con la raiz publicada, una prueba de inclusion de una marca son los hermanos de su camino
+hasta la raiz: verificarla cuesta log2(n) hashes en vez de recalcular todo el dia.
+"""
+
+import hashlib
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from . import archivo_marcas
+from .models import Marcas, RaizMerkle
+
+VACIO = hashlib.sha256(b"").hexdigest()
+
+
+def hoja(hash_hex):
+    return hashlib.sha256(b"\x00" + bytes.fromhex(hash_hex)).digest()
+
+
+def nodo(izquierda, derecha):
+    return hashlib.sha256(b"\x01" + izquierda + derecha).digest()
+
+
+def niveles(hashes):
+    """Niveles del arbol desde las hojas hasta la raiz (lista de listas de bytes)."""
+    nivel = [hoja(h) for h in hashes]
+    resultado = [nivel]
+    while len(nivel) > 1:
+        siguiente = [nodo(nivel[i], nivel[i + 1]) for i in range(0, len(nivel) - 1, 2)]
+        if len(nivel) % 2:
+            siguiente.append(nivel[-1])
+        nivel = siguiente
+        resultado.append(nivel)
+    return resultado
+
+
+def raiz(arbol):
+    return arbol[-1][0].hex() if arbol[0] else VACIO
+
+
+def prueba(arbol, indice):
+    """Hermanos del camino de la hoja `indice` a la raiz: [{"hash", "lado"}], de abajo hacia arriba."""
+    pasos = []
+    for nivel in arbol[:-1]:
+        hermano = indice ^ 1
+        if hermano < len(nivel):
+            pasos.append({"hash": nivel[hermano].hex(), "lado": "izquierda" if hermano < indice else "derecha"})
+        indice //= 2
+    return pasos
+
+
+def verificar_prueba(hash_hex, pasos, raiz_hex):
+    actual = hoja(hash_hex)
+    for paso in pasos:
+        hermano = bytes.fromhex(paso["hash"])
+        actual = nodo(hermano, actual) if paso["lado"] == "izquierda" else nodo(actual, hermano)
+    return actual.hex() == raiz_hex
+
+
+def rango_dia(fecha):
+    """[inicio, fin) del dia local `fecha`."""
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min), tz)
+    fin = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min), tz)
+    return inicio, fin
+
+
+def marcas_del_dia(empresa_id, fecha):
+    """[(id, hash)] de las marcas de la empresa en el dia, de la tabla y del archivo, en el orden de las hojas."""
+    inicio, fin = rango_dia(fecha)
+    tabla = (
+        Marcas.objects.filter(empresa_id=empresa_id, timestamp__gte=inicio, timestamp__lt=fin)
+        .order_by("timestamp", "id")
+        .values_list("timestamp", "id", "hash")
+    )
+    filtro = archivo_marcas.Filtro(empresas=[empresa_id], inicio=inicio, fin=fin)
+    archivadas = ((fila[1], fila[0], fila[4]) for fila in archivo_marcas.iterar(filtro))
+    return [(marca_id, hash_hex) for _, marca_id, hash_hex in heapq.merge(tabla, archivadas)]
+
+
+def empresas_con_marcas(fecha):
+    """Empresas con marcas en el dia en la tabla o con el mes archivado (puede no tener marcas ese dia)."""
+    inicio, fin = rango_dia(fecha)
+    filtro = archivo_marcas.Filtro(inicio=inicio, fin=fin)
+    archivadas = set()
+    for periodo in archivo_marcas.periodos(filtro):
+        archivadas.add(periodo.empresa_id)
+        archivadas.update(periodo.movidos.values())
+    return archivadas | set(
+        Marcas.objects.filter(timestamp__gte=inicio, timestamp__lt=fin, empresa__isnull=False)
+        .order_by()
+        .values_list("empresa_id", flat=True)
+        .distinct()
+    )
+
+
+def construir_dia(empresa_id, fecha):
+    """
+    Calcula la raiz del dia y la guarda si no existia. Si existia y cambio la deja
+    `alterada`; una raiz alterada que vuelve a coincidir queda vigente otra vez.
+    Devuelve (RaizMerkle, "creada" | "igual" | "alterada").
+    """
+    hashes = [h for _, h in marcas_del_dia(empresa_id, fecha)]
+    calculada = raiz(niveles(hashes))
+    ahora = timezone.now()
+    existente = RaizMerkle.objects.filter(empresa_id=empresa_id, fecha=fecha).first()
+    if existente is None:
+        if not hashes:
+            return None, "igual"
+        creada = RaizMerkle.objects.create(
+            empresa_id=empresa_id, fecha=fecha, raiz=calculada, hojas=len(hashes), verificada_en=ahora
+        )
+        return creada, "creada"
+
+    if calculada == existente.raiz and len(hashes) == existente.hojas:
+        existente.estado = "vigente"
+        existente.raiz_recalculada = existente.hojas_recalculadas = None
+        resultado = "igual"
+    else:
+        existente.estado = "alterada"
+        existente.raiz_recalculada = calculada
+        existente.hojas_recalculadas = len(hashes)
+        resultado = "alterada"
+    existente.verificada_en = ahora
+    existente.save(update_fields=["estado", "raiz_recalculada", "hojas_recalculadas", "verificada_en"])
+    return existente, resultado
+
+
+def prueba_inclusion(marca_id, empresa_id, fecha):
+    """
+    Prueba de inclusion de la marca en el arbol de su dia, calculada con los hashes
+    actuales, o None si la marca no esta entre ellos.
+    """
+    filas = marcas_del_dia(empresa_id, fecha)
+    indice = next((i for i, (id_, _) in enumerate(filas) if id_ == marca_id), None)
+    if indice is None:
+        return None
+    arbol = niveles([h for _, h in filas])
+    return {
+        "indice": indice,
+        "hojas": len(filas),
+        "hash": filas[indice][1],
+        "prueba": prueba(arbol, indice),
+        "raiz": raiz(arbol),
+    }
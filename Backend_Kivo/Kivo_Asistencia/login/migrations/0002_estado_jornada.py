@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoJornada',
+            fields=[
+                ('trabajador', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado_jornada', serialize=False, to='login.trabajador')),
+                ('ultimo_tipo', models.CharField(blank=True, choices=[('entrada', 'Entrada'), ('salida', 'Salida')], max_length=10, null=True)),
+                ('ultimo_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('entrada_abierta', models.BooleanField(default=False)),
+                ('inicio_jornada', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('ultima_marca', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='login.marcas')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0002_estado_jornada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcas',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, help_text='Clave generada por el cliente para marcas sincronizadas sin conexion', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='marcas',
+            constraint=models.UniqueConstraint(fields=('trabajador', 'clave_idempotencia'), name='marca_clave_idempotencia_unica'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0003_marcas_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marcas',
+            index=models.Index(fields=['timestamp', 'id'], name='marca_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marcas',
+            index=models.Index(fields=['trabajador', 'timestamp', 'id'], name='marca_trab_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0004_marcas_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('libro_asistencia_pdf', 'Libro de asistencia mensual (PDF)')], default='libro_asistencia_pdf', max_length=30)),
+                ('anio', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='reportes/')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('total_trabajadores', models.PositiveIntegerField(default=0)),
+                ('procesados', models.PositiveIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reportes', to='login.empresa')),
+                ('solicitado_por', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reportes_solicitados', to='login.usuario')),
+            ],
+            options={
+                'db_table': 'report_jobs',
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='report_job_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0005_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('primera_entrada', models.DateTimeField(blank=True, null=True)),
+                ('ultima_salida', models.DateTimeField(blank=True, null=True)),
+                ('minutos_trabajados', models.PositiveIntegerField(default=0)),
+                ('minutos_atraso', models.PositiveIntegerField(default=0)),
+                ('minutos_extra', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='login.trabajador')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'trabajador'], name='resumen_fecha_trab_idx')],
+                'constraints': [models.UniqueConstraint(fields=('trabajador', 'fecha'), name='resumen_trabajador_fecha_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0006_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Se incrementa para invalidar los tokens emitidos'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+from login.normalizacion import normalizar_email, normalizar_rut, normalizar_texto
+
+
+def poblar_columnas_busqueda(apps, schema_editor):
+    Trabajador = apps.get_model("login", "Trabajador")
+    Usuario = apps.get_model("login", "Usuario")
+
+    lote = []
+    for t in Trabajador.objects.only("id", "rut", "nombres", "apellidos").iterator(chunk_size=2000):
+        t.rut_normalizado = normalizar_rut(t.rut)
+        t.nombre_busqueda = normalizar_texto(t.nombres, t.apellidos)
+        t.apellido_busqueda = normalizar_texto(t.apellidos, t.nombres)
+        lote.append(t)
+        if len(lote) >= 2000:
+            Trabajador.objects.bulk_update(lote, ["rut_normalizado", "nombre_busqueda", "apellido_busqueda"])
+            lote = []
+    Trabajador.objects.bulk_update(lote, ["rut_normalizado", "nombre_busqueda", "apellido_busqueda"])
+
+    lote = []
+    for u in Usuario.objects.only("id", "rut", "email").iterator(chunk_size=2000):
+        u.rut_normalizado = normalizar_rut(u.rut)
+        u.email_normalizado = normalizar_email(u.email)
+        lote.append(u)
+        if len(lote) >= 2000:
+            Usuario.objects.bulk_update(lote, ["rut_normalizado", "email_normalizado"])
+            lote = []
+    Usuario.objects.bulk_update(lote, ["rut_normalizado", "email_normalizado"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0007_usuario_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajador',
+            name='apellido_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='trabajador',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='trabajador',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='email_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.RunPython(poblar_columnas_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0008_columnas_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditoriacambio',
+            name='clave',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
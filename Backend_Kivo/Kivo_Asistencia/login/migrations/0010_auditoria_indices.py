@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0009_auditoria_clave'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditoriacambio',
+            index=models.Index(fields=['empresa', 'fecha', 'id'], name='audit_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriacambio',
+            index=models.Index(fields=['empresa', 'accion', 'fecha', 'id'], name='audit_emp_accion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriacambio',
+            index=models.Index(fields=['empresa', 'modelo_afectado', 'fecha', 'id'], name='audit_emp_modelo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriacambio',
+            index=models.Index(fields=['usuario', 'fecha', 'id'], name='audit_usuario_fecha_idx'),
+        ),
+    ]
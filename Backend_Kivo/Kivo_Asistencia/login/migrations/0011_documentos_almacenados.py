@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0010_auditoria_indices'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='licencia',
+            name='archivo',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to='licencias_pdfs/'),
+        ),
+        migrations.CreateModel(
+            name='DocumentoAlmacenado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.FileField(max_length=255, upload_to='')),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('tipo_contenido', models.CharField(blank=True, default='', max_length=100)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'documentos_almacenados',
+                'indexes': [models.Index(fields=['referencias'], name='documento_referencias_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='licencia',
+            name='documento',
+            field=models.ForeignKey(blank=True, help_text='Contenido de `archivo`; archivo.name apunta a la misma ruta', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='licencias', to='login.documentoalmacenado'),
+        ),
+    ]
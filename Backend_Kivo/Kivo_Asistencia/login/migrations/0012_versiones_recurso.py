@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0011_documentos_almacenados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionRecurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(max_length=40)),
+                ('empresa_id', models.BigIntegerField(help_text='Empresa de las filas; sin FK para sobrevivir a su borrado')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'versiones_recurso',
+                'constraints': [models.UniqueConstraint(fields=('recurso', 'empresa_id'), name='version_recurso_unica')],
+            },
+        ),
+    ]
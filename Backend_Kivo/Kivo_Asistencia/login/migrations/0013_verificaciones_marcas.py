@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0012_versiones_recurso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificacionMarcas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('incremental', models.BooleanField(default=False)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('interrumpida', 'Interrumpida'), ('completada', 'Completada'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('desde_id', models.PositiveBigIntegerField(default=0, help_text='Se verifican las marcas con id mayor')),
+                ('hasta_id', models.PositiveBigIntegerField(blank=True, help_text='Mayor id al iniciar la corrida', null=True)),
+                ('ultimo_id', models.PositiveBigIntegerField(default=0)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('revisadas', models.PositiveBigIntegerField(default=0)),
+                ('discrepancias', models.PositiveIntegerField(default=0)),
+                ('segundos', models.FloatField(default=0, help_text='Tiempo de proceso acumulado entre reanudaciones')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(blank=True, help_text='Vacio: todas las marcas', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='verificaciones_marcas', to='login.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='verificaciones_solicitadas', to='login.usuario')),
+            ],
+            options={
+                'db_table': 'verificaciones_marcas',
+            },
+        ),
+        migrations.CreateModel(
+            name='DiscrepanciaMarca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca_id', models.BigIntegerField(help_text='Sin FK: el reporte debe sobrevivir a cambios en la marca')),
+                ('hash_guardado', models.CharField(max_length=64)),
+                ('hash_calculado', models.CharField(max_length=64)),
+                ('verificacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalle_discrepancias', to='login.verificacionmarcas')),
+            ],
+            options={
+                'db_table': 'discrepancias_marcas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='verificacionmarcas',
+            index=models.Index(fields=['estado', 'creado_en'], name='verif_marcas_estado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='discrepanciamarca',
+            constraint=models.UniqueConstraint(fields=('verificacion', 'marca_id'), name='discrepancia_marca_unica'),
+        ),
+    ]
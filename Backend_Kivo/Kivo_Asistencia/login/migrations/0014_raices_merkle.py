@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0013_verificaciones_marcas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RaizMerkle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('raiz', models.CharField(max_length=64)),
+                ('hojas', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('vigente', 'Vigente'), ('alterada', 'Alterada')], default='vigente', max_length=10)),
+                ('raiz_recalculada', models.CharField(blank=True, max_length=64, null=True)),
+                ('hojas_recalculadas', models.PositiveIntegerField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('verificada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='raices_merkle', to='login.empresa')),
+            ],
+            options={
+                'db_table': 'raices_merkle',
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'fecha'), name='raiz_merkle_empresa_fecha_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+LOTE = 20000
+
+
+def poblar_empresa(apps, schema_editor):
+    """Copia trabajador.empresa_id en lotes por rango de id, un UPDATE por lote."""
+    Trabajador = apps.get_model("login", "Trabajador")
+    empresa = Subquery(Trabajador.objects.filter(pk=OuterRef("trabajador_id")).values("empresa_id")[:1])
+    for nombre in ("Marcas", "Licencia", "Vacaciones"):
+        modelo = apps.get_model("login", nombre)
+        maximo = modelo.objects.aggregate(maximo=Max("id"))["maximo"] or 0
+        for inicio in range(0, maximo, LOTE):
+            modelo.objects.filter(
+                id__gt=inicio, id__lte=inicio + LOTE, trabajador__isnull=False, empresa__isnull=True
+            ).update(empresa_id=empresa)
+
+
+class Migration(migrations.Migration):
+    # Cada lote del poblado se confirma por separado en tablas grandes.
+    atomic = False
+
+    dependencies = [
+        ('login', '0014_raices_merkle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licencia',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Copia de trabajador.empresa para filtrar por empresa sin join', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='licencias', to='login.empresa'),
+        ),
+        migrations.AddField(
+            model_name='marcas',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Copia de trabajador.empresa para filtrar por empresa sin join', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='marcas', to='login.empresa'),
+        ),
+        migrations.AddField(
+            model_name='vacaciones',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Copia de trabajador.empresa para filtrar por empresa sin join', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='vacaciones', to='login.empresa'),
+        ),
+        migrations.RunPython(poblar_empresa, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(fields=['empresa', 'fecha_inicio'], name='licencia_emp_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(fields=['trabajador', 'fecha_inicio'], name='licencia_trab_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marcas',
+            index=models.Index(fields=['empresa', 'timestamp', 'id'], name='marca_emp_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacaciones',
+            index=models.Index(fields=['empresa', 'fecha_inicio'], name='vacaciones_emp_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacaciones',
+            index=models.Index(fields=['trabajador', 'fecha_inicio'], name='vacaciones_trab_inicio_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0015_empresa_denormalizada'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='estadojornada',
+            name='ultima_marca',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='login.marcas'),
+        ),
+        migrations.AlterField(
+            model_name='marcas',
+            name='empresa',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, help_text='Copia de trabajador.empresa para filtrar por empresa sin join', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='marcas', to='login.empresa'),
+        ),
+        migrations.AlterField(
+            model_name='marcas',
+            name='trabajador',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='login.trabajador'),
+        ),
+        # Despues de quitar las FK: en MySQL el indice unico podia respaldar la de trabajador.
+        migrations.RemoveConstraint(
+            model_name='marcas',
+            name='marca_clave_idempotencia_unica',
+        ),
+        migrations.AddConstraint(
+            model_name='marcas',
+            constraint=models.UniqueConstraint(fields=('trabajador', 'clave_idempotencia', 'timestamp'), name='marca_clave_idempotencia_ts_unica'),
+        ),
+    ]
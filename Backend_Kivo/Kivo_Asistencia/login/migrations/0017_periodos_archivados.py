@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0016_marcas_particionables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodoArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('archivo', models.CharField(help_text="Ruta relativa a ARCHIVO_MARCAS['DIRECTORIO']", max_length=255)),
+                ('sha256', models.CharField(max_length=64)),
+                ('filas', models.PositiveIntegerField()),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('archivado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='periodos_archivados', to='login.empresa')),
+            ],
+            options={
+                'db_table': 'periodos_archivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrabajadorArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trabajador_id', models.BigIntegerField()),
+                ('filas', models.PositiveIntegerField()),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajadores', to='login.periodoarchivado')),
+            ],
+            options={
+                'db_table': 'trabajadores_archivados',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='periodoarchivado',
+            constraint=models.UniqueConstraint(fields=('empresa', 'anio', 'mes'), name='periodo_archivado_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='trabajadorarchivado',
+            constraint=models.UniqueConstraint(fields=('trabajador_id', 'periodo'), name='trabajador_archivado_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0017_periodos_archivados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificacionmarcas',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, help_text='Ultimo avance registrado'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0018_verificacion_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificacionmarcas',
+            name='ultimo_periodo_id',
+            field=models.PositiveBigIntegerField(default=0, help_text='Ultimo PeriodoArchivado verificado; se recorren por id despues de la tabla'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0019_verificacion_periodos_archivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='importaciones/')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('con_errores', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(blank=True, help_text='Empresa para las filas sin empresa_id', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='importaciones', to='login.empresa')),
+                ('solicitado_por', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='importaciones_solicitadas', to='login.usuario')),
+            ],
+            options={
+                'db_table': 'import_jobs',
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='import_job_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:58
+
+import os
+
+from django.db import migrations, models
+
+
+def poblar_rango_ids(apps, schema_editor):
+    """
+    Lee la columna id de cada archivo. Si el archivo no esta en este servidor, el rango
+    queda nulo y archivo_marcas.buscar() lo sigue abriendo.
+    """
+    from login.archivo_marcas import ArchivoMarcas, ruta_absoluta
+
+    PeriodoArchivado = apps.get_model("login", "PeriodoArchivado")
+    for periodo in PeriodoArchivado.objects.filter(id_minimo__isnull=True).iterator():
+        ruta = ruta_absoluta(periodo.archivo)
+        if not os.path.exists(ruta):
+            continue
+        ids = ArchivoMarcas(ruta).id
+        if len(ids):
+            periodo.id_minimo, periodo.id_maximo = int(ids.min()), int(ids.max())
+            periodo.save(update_fields=["id_minimo", "id_maximo"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0020_importaciones_en_segundo_plano'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='periodoarchivado',
+            name='id_maximo',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='periodoarchivado',
+            name='id_minimo',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(poblar_rango_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def poblar_empresa(apps, schema_editor):
+    """Hasta ahora las filas de un periodo eran todas de la empresa del periodo."""
+    PeriodoArchivado = apps.get_model("login", "PeriodoArchivado")
+    TrabajadorArchivado = apps.get_model("login", "TrabajadorArchivado")
+    TrabajadorArchivado.objects.update(
+        empresa_id=Subquery(PeriodoArchivado.objects.filter(pk=OuterRef("periodo_id")).values("empresa_id")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0021_periodos_archivados_rango_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajadorarchivado',
+            name='empresa',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='login.empresa'),
+        ),
+        migrations.RunPython(poblar_empresa, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trabajadorarchivado',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='login.empresa'),
+        ),
+    ]
@@ -1,9 +1,17 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils import timezone
 import hashlib
+import heapq
 import json
 from django.core.exceptions import ValidationError
 
+from . import autorizacion
+from .normalizacion import normalizar_email, normalizar_rut, normalizar_texto
+from .resumen import JORNADA_MAXIMA, agrupar_por_jornada, calcular_dia
+
 
 def canonical_string(data: dict) -> str:
     return json.dumps(
@@ -14,6 +22,27 @@ def canonical_string(data: dict) -> str:
     )
 
 
+def hash_marca(timestamp, rut, nombres, apellidos, tipo_marca) -> str:
+    """SHA-256 de una marca a partir de valores simples; la usan save() y el verificador."""
+    payload = {
+        "timestamp": timestamp,
+        "rut": rut or "",
+        "nombres": nombres or "",
+        "apellidos": apellidos or "",
+        "tipo_marca": tipo_marca,
+    }
+    return hashlib.sha256(canonical_string(payload).encode("utf-8")).hexdigest()
+
+
+
+def empresa_del_trabajador(instancia):
+    """empresa_id del trabajador de la fila, sin consultar si el trabajador ya esta cargado."""
+    if instancia.trabajador_id is None:
+        return None
+    if type(instancia).trabajador.is_cached(instancia):
+        return instancia.trabajador.empresa_id
+    return Trabajador.objects.filter(pk=instancia.trabajador_id).values_list("empresa_id", flat=True).first()
+
 class Empresa(models.Model):
     razon_social = models.CharField(max_length=255)
     rut_empresa = models.CharField(max_length=20, unique=True)
@@ -62,6 +91,23 @@ class Trabajador(models.Model):
         max_length=10, choices=[("activo", "Activo"), ("inactivo", "Inactivo")], default="activo"
     )
     turno = models.ForeignKey(Turno, on_delete=models.SET_NULL, null=True, blank=True)
+    # Columnas de busqueda (ver normalizacion.py), se mantienen en save().
+    rut_normalizado = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    nombre_busqueda = models.CharField(max_length=255, blank=True, default="", db_index=True)
+    apellido_busqueda = models.CharField(max_length=255, blank=True, default="", db_index=True)
+
+    CAMPOS_BUSQUEDA = ("rut_normalizado", "nombre_busqueda", "apellido_busqueda")
+
+    def actualizar_busqueda(self):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        self.nombre_busqueda = normalizar_texto(self.nombres, self.apellidos)
+        self.apellido_busqueda = normalizar_texto(self.apellidos, self.nombres)
+
+    def save(self, *args, **kwargs):
+        self.actualizar_busqueda()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], *self.CAMPOS_BUSQUEDA}
+        super().save(*args, **kwargs)
 
 
 class Usuario(models.Model):
@@ -89,6 +135,23 @@ class Usuario(models.Model):
         max_length=10, choices=[("activo", "Activo"), ("bloqueado", "Bloqueado")], default="activo"
     )
     creado_en = models.DateTimeField(default=timezone.now)
+    token_version = models.PositiveIntegerField(
+        default=0, help_text="Se incrementa para invalidar los tokens emitidos"
+    )
+    rut_normalizado = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    email_normalizado = models.CharField(max_length=255, blank=True, default="", db_index=True)
+
+    CAMPOS_BUSQUEDA = ("rut_normalizado", "email_normalizado")
+
+    def actualizar_busqueda(self):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        self.email_normalizado = normalizar_email(self.email)
+
+    def save(self, *args, **kwargs):
+        self.actualizar_busqueda()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], *self.CAMPOS_BUSQUEDA}
+        super().save(*args, **kwargs)
 
     @property
     def is_authenticated(self):
@@ -102,29 +165,86 @@ class Usuario(models.Model):
     def is_active(self):
         return self.estado == "activo"
 
+    def revocar_tokens(self):
+        """Invalida todos los JWT emitidos para el usuario (se validan contra token_version)."""
+        from .authentication import olvidar_version  # authentication importa este modulo
+
+        Usuario.objects.filter(pk=self.pk).update(token_version=models.F("token_version") + 1)
+        self.token_version = Usuario.objects.values_list("token_version", flat=True).get(pk=self.pk)
+        olvidar_version(self.pk)
+
+    def mapa_autorizacion(self) -> dict:
+        """
+        Empresas del usuario: {"empresas": {empresa_id: rol}, "empresa_trabajador": id o None}.
+        Se memoriza en la instancia (dura el request) y en cache con llave versionada,
+        que se invalida desde signals al cambiar EmpresaUsuario o la empresa del trabajador.
+        """
+        mapa = getattr(self, "_mapa_autorizacion", None)
+        if mapa is not None:
+            return mapa
+
+        clave = autorizacion.clave_mapa(self.id)
+        mapa = cache.get(clave)
+        if mapa is None:
+            empresa_trabajador = None
+            if self.trabajador_id:
+                empresa_trabajador = (
+                    Trabajador.objects.filter(id=self.trabajador_id).values_list("empresa_id", flat=True).first()
+                )
+            mapa = {
+                "empresas": dict(
+                    EmpresaUsuario.objects.filter(usuario_id=self.id).values_list("empresa_id", "rol")
+                ),
+                "empresa_trabajador": empresa_trabajador,
+            }
+            cache.set(clave, mapa, autorizacion.timeout())
+        self._mapa_autorizacion = mapa
+        return mapa
+
+    def empresas_ids(self, roles=None) -> list:
+        roles_filtrados = set(roles) if roles else None
+        mapa = self.mapa_autorizacion()
+        empresa_trabajador = mapa["empresa_trabajador"]
+
+        if self.rol == "trabajador" and self.trabajador_id:
+            if roles_filtrados and "trabajador" not in roles_filtrados:
+                return []
+            return [empresa_trabajador] if empresa_trabajador else []
+
+        empresa_ids = [
+            empresa_id
+            for empresa_id, rol in mapa["empresas"].items()
+            if not roles_filtrados or rol in roles_filtrados
+        ]
+        if empresa_trabajador and empresa_trabajador not in empresa_ids:
+            empresa_ids.append(empresa_trabajador)
+        return empresa_ids
+
     def tiene_acceso_empresa(self, empresa, roles=None) -> bool:
         if not empresa:
             return False
 
-        empresa_id = getattr(empresa, "id", empresa)
+        try:
+            empresa_id = int(getattr(empresa, "id", empresa))
+        except (TypeError, ValueError):
+            return False
         roles_filtrados = set(roles) if roles else None
+        mapa = self.mapa_autorizacion()
+        empresa_trabajador = mapa["empresa_trabajador"]
 
         if self.rol == "trabajador":
             if roles_filtrados and "trabajador" not in roles_filtrados:
                 return False
-            return bool(self.trabajador and self.trabajador.empresa_id == empresa_id)
+            return bool(empresa_trabajador and empresa_trabajador == empresa_id)
 
-        relaciones = self.empresas_usuario.filter(empresa_id=empresa_id)
-        if roles_filtrados:
-            relaciones = relaciones.filter(rol__in=roles_filtrados)
-
-        if relaciones.exists():
+        rol = mapa["empresas"].get(empresa_id)
+        if rol and (not roles_filtrados or rol in roles_filtrados):
             return True
 
         # fallback: en caso de que el usuario tenga un trabajador asociado en esa empresa
         if roles_filtrados:
             return False
-        return bool(self.trabajador and self.trabajador.empresa_id == empresa_id)
+        return bool(empresa_trabajador and empresa_trabajador == empresa_id)
 
 
 class EmpresaUsuario(models.Model):
@@ -158,12 +278,51 @@ class EmpresaUsuario(models.Model):
 
 
 class Marcas(models.Model):
-    trabajador = models.ForeignKey(Trabajador, on_delete=models.PROTECT, null=True, blank=True)
+    # En MySQL la tabla puede particionarse por mes (ver particiones.py): una tabla
+    # particionada no admite claves foraneas, por eso ninguna FK que la involucra crea
+    # la restriccion en la base de datos (on_delete lo sigue aplicando Django).
+    trabajador = models.ForeignKey(
+        Trabajador, on_delete=models.PROTECT, null=True, blank=True, db_constraint=False
+    )
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.PROTECT,
+        db_constraint=False,
+        related_name="marcas",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Copia de trabajador.empresa para filtrar por empresa sin join",
+    )
     tipo_marca = models.CharField(
         max_length=10, choices=[("entrada", "Entrada"), ("salida", "Salida")]
     )
     timestamp = models.DateTimeField(default=timezone.now)
     hash = models.CharField(max_length=64, editable=False)
+    clave_idempotencia = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        help_text="Clave generada por el cliente para marcas sincronizadas sin conexion",
+    )
+
+    class Meta:
+        constraints = [
+            # Toda clave unica de una tabla particionada debe incluir la columna de particion,
+            # asi que la base de datos ya no impide repetir (trabajador, clave_idempotencia):
+            # solo (trabajador, clave_idempotencia, timestamp). Un reintento con otro
+            # timestamp solo lo detecta SincronizarMarcasView, que busca la clave con el
+            # EstadoJornada del trabajador bloqueado. Por eso esa vista debe seguir siendo
+            # el unico camino que inserta marcas con clave_idempotencia.
+            models.UniqueConstraint(
+                fields=["trabajador", "clave_idempotencia", "timestamp"], name="marca_clave_idempotencia_ts_unica"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="marca_ts_id_idx"),
+            models.Index(fields=["trabajador", "timestamp", "id"], name="marca_trab_ts_id_idx"),
+            models.Index(fields=["empresa", "timestamp", "id"], name="marca_emp_ts_id_idx"),
+        ]
 
     def build_hash_payload(self):
         return {
@@ -175,18 +334,226 @@ class Marcas(models.Model):
         }
 
     def compute_sha256(self) -> str:
-        payload = self.build_hash_payload()
-        canonical = canonical_string(payload)
-        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return hash_marca(**self.build_hash_payload())
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, estado_jornada=None, **kwargs):
+        self.empresa_id = empresa_del_trabajador(self)
         if not self.hash:
             self.hash = self.compute_sha256()
-        super().save(*args, **kwargs)
+        nueva = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if nueva and self.trabajador_id:
+                EstadoJornada.registrar(self, estado=estado_jornada)
+                ResumenDiario.recalcular(self.trabajador, *ResumenDiario.fechas_afectadas(self.timestamp))
+
+
+class EstadoJornada(models.Model):
+    """
+    Estado actual de la jornada de cada trabajador (ultima marca, entrada abierta
+    e inicio de jornada). Se mantiene desde Marcas.save para que marcar y consultar
+    el estado no tengan que recorrer las marcas del dia.
+    """
+
+    trabajador = models.OneToOneField(
+        Trabajador,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="estado_jornada",
+    )
+    ultima_marca = models.ForeignKey(
+        Marcas, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", db_constraint=False
+    )
+    ultimo_tipo = models.CharField(
+        max_length=10, choices=[("entrada", "Entrada"), ("salida", "Salida")], blank=True, null=True
+    )
+    ultimo_timestamp = models.DateTimeField(null=True, blank=True)
+    entrada_abierta = models.BooleanField(default=False)
+    inicio_jornada = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def bloquear(cls, trabajador_id):
+        """Obtiene (o crea) el estado del trabajador con bloqueo de fila. Requiere transaccion."""
+        try:
+            return cls.objects.select_for_update().get(trabajador_id=trabajador_id)
+        except cls.DoesNotExist:
+            cls.objects.get_or_create(trabajador_id=trabajador_id)
+            return cls.objects.select_for_update().get(trabajador_id=trabajador_id)
+
+    @classmethod
+    def registrar(cls, marca, estado=None):
+        estado = estado or cls.bloquear(marca.trabajador_id)
+        if estado.aplicar(marca):
+            estado.save()
+        return estado
+
+    def entrada_activa(self, fecha=None) -> bool:
+        fecha = fecha or timezone.localdate()
+        return bool(
+            self.entrada_abierta
+            and self.inicio_jornada
+            and timezone.localdate(self.inicio_jornada) == fecha
+        )
+
+    def validar_marca(self, tipo, momento=None):
+        """
+        Valida la secuencia entrada/salida del dia para una nueva marca.
+        Devuelve el mensaje de error o None si la marca es valida.
+        """
+        fecha = timezone.localdate(momento or timezone.now())
+        if tipo == "entrada":
+            if self.entrada_activa(fecha):
+                return "Ya tienes una entrada activa hoy."
+            return None
+
+        if self.entrada_activa(fecha):
+            return None
+        if (
+            self.ultimo_tipo == "salida"
+            and self.ultimo_timestamp
+            and timezone.localdate(self.ultimo_timestamp) == fecha
+        ):
+            return "Ya tienes una salida registrada despues de la ultima entrada."
+        return "No tienes una entrada registrada hoy."
+
+    def aplicar(self, marca) -> bool:
+        """
+        Avanza el estado con una marca nueva. Las marcas anteriores a la ultima
+        registrada no cambian el estado (usar reconstruir_estado_jornada).
+        """
+        if self.ultimo_timestamp and marca.timestamp < self.ultimo_timestamp:
+            return False
+        self.ultima_marca_id = marca.id
+        self.ultimo_tipo = marca.tipo_marca
+        self.ultimo_timestamp = marca.timestamp
+        if marca.tipo_marca == "entrada":
+            self.entrada_abierta = True
+            self.inicio_jornada = marca.timestamp
+        else:
+            self.entrada_abierta = False
+        return True
+
+
+class ResumenDiario(models.Model):
+    """
+    Resumen por trabajador y dia local: primera entrada, ultima salida, minutos
+    trabajados, atraso y horas extra respecto de su Turno. Se recalcula al crear
+    cada marca y con el comando recalcular_resumen_diario.
+    """
+
+    trabajador = models.ForeignKey(
+        Trabajador, on_delete=models.CASCADE, related_name="resumenes_diarios"
+    )
+    fecha = models.DateField()
+    primera_entrada = models.DateTimeField(null=True, blank=True)
+    ultima_salida = models.DateTimeField(null=True, blank=True)
+    minutos_trabajados = models.PositiveIntegerField(default=0)
+    minutos_atraso = models.PositiveIntegerField(default=0)
+    minutos_extra = models.PositiveIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    CAMPOS_CALCULADOS = [
+        "primera_entrada",
+        "ultima_salida",
+        "minutos_trabajados",
+        "minutos_atraso",
+        "minutos_extra",
+        "actualizado_en",
+    ]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["trabajador", "fecha"], name="resumen_trabajador_fecha_unico"),
+        ]
+        indexes = [models.Index(fields=["fecha", "trabajador"], name="resumen_fecha_trab_idx")]
+
+    @classmethod
+    def calcular(cls, trabajador, fecha, marcas):
+        """Construye (sin guardar) el resumen del dia a partir de tuplas (timestamp, tipo_marca)."""
+        turno = trabajador.turno
+        datos = calcular_dia(
+            fecha,
+            marcas,
+            hora_entrada=turno.hora_entrada if turno else None,
+            hora_salida=turno.hora_salida if turno else None,
+            tolerancia=turno.tolerancia_minutos if turno else 0,
+        )
+        return cls(trabajador=trabajador, fecha=fecha, **datos)
+
+    @staticmethod
+    def fechas_afectadas(timestamp):
+        """Dias cuyo resumen puede cambiar con una marca en `timestamp` (su jornada puede cruzar medianoche)."""
+        desplazamientos = (-JORNADA_MAXIMA, timedelta(0), JORNADA_MAXIMA)
+        return sorted({timezone.localdate(timestamp + delta) for delta in desplazamientos})
+
+    @classmethod
+    def recalcular(cls, trabajador, *fechas):
+        """
+        Recalcula el resumen de esos dias desde sus marcas (pocas filas, via indice
+        trabajador/timestamp), incluyendo las jornadas que cruzan medianoche y las
+        marcas ya archivadas. Las fechas de los meses vigentes (las de cada marca nueva)
+        no consultan el archivo: nunca tienen marcas archivadas.
+        """
+        from .archivo_marcas import corte_vigente, marcas_trabajador  # archivo_marcas importa este modulo
+
+        tz = timezone.get_current_timezone()
+        inicio = timezone.make_aware(datetime.combine(min(fechas), time.min), tz) - JORNADA_MAXIMA
+        fin = timezone.make_aware(datetime.combine(max(fechas) + timedelta(days=1), time.min), tz) + JORNADA_MAXIMA
+        tabla = (
+            Marcas.objects.filter(trabajador=trabajador, timestamp__gte=inicio, timestamp__lt=fin)
+            .order_by("timestamp", "id")
+            .values_list("timestamp", "id", "tipo_marca")
+        )
+        archivadas = marcas_trabajador(trabajador.id, inicio, fin) if inicio < corte_vigente() else []
+        marcas = heapq.merge(tabla, archivadas)
+        dias = agrupar_por_jornada((ts, tipo) for ts, _, tipo in marcas)
+        resumenes = [cls.calcular(trabajador, fecha, dias[fecha]) for fecha in fechas if fecha in dias]
+        vacias = [fecha for fecha in fechas if fecha not in dias]
+        if vacias:
+            cls.objects.filter(trabajador=trabajador, fecha__in=vacias).delete()
+        if resumenes:
+            cls.objects.bulk_create(
+                resumenes,
+                update_conflicts=True,
+                unique_fields=["trabajador", "fecha"],
+                update_fields=cls.CAMPOS_CALCULADOS,
+            )
+        return resumenes
+
+
+class DocumentoAlmacenado(models.Model):
+    """
+    Archivo guardado una sola vez bajo una ruta derivada de su SHA-256. `referencias`
+    cuenta las filas que lo usan (se mantiene en signals); con 0 puede purgarse.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    archivo = models.FileField(max_length=255)
+    tamano = models.PositiveBigIntegerField()
+    tipo_contenido = models.CharField(max_length=100, blank=True, default="")
+    referencias = models.PositiveIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "documentos_almacenados"
+        indexes = [models.Index(fields=["referencias"], name="documento_referencias_idx")]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} ref.)"
 
 
 class Licencia(models.Model):
     trabajador = models.ForeignKey("Trabajador", on_delete=models.PROTECT, related_name="licencias")
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.PROTECT,
+        related_name="licencias",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Copia de trabajador.empresa para filtrar por empresa sin join",
+    )
     tipo = models.CharField(
         max_length=50,
         choices=[
@@ -201,7 +568,15 @@ class Licencia(models.Model):
         blank=True, null=True, help_text="Se calcula automaticamente si no se entrega"
     )
     motivo_detallado = models.TextField(blank=True, null=True)
-    archivo = models.FileField(upload_to="licencias_pdfs/", null=True, blank=True)
+    archivo = models.FileField(upload_to="licencias_pdfs/", max_length=255, null=True, blank=True)
+    documento = models.ForeignKey(
+        DocumentoAlmacenado,
+        on_delete=models.PROTECT,
+        related_name="licencias",
+        null=True,
+        blank=True,
+        help_text="Contenido de `archivo`; archivo.name apunta a la misma ruta",
+    )
     estado = models.CharField(
         max_length=20,
         default="pendiente",
@@ -225,12 +600,19 @@ class Licencia(models.Model):
     resuelto_en = models.DateTimeField(null=True, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["empresa", "fecha_inicio"], name="licencia_emp_inicio_idx"),
+            models.Index(fields=["trabajador", "fecha_inicio"], name="licencia_trab_inicio_idx"),
+        ]
+
     def clean(self):
         if self.fecha_fin and self.fecha_inicio and self.fecha_fin < self.fecha_inicio:
             raise ValidationError({"fecha_fin": "La fecha de fin no puede ser anterior a la fecha de inicio."})
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.empresa_id = empresa_del_trabajador(self)
         if self.fecha_inicio and self.fecha_fin:
             delta = (self.fecha_fin - self.fecha_inicio).days + 1
             self.dias = max(0, delta)
@@ -246,6 +628,15 @@ class Vacaciones(models.Model):
         on_delete=models.PROTECT,
         related_name="vacaciones",
     )
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.PROTECT,
+        related_name="vacaciones",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Copia de trabajador.empresa para filtrar por empresa sin join",
+    )
     fecha_inicio = models.DateField()
     fecha_fin = models.DateField()
     dias = models.PositiveIntegerField(blank=True, null=True)
@@ -271,12 +662,19 @@ class Vacaciones(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     resuelto_en = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["empresa", "fecha_inicio"], name="vacaciones_emp_inicio_idx"),
+            models.Index(fields=["trabajador", "fecha_inicio"], name="vacaciones_trab_inicio_idx"),
+        ]
+
     def clean(self):
         if self.fecha_fin and self.fecha_inicio and self.fecha_fin < self.fecha_inicio:
             raise ValidationError({"fecha_fin": "La fecha de fin no puede ser menor a la fecha de inicio."})
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.empresa_id = empresa_del_trabajador(self)
         if self.fecha_inicio and self.fecha_fin:
             self.dias = (self.fecha_fin - self.fecha_inicio).days + 1
         super().save(*args, **kwargs)
@@ -304,3 +702,263 @@ class AuditoriaCambio(models.Model):
     registro_id = models.PositiveIntegerField()
     motivo = models.TextField(blank=True, null=True)
     fecha = models.DateTimeField(default=timezone.now)
+    # Identificador generado al registrar (ver auditoria.py): reinsertar desde el spool es idempotente.
+    clave = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        # Rutas de acceso de AuditoriaListView: por empresa ordenado por (fecha, id),
+        # opcionalmente filtrado por accion, modelo o usuario.
+        indexes = [
+            models.Index(fields=["empresa", "fecha", "id"], name="audit_emp_fecha_idx"),
+            models.Index(fields=["empresa", "accion", "fecha", "id"], name="audit_emp_accion_idx"),
+            models.Index(fields=["empresa", "modelo_afectado", "fecha", "id"], name="audit_emp_modelo_idx"),
+            models.Index(fields=["usuario", "fecha", "id"], name="audit_usuario_fecha_idx"),
+        ]
+
+
+class ReporteJob(models.Model):
+    """Trabajo de generacion de reportes en segundo plano (ver comando procesar_reportes)."""
+
+    ESTADOS = [
+        ("pendiente", "Pendiente"),
+        ("procesando", "Procesando"),
+        ("completado", "Completado"),
+        ("error", "Error"),
+    ]
+
+    tipo = models.CharField(
+        max_length=30,
+        choices=[("libro_asistencia_pdf", "Libro de asistencia mensual (PDF)")],
+        default="libro_asistencia_pdf",
+    )
+    empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name="reportes")
+    anio = models.PositiveIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default="pendiente")
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.PROTECT, related_name="reportes_solicitados"
+    )
+    archivo = models.FileField(upload_to="reportes/", null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    total_trabajadores = models.PositiveIntegerField(default=0)
+    procesados = models.PositiveIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "report_jobs"
+        indexes = [models.Index(fields=["estado", "creado_en"], name="report_job_estado_idx")]
+
+    def __str__(self):
+        return f"Reporte #{self.id or '-'} {self.tipo} {self.anio}-{self.mes:02d} ({self.estado})"
+
+
+class ImportacionJob(models.Model):
+    """
+    Importacion masiva de usuarios desde CSV en segundo plano (ver comando
+    procesar_importaciones). El CSV trae contrasenas: se borra al terminar.
+    """
+
+    ESTADOS = [
+        ("pendiente", "Pendiente"),
+        ("procesando", "Procesando"),
+        ("completado", "Completado"),
+        ("error", "Error"),
+    ]
+
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="importaciones",
+        help_text="Empresa para las filas sin empresa_id",
+    )
+    estado = models.CharField(max_length=20, choices=ESTADOS, default="pendiente")
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.PROTECT, related_name="importaciones_solicitadas"
+    )
+    archivo = models.FileField(upload_to="importaciones/", null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    con_errores = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "import_jobs"
+        indexes = [models.Index(fields=["estado", "creado_en"], name="import_job_estado_idx")]
+
+    def __str__(self):
+        return f"Importacion #{self.id or '-'} ({self.estado})"
+
+
+class VersionRecurso(models.Model):
+    """
+    Contador por (recurso, empresa) que sube cada vez que cambian sus filas (ver
+    versiones.py). Las vistas de lectura arman su ETag con estos contadores.
+    """
+
+    recurso = models.CharField(max_length=40)
+    empresa_id = models.BigIntegerField(help_text="Empresa de las filas; sin FK para sobrevivir a su borrado")
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "versiones_recurso"
+        constraints = [
+            models.UniqueConstraint(fields=["recurso", "empresa_id"], name="version_recurso_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.recurso}@{self.empresa_id} v{self.version}"
+
+
+class VerificacionMarcas(models.Model):
+    """
+    Corrida del verificador de hashes de Marcas (ver verificacion.py). `ultimo_id` y
+    `ultimo_periodo_id` son el punto de control: una corrida interrumpida se reanuda desde ahi.
+    """
+
+    ESTADOS = [
+        ("pendiente", "Pendiente"),
+        ("procesando", "Procesando"),
+        ("interrumpida", "Interrumpida"),
+        ("completada", "Completada"),
+        ("error", "Error"),
+    ]
+
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="verificaciones_marcas",
+        help_text="Vacio: todas las marcas",
+    )
+    incremental = models.BooleanField(default=False)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default="pendiente")
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.PROTECT, null=True, blank=True, related_name="verificaciones_solicitadas"
+    )
+    desde_id = models.PositiveBigIntegerField(default=0, help_text="Se verifican las marcas con id mayor")
+    hasta_id = models.PositiveBigIntegerField(null=True, blank=True, help_text="Mayor id al iniciar la corrida")
+    ultimo_id = models.PositiveBigIntegerField(default=0)
+    ultimo_periodo_id = models.PositiveBigIntegerField(
+        default=0, help_text="Ultimo PeriodoArchivado verificado; se recorren por id despues de la tabla"
+    )
+    total = models.PositiveBigIntegerField(default=0)
+    revisadas = models.PositiveBigIntegerField(default=0)
+    discrepancias = models.PositiveIntegerField(default=0)
+    segundos = models.FloatField(default=0, help_text="Tiempo de proceso acumulado entre reanudaciones")
+    error = models.TextField(blank=True, null=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True, help_text="Ultimo avance registrado")
+
+    class Meta:
+        db_table = "verificaciones_marcas"
+        indexes = [models.Index(fields=["estado", "creado_en"], name="verif_marcas_estado_idx")]
+
+    def __str__(self):
+        alcance = f"empresa {self.empresa_id}" if self.empresa_id else "todas"
+        return f"Verificacion #{self.id or '-'} ({alcance}, {self.estado})"
+
+
+class DiscrepanciaMarca(models.Model):
+    """Marca cuyo hash guardado no coincide con el recalculado en una verificacion."""
+
+    verificacion = models.ForeignKey(
+        VerificacionMarcas, on_delete=models.CASCADE, related_name="detalle_discrepancias"
+    )
+    marca_id = models.BigIntegerField(help_text="Sin FK: el reporte debe sobrevivir a cambios en la marca")
+    hash_guardado = models.CharField(max_length=64)
+    hash_calculado = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = "discrepancias_marcas"
+        constraints = [
+            models.UniqueConstraint(fields=["verificacion", "marca_id"], name="discrepancia_marca_unica"),
+        ]
+
+
+class RaizMerkle(models.Model):
+    """
+    Raiz del arbol de Merkle de los hashes de las marcas de una empresa en un dia (ver
+    merkle.py). `raiz` es la publicada; si al reconstruir el arbol cambia (marcas tardias,
+    editadas o borradas) queda `alterada` con los valores nuevos en `raiz_recalculada`.
+    """
+
+    ESTADOS = [("vigente", "Vigente"), ("alterada", "Alterada")]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name="raices_merkle")
+    fecha = models.DateField()
+    raiz = models.CharField(max_length=64)
+    hojas = models.PositiveIntegerField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default="vigente")
+    raiz_recalculada = models.CharField(max_length=64, blank=True, null=True)
+    hojas_recalculadas = models.PositiveIntegerField(blank=True, null=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    verificada_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "raices_merkle"
+        constraints = [
+            models.UniqueConstraint(fields=["empresa", "fecha"], name="raiz_merkle_empresa_fecha_unica"),
+        ]
+
+    def __str__(self):
+        return f"Raiz {self.empresa_id}@{self.fecha} ({self.estado})"
+
+
+class PeriodoArchivado(models.Model):
+    """
+    Mes (local) de marcas de una empresa movido de la tabla Marcas a un archivo columnar
+    (ver archivo_marcas.py). `sha256` es el del archivo y cambia si se vuelve a escribir.
+    `id_minimo`/`id_maximo` acotan los ids del archivo para que archivo_marcas.buscar()
+    no abra los que no pueden contener una marca; nulos si no se conocen.
+    """
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name="periodos_archivados")
+    anio = models.PositiveIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    archivo = models.CharField(max_length=255, help_text="Ruta relativa a ARCHIVO_MARCAS['DIRECTORIO']")
+    sha256 = models.CharField(max_length=64)
+    filas = models.PositiveIntegerField()
+    tamano = models.PositiveBigIntegerField()
+    id_minimo = models.BigIntegerField(null=True, blank=True)
+    id_maximo = models.BigIntegerField(null=True, blank=True)
+    archivado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "periodos_archivados"
+        constraints = [
+            models.UniqueConstraint(fields=["empresa", "anio", "mes"], name="periodo_archivado_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa_id}/{self.anio}-{self.mes:02d} ({self.filas} marcas)"
+
+
+class TrabajadorArchivado(models.Model):
+    """
+    Trabajadores con marcas en un periodo archivado, para no abrir archivos que no los
+    incluyen. `empresa` es la empresa actual de esas marcas: si el trabajador cambia de
+    empresa sus filas siguen en el archivo original, pero se muestran en la nueva.
+    """
+
+    periodo = models.ForeignKey(PeriodoArchivado, on_delete=models.CASCADE, related_name="trabajadores")
+    trabajador_id = models.BigIntegerField()
+    empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name="+")
+    filas = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "trabajadores_archivados"
+        constraints = [
+            models.UniqueConstraint(fields=["trabajador_id", "periodo"], name="trabajador_archivado_unico"),
+        ]
@@ -0,0 +1,204 @@
+"""
+Motor vectorizado (NumPy) para el cierre de un periodo: horas trabajadas, atrasos,
+salidas anticipadas y horas extra de todos los trabajadores de una empresa.
+
+Las marcas se cargan como columnas (trabajador, segundos epoch, tipo) y todas las
+metricas se calculan con operaciones sobre arreglos, sin recorrer filas en Python.
+"""
+
+from array import array
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from . import archivo_marcas
+from .models import Marcas, Trabajador
+from .resumen import JORNADA_MAXIMA
+
+ENTRADA = 0
+SALIDA = 1
+JORNADA_MAXIMA_SEGUNDOS = int(JORNADA_MAXIMA.total_seconds())
+
+
+def inicios_de_dia(desde, hasta):
+    """Epoch de la medianoche local de cada dia del rango, mas la del dia siguiente a `hasta`."""
+    tz = timezone.get_current_timezone()
+    dias = (hasta - desde).days + 2
+    return np.array(
+        [
+            int(timezone.make_aware(datetime.combine(desde + timedelta(days=n), time.min), tz).timestamp())
+            for n in range(dias)
+        ],
+        dtype=np.int64,
+    )
+
+
+def _segundos(hora):
+    return hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def calcular_metricas(trabajador, epoch, tipo, inicios_dia, turnos):
+    """
+    Calcula las metricas del periodo.
+
+    - trabajador, epoch, tipo: arreglos del mismo largo (int64, int64, int8 con ENTRADA/SALIDA).
+    - inicios_dia: salida de inicios_de_dia(); define a que dia local pertenece cada marca.
+      Las marcas fuera de esos dias solo sirven para cerrar jornadas y no se cuentan.
+    - turnos: {trabajador_id: (segundos_entrada, segundos_salida, tolerancia_segundos)}.
+
+    Igual que resumen.agrupar_por_jornada, una entrada seguida de una salida del mismo
+    trabajador dentro de JORNADA_MAXIMA forma un par, y el par (con su salida) pertenece al
+    dia local de la entrada aunque la salida caiga despues de medianoche (turnos de noche).
+    El atraso se compara contra la primera entrada del dia y la salida anticipada/horas extra
+    contra la ultima salida; si el turno termina antes de empezar, su salida es la del dia
+    siguiente. Los horarios de turno se suman a la medianoche local, por lo que el dia de
+    cambio de horario puede desviarse en una hora.
+
+    Devuelve un dict de arreglos alineados con la llave "trabajador_id".
+    """
+    trabajador = np.asarray(trabajador, dtype=np.int64)
+    epoch = np.asarray(epoch, dtype=np.int64)
+    tipo = np.asarray(tipo, dtype=np.int8)
+
+    orden = np.lexsort((epoch, trabajador))
+    trabajador, epoch, tipo = trabajador[orden], epoch[orden], tipo[orden]
+
+    dias = len(inicios_dia) - 1
+    # -1 antes del primer dia y `dias` despues del ultimo.
+    dia = np.searchsorted(inicios_dia, epoch, side="right") - 1
+
+    # Pares entrada -> salida consecutivos del mismo trabajador; la salida pasa al dia de la entrada.
+    es_par = (
+        (tipo[:-1] == ENTRADA)
+        & (tipo[1:] == SALIDA)
+        & (trabajador[:-1] == trabajador[1:])
+        & (epoch[1:] - epoch[:-1] <= JORNADA_MAXIMA_SEGUNDOS)
+    )
+    dia[1:][es_par] = dia[:-1][es_par]
+    es_par &= (dia[:-1] >= 0) & (dia[:-1] < dias)
+    trabajador_par = trabajador[:-1][es_par]
+    duracion = (epoch[1:] - epoch[:-1])[es_par]
+
+    en_rango = (dia >= 0) & (dia < dias)
+    trabajador, epoch, tipo, dia = trabajador[en_rango], epoch[en_rango], tipo[en_rango], dia[en_rango]
+    ids, widx = np.unique(trabajador, return_inverse=True)
+    n = len(ids)
+    segundos_trabajados = np.bincount(np.searchsorted(ids, trabajador_par), weights=duracion, minlength=n)
+
+    # Horario de turno por trabajador (NaN si no tiene turno).
+    turno_entrada = np.full(n, np.nan)
+    turno_salida = np.full(n, np.nan)
+    tolerancia = np.zeros(n)
+    for pos, trabajador_id in enumerate(ids.tolist()):
+        turno = turnos.get(trabajador_id)
+        if turno:
+            turno_entrada[pos], turno_salida[pos], tolerancia[pos] = turno
+
+    llave = widx * max(dias, 1) + dia
+
+    # Primera entrada de cada trabajador-dia (las marcas ya estan ordenadas por tiempo).
+    entradas = tipo == ENTRADA
+    _, primera = np.unique(llave[entradas], return_index=True)
+    primera_entrada = epoch[entradas][primera]
+    w_e = widx[entradas][primera]
+    inicio_turno = inicios_dia[dia[entradas][primera]] + turno_entrada[w_e]
+    retraso = primera_entrada - inicio_turno
+    es_atraso = retraso > tolerancia[w_e]  # NaN (sin turno) compara como False
+    atrasos = np.bincount(w_e[es_atraso], minlength=n)
+    minutos_atraso = np.bincount(w_e[es_atraso], weights=retraso[es_atraso] // 60, minlength=n)
+    dias_trabajados = np.bincount(w_e, minlength=n)
+
+    # Ultima salida de cada trabajador-dia: se busca la primera aparicion en orden inverso.
+    salidas = tipo == SALIDA
+    llave_s = llave[salidas][::-1]
+    _, ultima = np.unique(llave_s, return_index=True)
+    ultima_salida = epoch[salidas][::-1][ultima]
+    w_s = widx[salidas][::-1][ultima]
+    turno_nocturno = turno_salida[w_s] < turno_entrada[w_s]
+    fin_turno = inicios_dia[dia[salidas][::-1][ultima]] + turno_salida[w_s] + np.where(turno_nocturno, 86400, 0)
+    diferencia = ultima_salida - fin_turno
+    anticipada = diferencia < 0
+    extra = diferencia > 0
+    salidas_anticipadas = np.bincount(w_s[anticipada], minlength=n)
+    minutos_salida_anticipada = np.bincount(
+        w_s[anticipada], weights=(-diferencia[anticipada]) // 60, minlength=n
+    )
+    minutos_extra = np.bincount(w_s[extra], weights=diferencia[extra] // 60, minlength=n)
+
+    return {
+        "trabajador_id": ids,
+        "dias_trabajados": dias_trabajados,
+        "minutos_trabajados": segundos_trabajados // 60,
+        "atrasos": atrasos,
+        "minutos_atraso": minutos_atraso,
+        "salidas_anticipadas": salidas_anticipadas,
+        "minutos_salida_anticipada": minutos_salida_anticipada,
+        "minutos_extra": minutos_extra,
+    }
+
+
+def cargar_marcas(queryset):
+    """Lee (trabajador_id, timestamp, tipo_marca) de un queryset de Marcas como arreglos columnares."""
+    trabajadores = array("q")
+    epochs = array("q")
+    tipos = array("b")
+    filas = queryset.order_by().values_list("trabajador_id", "timestamp", "tipo_marca")
+    for trabajador_id, ts, tipo in filas.iterator(chunk_size=10000):
+        trabajadores.append(trabajador_id)
+        epochs.append(int(ts.timestamp()))
+        tipos.append(ENTRADA if tipo == "entrada" else SALIDA)
+    return (
+        np.frombuffer(trabajadores, dtype=np.int64),
+        np.frombuffer(epochs, dtype=np.int64),
+        np.frombuffer(tipos, dtype=np.int8),
+    )
+
+
+def calcular_periodo(empresa_id, desde, hasta):
+    """
+    Metricas de cierre de todos los trabajadores de una empresa entre dos fechas (inclusive).
+    Las marcas de meses archivados se leen del archivo. Se cargan ademas JORNADA_MAXIMA
+    antes y despues del rango para cerrar las jornadas que cruzan sus bordes. Devuelve
+    una lista de dicts, uno por trabajador con marcas en el periodo.
+    """
+    inicios = inicios_de_dia(desde, hasta)
+    tz = timezone.get_current_timezone()
+    inicio = datetime.fromtimestamp(int(inicios[0]), tz) - JORNADA_MAXIMA
+    fin = datetime.fromtimestamp(int(inicios[-1]), tz) + JORNADA_MAXIMA
+    marcas = Marcas.objects.filter(empresa_id=empresa_id, timestamp__gte=inicio, timestamp__lt=fin)
+    tabla = cargar_marcas(marcas)
+    archivadas = archivo_marcas.columnas(archivo_marcas.Filtro(empresas=[empresa_id], inicio=inicio, fin=fin))
+    # calcular_metricas ordena por trabajador y tiempo: basta con concatenar ambas fuentes.
+    trabajador, epoch, tipo = (np.concatenate(par) for par in zip(tabla, archivadas))
+
+    fichas = {
+        t.id: t
+        for t in Trabajador.objects.filter(empresa_id=empresa_id).select_related("turno")
+    }
+    turnos = {
+        trabajador_id: (
+            _segundos(t.turno.hora_entrada),
+            _segundos(t.turno.hora_salida),
+            t.turno.tolerancia_minutos * 60,
+        )
+        for trabajador_id, t in fichas.items()
+        if t.turno
+    }
+
+    metricas = calcular_metricas(trabajador, epoch, tipo, inicios, turnos)
+    columnas = {nombre: valores.tolist() for nombre, valores in metricas.items()}
+    resultado = []
+    for pos, trabajador_id in enumerate(columnas["trabajador_id"]):
+        ficha = fichas.get(trabajador_id)
+        fila = {nombre: int(valores[pos]) for nombre, valores in columnas.items()}
+        fila.update(
+            {
+                "rut": ficha.rut if ficha else None,
+                "nombres": ficha.nombres if ficha else None,
+                "apellidos": ficha.apellidos if ficha else None,
+                "horas_trabajadas": round(fila["minutos_trabajados"] / 60, 2),
+            }
+        )
+        resultado.append(fila)
+    return resultado
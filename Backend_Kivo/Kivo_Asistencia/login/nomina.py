@@ -0,0 +1,101 @@
+"""
+Nomina de una empresa con el estado de cada trabajador en un dia: presente,
+atrasado, ausente, con licencia o de vacaciones. Todo sale de una sola consulta
+sobre Trabajador con subconsultas correlacionadas a Marcas, Licencia y Vacaciones.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Licencia, Marcas, Trabajador, Vacaciones
+
+ESTADOS_DIA = ("licencia", "vacaciones", "ausente", "atrasado", "presente")
+
+
+def _consulta_nomina(empresa_id, fecha):
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min), tz)
+    fin = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min), tz)
+
+    # Usan el indice (trabajador, timestamp, id) de Marcas: cada subconsulta lee una fila.
+    marcas_dia = Marcas.objects.filter(trabajador_id=OuterRef("pk"), timestamp__gte=inicio, timestamp__lt=fin)
+    primera_entrada = marcas_dia.filter(tipo_marca="entrada").order_by("timestamp", "id").values("timestamp")[:1]
+    ultima_marca = marcas_dia.order_by("-timestamp", "-id").values("tipo_marca")[:1]
+    vigente = {"trabajador_id": OuterRef("pk"), "estado": "aceptado", "fecha_inicio__lte": fecha, "fecha_fin__gte": fecha}
+
+    return (
+        Trabajador.objects.filter(empresa_id=empresa_id)
+        .annotate(
+            primera_entrada=Subquery(primera_entrada),
+            ultima_marca=Subquery(ultima_marca),
+            en_licencia=Exists(Licencia.objects.filter(**vigente)),
+            en_vacaciones=Exists(Vacaciones.objects.filter(**vigente)),
+        )
+        .order_by("apellidos", "nombres", "id")
+        .values(
+            "id",
+            "rut",
+            "nombres",
+            "apellidos",
+            "cargo",
+            "estado",
+            "turno_id",
+            "turno__nombre",
+            "turno__hora_entrada",
+            "turno__hora_salida",
+            "turno__tolerancia_minutos",
+            "primera_entrada",
+            "ultima_marca",
+            "en_licencia",
+            "en_vacaciones",
+        )
+    )
+
+
+def estado_dia(fila, fecha):
+    """Estado del trabajador en `fecha` a partir de una fila de _consulta_nomina."""
+    if fila["en_licencia"]:
+        return "licencia"
+    if fila["en_vacaciones"]:
+        return "vacaciones"
+    if fila["primera_entrada"] is None:
+        return "ausente"
+    if fila["turno__hora_entrada"]:
+        tz = timezone.get_current_timezone()
+        limite = timezone.make_aware(datetime.combine(fecha, fila["turno__hora_entrada"]), tz) + timedelta(
+            minutes=fila["turno__tolerancia_minutos"] or 0
+        )
+        if fila["primera_entrada"] > limite:
+            return "atrasado"
+    return "presente"
+
+
+def nomina_empresa(empresa_id, fecha=None):
+    """Lista de dicts, uno por trabajador de la empresa, con su turno y el estado del dia."""
+    fecha = fecha or timezone.localdate()
+    resultado = []
+    for fila in _consulta_nomina(empresa_id, fecha).iterator(chunk_size=2000):
+        resultado.append(
+            {
+                "id": fila["id"],
+                "rut": fila["rut"],
+                "nombres": fila["nombres"],
+                "apellidos": fila["apellidos"],
+                "cargo": fila["cargo"],
+                "estado": fila["estado"],
+                "turno": {
+                    "id": fila["turno_id"],
+                    "nombre": fila["turno__nombre"],
+                    "hora_entrada": fila["turno__hora_entrada"],
+                    "hora_salida": fila["turno__hora_salida"],
+                }
+                if fila["turno_id"]
+                else None,
+                "estado_dia": estado_dia(fila, fecha),
+                "primera_entrada": timezone.localtime(fila["primera_entrada"]) if fila["primera_entrada"] else None,
+                "en_jornada": fila["ultima_marca"] == "entrada",
+            }
+        )
+    return resultado
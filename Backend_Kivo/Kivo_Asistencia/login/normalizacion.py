@@ -0,0 +1,29 @@
+"""
+Normalizacion de RUT, nombres y correos para las columnas de busqueda
+(rut_normalizado, nombre_busqueda, apellido_busqueda, email_normalizado).
+"""
+
+import re
+import unicodedata
+
+LARGO_BUSQUEDA = 255
+
+_NO_RUT = re.compile(r"[^0-9K]")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_rut(rut):
+    """'12.345.678-k' -> '12345678K'."""
+    return _NO_RUT.sub("", (rut or "").upper())[:20]
+
+
+def normalizar_texto(*partes):
+    """Une las partes en minusculas, sin tildes y con un solo espacio entre palabras."""
+    texto = " ".join(parte for parte in partes if parte)
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", texto).strip().lower()[:LARGO_BUSQUEDA]
+
+
+def normalizar_email(email):
+    return (email or "").strip().lower()[:LARGO_BUSQUEDA]
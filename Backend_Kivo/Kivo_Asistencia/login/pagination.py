@@ -0,0 +1,164 @@
+import base64
+import heapq
+import json
+from itertools import islice
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def conteo_aproximado(queryset, limite):
+    """
+    Total aproximado de un queryset sin recorrerlo completo.
+    En MySQL usa la estimacion de filas de EXPLAIN; en otros motores cuenta hasta `limite`.
+    Devuelve {"valor": int, "aproximado": bool}.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "mysql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN " + sql, params)
+            columnas = [col[0] for col in cursor.description]
+            fila = cursor.fetchone()
+        if fila and "rows" in columnas:
+            return {"valor": int(fila[columnas.index("rows")] or 0), "aproximado": True}
+
+    valor = queryset.order_by()[: limite + 1].count()
+    return {"valor": min(valor, limite), "aproximado": valor > limite}
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginacion por cursor sobre (campo_orden, id) en orden descendente.
+    Cada pagina filtra por "menor que el ultimo visto", asi la pagina N cuesta lo
+    mismo que la primera (no hay OFFSET).
+
+    Si la vista define filas_archivadas(cursor, limite), sus filas (ya en el mismo orden
+    descendente) se intercalan con las del queryset; asi se leen las marcas archivadas.
+    """
+
+    campo_orden = "timestamp"
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    total_query_param = "incluir_total"
+    limite_conteo = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = None
+        if request.query_params.get(self.total_query_param) in ("1", "true"):
+            self.total = conteo_aproximado(queryset, self.limite_conteo)
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            valor, ultimo_id = cursor
+            # La cota simple sobre el campo permite a MySQL descartar particiones (ver particiones.py).
+            queryset = queryset.filter(**{f"{self.campo_orden}__lte": valor}).filter(
+                Q(**{f"{self.campo_orden}__lt": valor}) | Q(**{self.campo_orden: valor, "id__lt": ultimo_id})
+            )
+        queryset = queryset.order_by(f"-{self.campo_orden}", "-id")
+
+        filas = list(queryset[: self.page_size + 1])
+        archivadas = getattr(view, "filas_archivadas", None)
+        if archivadas is not None:
+            otras = archivadas(cursor, self.page_size + 1)
+            if otras:
+                clave = lambda fila: (self.get_valor_orden(fila), self.get_id(fila))
+                filas = list(islice(heapq.merge(filas, otras, key=clave, reverse=True), self.page_size + 1))
+        self.has_next = len(filas) > self.page_size
+        filas = filas[: self.page_size]
+        self.next_cursor = self.encode_cursor(filas[-1]) if self.has_next else None
+        return filas
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_valor_orden(self, fila):
+        return getattr(fila, self.campo_orden)
+
+    def get_id(self, fila):
+        return fila.id
+
+    def encode_cursor(self, fila):
+        datos = json.dumps([self.get_valor_orden(fila).isoformat(), self.get_id(fila)])
+        return base64.urlsafe_b64encode(datos.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            valor, ultimo_id = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            valor = parse_datetime(valor)
+            ultimo_id = int(ultimo_id)
+        except (TypeError, ValueError):
+            raise NotFound("Cursor invalido.")
+        if valor is None:
+            raise NotFound("Cursor invalido.")
+        return valor, ultimo_id
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "results": data}
+        if self.total is not None:
+            payload["total"] = self.total
+        return Response(payload)
+
+
+class MarcasPagination(KeysetPagination):
+    campo_orden = "timestamp"
+
+
+class AuditoriaPagination(KeysetPagination):
+    campo_orden = "fecha"
+
+
+class IdKeysetPagination(KeysetPagination):
+    """Paginacion por cursor solo sobre id descendente (listados sin un campo de fecha propio)."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = None
+        if request.query_params.get(self.total_query_param) in ("1", "true"):
+            self.total = conteo_aproximado(queryset, self.limite_conteo)
+
+        ultimo_id = self.decode_cursor(request)
+        if ultimo_id is not None:
+            queryset = queryset.filter(id__lt=ultimo_id)
+        queryset = queryset.order_by("-id")
+
+        filas = list(queryset[: self.page_size + 1])
+        self.has_next = len(filas) > self.page_size
+        filas = filas[: self.page_size]
+        self.next_cursor = self.encode_cursor(filas[-1]) if self.has_next else None
+        return filas
+
+    def encode_cursor(self, fila):
+        return base64.urlsafe_b64encode(str(self.get_id(fila)).encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return int(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound("Cursor invalido.")
@@ -0,0 +1,141 @@
+"""
+Particionado mensual de Marcas en MySQL (RANGE COLUMNS sobre `timestamp`).
+
+Cada particion pYYYYMM guarda un mes en UTC, que es como MySQL guarda los DateTimeField
+con USE_TZ; `pmax` recibe todo lo posterior a la ultima particion creada. Las consultas
+acotadas con timestamp__gte/__lt/__range (filtrar_rango_fechas, el cursor de
+KeysetPagination, ResumenDiario) solo leen las particiones de ese rango; __date u otras
+funciones sobre la columna impiden la poda.
+
+Una particion solo se retira vacia: archivar_marcas mueve las filas de cada mes local a su
+archivo y las borra, y como los meses de las particiones son UTC, las primeras horas de
+cada una pertenecen al mes local anterior. Si quedan filas, algun mes no esta archivado.
+
+En otros motores (SQLite en pruebas) Marcas queda como tabla normal y estas funciones no
+hacen nada: soportado() devuelve False y particiones() una lista vacia. Por lo mismo, la
+conversion inicial (sql_particionar, particionar_marcas --convertir) es experimental: las
+pruebas no la ejecutan contra MySQL.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from django.db import connection
+
+from .models import Marcas
+
+PARTICION_MAXIMA = "pmax"
+
+
+@dataclass
+class Particion:
+    nombre: str
+    hasta: date | None  # limite superior exclusivo; None para pmax
+    filas: int  # estimacion de information_schema
+
+
+def soportado(conexion=None):
+    return (conexion or connection).vendor == "mysql"
+
+
+def tabla():
+    return connection.ops.quote_name(Marcas._meta.db_table)
+
+
+def inicio_mes(fecha, meses=0):
+    """Primer dia del mes de `fecha` desplazado `meses` meses."""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nombre_particion(desde):
+    return f"p{desde:%Y%m}"
+
+
+def definicion(desde):
+    """Particion del mes que empieza en `desde`."""
+    return f"PARTITION {nombre_particion(desde)} VALUES LESS THAN ('{inicio_mes(desde, 1):%Y-%m-%d} 00:00:00')"
+
+
+def particiones():
+    """Particiones actuales de Marcas en orden, o [] si la tabla no esta particionada."""
+    if not soportado():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [Marcas._meta.db_table],
+        )
+        filas = cursor.fetchall()
+    resultado = []
+    for nombre, descripcion, total in filas:
+        hasta = None
+        if descripcion and descripcion.upper() != "MAXVALUE":
+            hasta = datetime.strptime(descripcion.strip("'")[:10], "%Y-%m-%d").date()
+        resultado.append(Particion(nombre, hasta, int(total or 0)))
+    return resultado
+
+
+def sql_particionar(desde, hasta):
+    """
+    Sentencias para particionar la tabla con un mes por particion de `desde` a `hasta`
+    (excluido) mas pmax. MySQL exige que la clave primaria incluya `timestamp`.
+    """
+    meses = []
+    actual = inicio_mes(desde)
+    while actual < hasta:
+        meses.append(definicion(actual))
+        actual = inicio_mes(actual, 1)
+    meses.append(f"PARTITION {PARTICION_MAXIMA} VALUES LESS THAN (MAXVALUE)")
+    return [
+        f"ALTER TABLE {tabla()} DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `timestamp`)",
+        f"ALTER TABLE {tabla()} PARTITION BY RANGE COLUMNS(`timestamp`) ({', '.join(meses)})",
+    ]
+
+
+def sql_crear_futuras(actuales, hasta):
+    """Divide pmax para que existan particiones mensuales hasta `hasta` (excluido)."""
+    ultima = max((p.hasta for p in actuales if p.hasta), default=None)
+    if ultima is None or ultima >= hasta:
+        return []
+    nuevas = []
+    actual = ultima
+    while actual < hasta:
+        nuevas.append(definicion(actual))
+        actual = inicio_mes(actual, 1)
+    nuevas.append(f"PARTITION {PARTICION_MAXIMA} VALUES LESS THAN (MAXVALUE)")
+    return [f"ALTER TABLE {tabla()} REORGANIZE PARTITION {PARTICION_MAXIMA} INTO ({', '.join(nuevas)})"]
+
+
+def vencidas(actuales, limite):
+    """Particiones cuyo mes termina en o antes de `limite`."""
+    return [p for p in actuales if p.hasta and p.hasta <= limite]
+
+
+def sql_retirar(particion):
+    """Sentencia para retirar una particion vencida y ya vacia (ver tiene_filas())."""
+    return [f"ALTER TABLE {tabla()} DROP PARTITION {particion.nombre}"]
+
+
+def tiene_filas(particion):
+    """True si la particion conserva marcas (TABLE_ROWS es solo una estimacion)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {tabla()} PARTITION ({particion.nombre}) LIMIT 1")
+        return cursor.fetchone() is not None
+
+
+def particiones_leidas(queryset):
+    """Particiones que MySQL leera para el queryset (columna `partitions` de EXPLAIN)."""
+    if not soportado():
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql, params)
+        columnas = [col[0] for col in cursor.description]
+        fila = cursor.fetchone()
+    if not fila or "partitions" not in columnas:
+        return None
+    valor = fila[columnas.index("partitions")]
+    return valor.split(",") if valor else []
@@ -0,0 +1,120 @@
+"""
+Generacion de PDFs de texto (libro de asistencia) sin dependencias externas.
+Este modulo no importa modelos de Django: sus funciones se ejecutan en procesos
+hijos del worker de reportes.
+"""
+
+ANCHO_PAGINA = 595
+ALTO_PAGINA = 842
+MARGEN = 40
+TAMANO_FUENTE = 9
+INTERLINEADO = 11
+LINEAS_POR_PAGINA = (ALTO_PAGINA - 2 * MARGEN) // INTERLINEADO
+
+
+def _texto_pdf(linea: str) -> bytes:
+    data = linea.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _contenido_pagina(lineas) -> bytes:
+    partes = [
+        b"BT",
+        b"/F1 %d Tf" % TAMANO_FUENTE,
+        b"%d TL" % INTERLINEADO,
+        b"%d %d Td" % (MARGEN, ALTO_PAGINA - MARGEN),
+    ]
+    for linea in lineas:
+        partes.append(b"(" + _texto_pdf(linea) + b") '")
+    partes.append(b"ET")
+    return b"\n".join(partes)
+
+
+def documento_pdf(lineas) -> bytes:
+    """Arma un PDF A4 con fuente monoespaciada; pagina automaticamente cada LINEAS_POR_PAGINA lineas."""
+    lineas = list(lineas) or [""]
+    paginas = [lineas[i : i + LINEAS_POR_PAGINA] for i in range(0, len(lineas), LINEAS_POR_PAGINA)]
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # arbol de paginas, se completa al final
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for pagina in paginas:
+        contenido = _contenido_pagina(pagina)
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+        contenido_ref = len(objetos)
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (ANCHO_PAGINA, ALTO_PAGINA, contenido_ref)
+        )
+        kids.append(b"%d 0 R" % len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    salida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, objeto in enumerate(objetos, start=1):
+        offsets.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        salida += b"%010d 00000 n \n" % offset
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+def _duracion(segundos):
+    minutos = int(segundos // 60)
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def lineas_libro_asistencia(datos):
+    """
+    Lineas del libro de asistencia mensual de un trabajador.
+    `datos` contiene solo tipos simples: empresa, periodo, trabajador, turno y
+    marcas como tuplas (fecha 'YYYY-MM-DD', hora 'HH:MM:SS', tipo, segundos_epoch).
+    """
+    trabajador = datos["trabajador"]
+    lineas = [
+        "LIBRO DE ASISTENCIA",
+        f"Empresa: {datos['empresa']}",
+        f"Periodo: {datos['periodo']}",
+        f"Trabajador: {trabajador['nombres']} {trabajador['apellidos']}  RUT: {trabajador['rut']}",
+        f"Cargo: {trabajador.get('cargo') or '-'}  Turno: {datos.get('turno') or '-'}",
+        "",
+        f"{'Fecha':<12}{'Entrada':<10}{'Salida':<10}{'Horas':>8}",
+        "-" * 40,
+    ]
+
+    total = 0
+    abierta = None
+    for fecha, hora, tipo, epoch in datos["marcas"]:
+        if tipo == "entrada":
+            if abierta:
+                lineas.append(f"{abierta[0]:<12}{abierta[1]:<10}{'--':<10}{'':>8}")
+            abierta = (fecha, hora, epoch)
+        elif abierta and abierta[0] == fecha:
+            segundos = epoch - abierta[2]
+            total += segundos
+            lineas.append(f"{fecha:<12}{abierta[1]:<10}{hora:<10}{_duracion(segundos):>8}")
+            abierta = None
+        else:
+            lineas.append(f"{fecha:<12}{'--':<10}{hora:<10}{'':>8}")
+    if abierta:
+        lineas.append(f"{abierta[0]:<12}{abierta[1]:<10}{'--':<10}{'':>8}")
+
+    lineas += ["-" * 40, f"{'Total horas trabajadas':<32}{_duracion(total):>8}", "", "", "_" * 30, "Firma trabajador"]
+    return lineas
+
+
+def renderizar_lote(lote):
+    """Renderiza un lote de trabajadores. Devuelve [(nombre_archivo, bytes_pdf), ...]."""
+    resultado = []
+    for datos in lote:
+        trabajador = datos["trabajador"]
+        nombre = f"{trabajador['rut']}_{datos['periodo']}.pdf".replace("/", "-")
+        resultado.append((nombre, documento_pdf(lineas_libro_asistencia(datos))))
+    return resultado
@@ -0,0 +1,80 @@
+"""
+JSONRenderer que usa orjson cuando esta instalado y produce los mismos bytes que
+el JSONRenderer de DRF: compacto, UTF-8 sin escapar, U+2028/U+2029 escapados y los
+tipos que orjson no trata igual (fechas, Decimal, lazy strings) pasan por el
+encoder de DRF. Con indentacion, sin orjson o ante un valor que orjson no acepta
+(p. ej. enteros de mas de 64 bits) se usa el renderer de DRF.
+
+orjson solo escribe los float igual que json.dumps en 1e-4 <= |x| < 1e16 (fuera de
+ese rango usa otra notacion exponencial: 1e-7 frente a 1e-07) y convierte NaN e
+Infinity en null, donde DRF lanza ValueError. Si los datos traen un float asi, la
+respuesta tambien la genera DRF (los Decimal cuentan: el encoder los pasa a float).
+Recorrer los datos buscando esos float cuesta en respuestas grandes, asi que solo se
+hace si la vista declara floats_en_respuesta = True (o si no hay vista en el contexto);
+las proyecciones de marcas no traen float y no lo declaran.
+"""
+
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+TIPOS_SIMPLES = frozenset((str, int, bool, type(None)))
+
+OPCIONES_ORJSON = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+
+
+def _float_distinto(valor):
+    return not (valor == 0 or 1e-4 <= abs(valor) < 1e16)
+
+
+def tiene_float_distinto(valor):
+    """True si en los datos hay un float que orjson no escribiria como DRF."""
+    if isinstance(valor, (float, Decimal)):
+        return _float_distinto(float(valor))
+    if isinstance(valor, dict):
+        for clave in valor:
+            if type(clave) is not str and isinstance(clave, float) and _float_distinto(clave):
+                return True
+        items = valor.values()
+    elif isinstance(valor, (list, tuple)):
+        items = valor
+    else:
+        return False
+    for item in items:
+        if type(item) not in TIPOS_SIMPLES and tiene_float_distinto(item):
+            return True
+    return False
+
+
+def revisar_floats(renderer_context):
+    """True si hay que buscar float fuera de rango: la vista lo pide o no hay vista."""
+    vista = (renderer_context or {}).get("view")
+    return vista is None or getattr(vista, "floats_en_respuesta", False)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+            or (revisar_floats(renderer_context) and tiene_float_distinto(data))
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPCIONES_ORJSON)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que DRF: JSON que tambien es un subconjunto valido de JavaScript.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
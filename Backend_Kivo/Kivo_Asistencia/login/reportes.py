@@ -0,0 +1,172 @@
+import calendar
+import heapq
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import archivo_marcas
+from .models import Empresa, Marcas, ReporteJob, Trabajador
+from .pdf import renderizar_lote
+
+
+def timeout_procesando():
+    """Segundos tras los que un job en 'procesando' se da por abandonado (worker caido o detenido)."""
+    return getattr(settings, "REPORTES_TIMEOUT_SEGUNDOS", 2 * 3600)
+
+
+def tomar_siguiente_job():
+    """
+    Marca como 'procesando' el job pendiente mas antiguo y lo devuelve (None si no hay).
+    Un job que sigue en 'procesando' con iniciado_en mas antiguo que timeout_procesando()
+    se vuelve a tomar desde cero.
+    """
+    abandonado = Q(estado="procesando", iniciado_en__lt=timezone.now() - timedelta(seconds=timeout_procesando()))
+    with transaction.atomic():
+        qs = ReporteJob.objects.filter(Q(estado="pendiente") | abandonado).order_by("creado_en", "id")
+        qs = qs.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        job = qs.first()
+        if job is None:
+            return None
+        job.estado = "procesando"
+        job.iniciado_en = timezone.now()
+        job.procesados = 0
+        job.save(update_fields=["estado", "iniciado_en", "procesados"])
+    return job
+
+
+def rango_mes(anio, mes):
+    tz = timezone.get_current_timezone()
+    ultimo_dia = calendar.monthrange(anio, mes)[1]
+    inicio = timezone.make_aware(datetime.combine(date(anio, mes, 1), time.min), tz)
+    fin = timezone.make_aware(datetime.combine(date(anio, mes, ultimo_dia), time.max), tz)
+    return inicio, fin
+
+
+def datos_lote(empresa, trabajador_ids, anio, mes):
+    """
+    Carga en tipos simples lo necesario para renderizar un lote en un proceso hijo,
+    con las marcas de la tabla y las del archivo si el mes ya se archivo.
+    """
+    inicio, fin = rango_mes(anio, mes)
+    trabajadores = (
+        Trabajador.objects.filter(id__in=trabajador_ids)
+        .select_related("turno")
+        .order_by("apellidos", "nombres", "id")
+    )
+    tabla = (
+        Marcas.objects.filter(trabajador_id__in=trabajador_ids, timestamp__range=(inicio, fin))
+        .order_by("timestamp", "id")
+        .values_list("timestamp", "id", "trabajador_id", "tipo_marca")
+    )
+    inicio_archivo, fin_archivo = archivo_marcas.rango_mes(anio, mes)
+    filtro = archivo_marcas.Filtro(trabajadores=list(trabajador_ids), inicio=inicio_archivo, fin=fin_archivo)
+    archivadas = ((ts, marca_id, t, tipo) for marca_id, ts, t, tipo, _ in archivo_marcas.iterar(filtro))
+    marcas = {}
+    for ts, _, trabajador_id, tipo in heapq.merge(tabla, archivadas):
+        local = timezone.localtime(ts)
+        marcas.setdefault(trabajador_id, []).append(
+            (local.date().isoformat(), local.strftime("%H:%M:%S"), tipo, ts.timestamp())
+        )
+
+    return [
+        {
+            "empresa": empresa.razon_social,
+            "periodo": f"{anio}-{mes:02d}",
+            "trabajador": {
+                "rut": t.rut,
+                "nombres": t.nombres,
+                "apellidos": t.apellidos,
+                "cargo": t.cargo,
+            },
+            "turno": str(t.turno) if t.turno else None,
+            "marcas": marcas.get(t.id, []),
+        }
+        for t in trabajadores
+    ]
+
+
+def generar_libro_asistencia(job, procesos=None, tamano_lote=50):
+    """
+    Genera un zip con un PDF por trabajador de la empresa del job.
+    Los lotes de trabajadores se renderizan en paralelo en un pool de procesos;
+    este proceso solo consulta la base de datos y escribe el zip.
+    """
+    empresa = Empresa.objects.get(id=job.empresa_id)
+    ids = list(
+        Trabajador.objects.filter(empresa_id=job.empresa_id)
+        .order_by("apellidos", "nombres", "id")
+        .values_list("id", flat=True)
+    )
+    job.total_trabajadores = len(ids)
+    job.save(update_fields=["total_trabajadores"])
+    lotes = [ids[i : i + tamano_lote] for i in range(0, len(ids), tamano_lote)]
+
+    directorio = os.path.join(settings.MEDIA_ROOT, "reportes")
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"libro_asistencia_{empresa.id}_{job.anio}-{job.mes:02d}_{job.id}.zip"
+    fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    os.close(fd)
+
+    procesos = procesos or os.cpu_count() or 1
+    try:
+        # spawn: los procesos hijos no heredan la conexion abierta a la base de datos, sin
+        # importar en que momento los cree el pool (con fork, segun la version de Python,
+        # se crean todos en el primer submit o a demanda en submits posteriores).
+        with zipfile.ZipFile(temporal, "w", compression=zipfile.ZIP_DEFLATED) as zf, ProcessPoolExecutor(
+            max_workers=procesos, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            pendientes = set()
+            for lote in lotes:
+                datos = datos_lote(empresa, lote, job.anio, job.mes)
+                pendientes.add(pool.submit(renderizar_lote, datos))
+                if len(pendientes) >= procesos * 2:
+                    listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    _escribir(job, zf, listos)
+            while pendientes:
+                listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                _escribir(job, zf, listos)
+
+        os.replace(temporal, os.path.join(directorio, nombre))
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return f"reportes/{nombre}"
+
+
+def _escribir(job, zf, futuros):
+    for futuro in futuros:
+        archivos = futuro.result()
+        for nombre, contenido in archivos:
+            zf.writestr(nombre, contenido)
+        job.procesados += len(archivos)
+    job.save(update_fields=["procesados"])
+
+
+GENERADORES = {
+    "libro_asistencia_pdf": generar_libro_asistencia,
+}
+
+
+def ejecutar_job(job, procesos=None):
+    try:
+        ruta = GENERADORES[job.tipo](job, procesos=procesos)
+    except Exception as exc:
+        job.estado = "error"
+        job.error = str(exc)
+        job.terminado_en = timezone.now()
+        job.save(update_fields=["estado", "error", "terminado_en"])
+        raise
+    job.archivo.name = ruta
+    job.estado = "completado"
+    job.terminado_en = timezone.now()
+    job.save(update_fields=["archivo", "estado", "terminado_en"])
+    return job
@@ -0,0 +1,90 @@
+"""
+Calculo del resumen diario de asistencia de un trabajador.
+Funciones puras (sin consultas): las usan ResumenDiario y el comando de recalculo.
+
+Una jornada (entrada y la salida que la cierra) se atribuye al dia local de su entrada,
+aunque la salida caiga despues de medianoche (turnos de noche).
+"""
+
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+# Una entrada solo se cierra con la salida siguiente si esta ocurre dentro de este plazo.
+JORNADA_MAXIMA = timedelta(hours=24)
+
+
+def _minutos(delta):
+    return int(delta.total_seconds() // 60)
+
+
+def agrupar_por_jornada(marcas):
+    """
+    {fecha: [(timestamp, tipo_marca), ...]} a partir de las marcas de un trabajador
+    ordenadas por timestamp. La salida que cierra una entrada abierta queda en el dia
+    de esa entrada; las demas marcas, en su propio dia local.
+
+    Para obtener completos los dias desde..hasta, `marcas` debe cubrir ademas
+    JORNADA_MAXIMA antes y despues del rango.
+    """
+    dias = {}
+    abierta = None
+    for ts, tipo in marcas:
+        fecha = timezone.localdate(ts)
+        if tipo == "entrada":
+            abierta = ts
+        else:
+            if abierta is not None and ts - abierta <= JORNADA_MAXIMA:
+                fecha = timezone.localdate(abierta)
+            abierta = None
+        dias.setdefault(fecha, []).append((ts, tipo))
+    return dias
+
+
+def calcular_dia(fecha, marcas, hora_entrada=None, hora_salida=None, tolerancia=0):
+    """
+    Resume las marcas de un dia local, ya agrupadas con agrupar_por_jornada().
+    `marcas` son tuplas (timestamp, tipo_marca) ordenadas por timestamp.
+    El atraso se cuenta desde hora_entrada solo si supera la tolerancia del turno;
+    las horas extra son los minutos despues de hora_salida, que en un turno de noche
+    (hora_salida < hora_entrada) es la del dia siguiente.
+    """
+    tz = timezone.get_current_timezone()
+    primera_entrada = None
+    ultima_salida = None
+    segundos = 0
+    abierta = None
+
+    for ts, tipo in marcas:
+        if tipo == "entrada":
+            if primera_entrada is None:
+                primera_entrada = ts
+            abierta = ts
+        else:
+            ultima_salida = ts
+            if abierta is not None:
+                segundos += (ts - abierta).total_seconds()
+                abierta = None
+
+    minutos_atraso = 0
+    if primera_entrada and hora_entrada:
+        inicio_turno = timezone.make_aware(datetime.combine(fecha, hora_entrada), tz)
+        retraso = _minutos(primera_entrada - inicio_turno)
+        if retraso > tolerancia:
+            minutos_atraso = retraso
+
+    minutos_extra = 0
+    if ultima_salida and hora_salida:
+        fecha_salida = fecha
+        if hora_entrada and hora_salida < hora_entrada:
+            fecha_salida = fecha + timedelta(days=1)
+        fin_turno = timezone.make_aware(datetime.combine(fecha_salida, hora_salida), tz)
+        minutos_extra = max(_minutos(ultima_salida - fin_turno), 0)
+
+    return {
+        "primera_entrada": primera_entrada,
+        "ultima_salida": ultima_salida,
+        "minutos_trabajados": int(segundos // 60),
+        "minutos_atraso": minutos_atraso,
+        "minutos_extra": minutos_extra,
+    }
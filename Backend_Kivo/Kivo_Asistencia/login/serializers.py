@@ -1,24 +1,42 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework.settings import api_settings as api_settings_drf
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework import ISO_8601, serializers
 from django.contrib.auth import authenticate
 from django.utils import timezone
 
+from . import autorizacion, descargas, documentos
 from .models import (
     AuditoriaCambio,
     Empresa,
     EmpresaUsuario,
+    ImportacionJob,
     Licencia,
     Marcas,
+    ReporteJob,
     Trabajador,
     Turno,
     Usuario,
     Vacaciones,
+    VerificacionMarcas,
 )
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = "rut"
 
+    @classmethod
+    def get_token(cls, user):
+        """Incluye en el token lo que la autenticacion necesita para no leer Usuario en cada request."""
+        token = super().get_token(user)
+        token["rol"] = user.rol
+        token["estado"] = user.estado
+        token["trabajador_id"] = user.trabajador_id
+        token["tv"] = user.token_version
+        return token
+
     def validate(self, attrs):
         rut = attrs.get("rut")
         password = attrs.get("password")
@@ -75,6 +93,23 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    """Renueva el access token solo si el usuario sigue activo y el refresh no fue revocado."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        vigente = (
+            Usuario.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM))
+            .values_list("token_version", "estado")
+            .first()
+        )
+        if vigente is None or vigente[1] != "activo":
+            raise AuthenticationFailed("Usuario inactivo o bloqueado", code="user_inactive")
+        if "tv" in refresh.payload and refresh.payload["tv"] != vigente[0]:
+            raise AuthenticationFailed("Token revocado", code="token_revoked")
+        return {"access": str(refresh.access_token)}
+
+
 class VacacionesSerializer(serializers.ModelSerializer):
     trabajador_nombre = serializers.CharField(source="trabajador.nombres", read_only=True)
 
@@ -86,11 +121,54 @@ class VacacionesSerializer(serializers.ModelSerializer):
 
 class LicenciaSerializer(serializers.ModelSerializer):
     trabajador_nombre = serializers.CharField(source="trabajador.nombres", read_only=True)
+    archivo_url = serializers.SerializerMethodField()
+    documento_sha256 = serializers.CharField(
+        write_only=True,
+        required=False,
+        help_text="SHA-256 de un documento ya almacenado, en lugar de volver a subir `archivo`",
+    )
 
     class Meta:
         model = Licencia
         fields = "__all__"
-        read_only_fields = ["estado", "creado_por", "creado_en", "resuelto_por", "resuelto_en"]
+        read_only_fields = ["estado", "creado_por", "creado_en", "resuelto_por", "resuelto_en", "documento"]
+
+    def get_archivo_url(self, obj):
+        if not obj.archivo:
+            return None
+        return descargas.url_firmada(self.context.get("request"), "licencia_archivo", obj.pk)
+
+    def validate_documento_sha256(self, value):
+        request = self.context.get("request")
+        empresa_ids = request.user.empresas_ids() if request else []
+        documento = documentos.buscar(value, empresa_ids)
+        if documento is None:
+            raise serializers.ValidationError("No existe un documento con ese hash; suba el archivo.")
+        return documento
+
+    def validate(self, attrs):
+        documento = attrs.pop("documento_sha256", None)
+        if documento is not None:
+            if attrs.get("archivo"):
+                raise serializers.ValidationError({"detail": "Envie el archivo o su hash, no ambos."})
+            attrs["documento"] = documento
+        return super().validate(attrs)
+
+    def _con_documento(self, validated_data):
+        """El archivo subido se guarda en el almacen por contenido y `archivo` apunta ahi."""
+        if "archivo" in validated_data:
+            archivo = validated_data.pop("archivo")
+            validated_data["documento"] = documentos.almacenar(archivo) if archivo else None
+        if "documento" in validated_data:
+            documento = validated_data["documento"]
+            validated_data["archivo"] = documento.archivo.name if documento else None
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._con_documento(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._con_documento(validated_data))
 
 
 class MarcaSerializer(serializers.ModelSerializer):
@@ -116,18 +194,112 @@ class MarcaSerializer(serializers.ModelSerializer):
         ]
 
 
+def representacion_fecha(campo):
+    """
+    Funcion equivalente a campo.to_representation para un DateTimeField de DRF. Con
+    formato ISO 8601 y zona horaria fija evita la maquinaria de DRF en cada fila.
+    """
+    formato = getattr(campo, "format", api_settings_drf.DATETIME_FORMAT)
+    zona = campo.timezone if hasattr(campo, "timezone") else campo.default_timezone()
+    if formato is None or formato.lower() != ISO_8601 or zona is None:
+        return campo.to_representation
+
+    def representar(valor):
+        if not valor:
+            return None
+        texto = valor.astimezone(zona).isoformat()
+        return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+
+    return representar
+
+
+class MarcaProyeccion:
+    """
+    Misma salida que MarcaSerializer armada desde values_list(*columnas, named=True), con
+    el trabajador y la empresa ya unidos en la consulta: sin instancias de modelo ni
+    campos de DRF por fila. Como DRF, omite los datos del trabajador (y la empresa)
+    cuando la FK es nula.
+    """
+
+    columnas = (
+        "id",
+        "tipo_marca",
+        "timestamp",
+        "hash",
+        "trabajador_id",
+        "trabajador__rut",
+        "trabajador__nombres",
+        "trabajador__apellidos",
+        "trabajador__empresa_id",
+        "trabajador__empresa__razon_social",
+    )
+
+    def __init__(self):
+        self.fecha = representacion_fecha(MarcaSerializer().fields["timestamp"])
+
+    def filas(self, valores):
+        fecha = self.fecha
+        resultado = []
+        for valor in valores:
+            fila = {
+                "id": valor.id,
+                "tipo_marca": valor.tipo_marca,
+                "timestamp": fecha(valor.timestamp),
+                "hash": valor.hash,
+            }
+            if valor.trabajador_id is not None:
+                fila["trabajador_id"] = valor.trabajador_id
+                fila["trabajador_rut"] = valor.trabajador__rut
+                fila["trabajador_nombre"] = valor.trabajador__nombres
+                fila["trabajador_apellido"] = valor.trabajador__apellidos
+                if valor.trabajador__empresa_id is not None:
+                    fila["empresa"] = valor.trabajador__empresa__razon_social
+            resultado.append(fila)
+        return resultado
+
+
+class MarcaSincronizacionSerializer(serializers.Serializer):
+    clave_idempotencia = serializers.CharField(max_length=64)
+    tipo_marca = serializers.ChoiceField(choices=["entrada", "salida"])
+    timestamp = serializers.DateTimeField()
+    trabajador_id = serializers.IntegerField(required=False)
+
+
+class SincronizarMarcasSerializer(serializers.Serializer):
+    marcas = MarcaSincronizacionSerializer(many=True, allow_empty=False, max_length=1000)
+
+
 class MarcaBasicSerializer(serializers.ModelSerializer):
     class Meta:
         model = Marcas
         fields = ["id", "tipo_marca", "timestamp"]
 
 
-class TrabajadorProfileSerializer(serializers.ModelSerializer):
-    marcas = MarcaBasicSerializer(many=True, read_only=True, source="marcas_set")
+class MarcaBasicaProyeccion:
+    """Misma salida que MarcaBasicSerializer desde values_list(*columnas, named=True)."""
+
+    columnas = ("id", "tipo_marca", "timestamp")
+
+    def __init__(self):
+        self.fecha = representacion_fecha(MarcaBasicSerializer().fields["timestamp"])
+
+    def filas(self, valores):
+        fecha = self.fecha
+        return [
+            {"id": valor.id, "tipo_marca": valor.tipo_marca, "timestamp": fecha(valor.timestamp)} for valor in valores
+        ]
+
+
+class TrabajadorListSerializer(serializers.ModelSerializer):
+    """
+    Ficha del trabajador para listados de una empresa: sin marcas ni resumen, el costo
+    no crece con el historial. Requiere select_related("empresa", "usuario").
+    """
+
     usuario_id = serializers.IntegerField(source="usuario.id", read_only=True)
     empresa_id = serializers.IntegerField(source="empresa.id", read_only=True)
     empresa_nombre = serializers.CharField(source="empresa.razon_social", read_only=True)
-    turno_id = serializers.IntegerField(source="turno.id", read_only=True)
+    turno_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Trabajador
@@ -146,9 +318,38 @@ class TrabajadorProfileSerializer(serializers.ModelSerializer):
             "empresa_nombre",
             "turno_id",
             "estado",
-            "marcas",
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Como con source="turno.id": sin turno la clave no se envia (sin cargar el turno).
+        if data.get("turno_id") is None:
+            data.pop("turno_id", None)
+        return data
+
+
+class TrabajadorProfileSerializer(TrabajadorListSerializer):
+    """
+    Perfil con las ultimas marcas (prefetch `marcas_recientes`) y el resumen del mes
+    (anotaciones `*_mes`); el historial completo esta en api/trabajadores/<pk>/marcas/.
+    """
+
+    marcas = MarcaBasicSerializer(many=True, read_only=True, source="marcas_recientes")
+    resumen_mes = serializers.SerializerMethodField()
+
+    class Meta(TrabajadorListSerializer.Meta):
+        fields = TrabajadorListSerializer.Meta.fields + ["resumen_mes", "marcas"]
+
+    def get_resumen_mes(self, obj):
+        minutos = obj.minutos_trabajados_mes or 0
+        return {
+            "dias_trabajados": obj.dias_trabajados_mes,
+            "horas_trabajadas": round(minutos / 60, 2),
+            "atrasos": obj.atrasos_mes,
+            "minutos_atraso": obj.minutos_atraso_mes or 0,
+            "minutos_extra": obj.minutos_extra_mes or 0,
+        }
+
 
 class UsuarioListSerializer(serializers.ModelSerializer):
     trabajador_id = serializers.IntegerField(source="trabajador.id", read_only=True)
@@ -179,7 +380,8 @@ class UsuarioListSerializer(serializers.ModelSerializer):
                 "razon_social": rel.empresa.razon_social,
                 "rol": rel.rol,
             }
-            for rel in obj.empresas_usuario.select_related("empresa")
+            # .all() usa el prefetch_related("empresas_usuario__empresa") de la vista.
+            for rel in obj.empresas_usuario.all()
         ]
 
 
@@ -539,6 +741,7 @@ class CrearUsuarioGeneralSerializer(serializers.Serializer):
                 for item in empresas_para_asignar
             ]
             EmpresaUsuario.objects.bulk_create(relaciones, ignore_conflicts=True)
+            autorizacion.invalidar(usuario.id)
 
         return {
             "usuario_id": usuario.id,
@@ -548,3 +751,143 @@ class CrearUsuarioGeneralSerializer(serializers.Serializer):
             "rol": usuario.rol,
             "estado": usuario.estado,
         }
+
+
+class FilaImportacionSerializer(serializers.Serializer):
+    """
+    Una fila del CSV de importacion masiva. Solo valida formato y campos obligatorios;
+    unicidad y referencias (empresa, turno) se validan por lote en importacion.py.
+    """
+
+    rut = serializers.CharField(max_length=20)
+    email = serializers.EmailField()
+    password = serializers.CharField(max_length=128)
+    rol = serializers.ChoiceField(choices=["trabajador", "asistente_rrhh", "admin_rrhh", "fiscalizador"])
+    nombres = serializers.CharField(max_length=255, required=False)
+    apellidos = serializers.CharField(max_length=255, required=False)
+    cargo = serializers.CharField(max_length=100, required=False)
+    area_trabajador = serializers.CharField(max_length=100, required=False)
+    tipo_contrato = serializers.ChoiceField(
+        required=False,
+        choices=[choice[0] for choice in Trabajador._meta.get_field("tipo_contrato").choices],
+    )
+    correo = serializers.EmailField(required=False)
+    empresa_id = serializers.IntegerField(required=False)
+    turno_id = serializers.IntegerField(required=False)
+    fecha_ingreso = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs["rol"] == "trabajador":
+            faltantes = [f for f in ["nombres", "apellidos", "empresa_id"] if not attrs.get(f)]
+            if faltantes:
+                raise serializers.ValidationError(
+                    {"detail": f"Faltan campos obligatorios del trabajador: {faltantes}"}
+                )
+        return attrs
+
+
+class ReporteJobSerializer(serializers.ModelSerializer):
+    empresa_id = serializers.IntegerField()
+    archivo_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReporteJob
+        fields = [
+            "id",
+            "tipo",
+            "empresa_id",
+            "anio",
+            "mes",
+            "estado",
+            "total_trabajadores",
+            "procesados",
+            "error",
+            "archivo_url",
+            "creado_en",
+            "iniciado_en",
+            "terminado_en",
+        ]
+        read_only_fields = [
+            "estado",
+            "total_trabajadores",
+            "procesados",
+            "error",
+            "creado_en",
+            "iniciado_en",
+            "terminado_en",
+        ]
+
+    def validate_mes(self, value):
+        if not 1 <= value <= 12:
+            raise serializers.ValidationError("Mes invalido")
+        return value
+
+    def get_archivo_url(self, obj):
+        if obj.estado != "completado" or not obj.archivo:
+            return None
+        return descargas.url_firmada(self.context.get("request"), "reporte_archivo", obj.pk)
+
+
+class ImportacionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportacionJob
+        fields = [
+            "id",
+            "empresa_id",
+            "estado",
+            "total",
+            "creados",
+            "con_errores",
+            "errores",
+            "error",
+            "creado_en",
+            "iniciado_en",
+            "terminado_en",
+        ]
+        read_only_fields = fields
+
+
+class VerificacionMarcasSerializer(serializers.ModelSerializer):
+    empresa_id = serializers.IntegerField()
+    avance = serializers.SerializerMethodField()
+    marcas_por_segundo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = VerificacionMarcas
+        fields = [
+            "id",
+            "empresa_id",
+            "incremental",
+            "estado",
+            "desde_id",
+            "hasta_id",
+            "ultimo_id",
+            "total",
+            "revisadas",
+            "discrepancias",
+            "avance",
+            "marcas_por_segundo",
+            "error",
+            "creado_en",
+            "iniciado_en",
+            "terminado_en",
+        ]
+        read_only_fields = [
+            "estado",
+            "desde_id",
+            "hasta_id",
+            "ultimo_id",
+            "total",
+            "revisadas",
+            "discrepancias",
+            "error",
+            "creado_en",
+            "iniciado_en",
+            "terminado_en",
+        ]
+
+    def get_avance(self, obj):
+        return round(obj.revisadas / obj.total, 4) if obj.total else None
+
+    def get_marcas_por_segundo(self, obj):
+        return round(obj.revisadas / obj.segundos) if obj.segundos else None
@@ -0,0 +1,156 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autorizacion, documentos, versiones
+from .authentication import olvidar_version
+from .models import (
+    Empresa,
+    EmpresaUsuario,
+    Licencia,
+    Marcas,
+    Trabajador,
+    TrabajadorArchivado,
+    Turno,
+    Usuario,
+    Vacaciones,
+    empresa_del_trabajador,
+)
+
+
+@receiver(post_save, sender=EmpresaUsuario)
+@receiver(post_delete, sender=EmpresaUsuario)
+def invalidar_autorizacion_empresa_usuario(sender, instance, **kwargs):
+    autorizacion.invalidar(instance.usuario_id)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_autorizacion_usuario(sender, instance, **kwargs):
+    autorizacion.invalidar(instance.id)
+
+
+# Campos que viajan en el JWT (o que lo respaldan): si cambian, los tokens emitidos se revocan.
+CAMPOS_TOKEN = ("rol", "estado", "trabajador_id", "password")
+
+
+@receiver(pre_save, sender=Usuario)
+def detectar_cambio_credenciales(sender, instance, update_fields=None, **kwargs):
+    """
+    token_version siempre se toma de la base de datos (una instancia vieja no debe
+    deshacer una revocacion) y sube en uno si cambia algun campo de CAMPOS_TOKEN.
+    """
+    instance._revocar_tokens = False
+    if instance._state.adding or instance.pk is None:
+        return
+    anterior = Usuario.objects.filter(pk=instance.pk).values("token_version", *CAMPOS_TOKEN).first()
+    if anterior is None:
+        return
+    cambio = any(anterior[campo] != getattr(instance, campo) for campo in CAMPOS_TOKEN)
+    instance.token_version = anterior["token_version"] + int(cambio)
+    if cambio and update_fields is not None and "token_version" not in update_fields:
+        instance._revocar_tokens = True
+
+
+@receiver(post_save, sender=Usuario)
+def revocar_tokens_usuario(sender, instance, created, **kwargs):
+    if getattr(instance, "_revocar_tokens", False):
+        instance._revocar_tokens = False
+        instance.revocar_tokens()
+    olvidar_version(instance.id)
+
+
+@receiver(post_init, sender=Trabajador)
+def recordar_empresa_trabajador(sender, instance, **kwargs):
+    # Con .only()/.defer() sin empresa_id, leerlo aqui costaria una consulta por instancia:
+    # se completa en completar_empresa_trabajador solo si la instancia se guarda o borra.
+    if "empresa_id" not in instance.get_deferred_fields():
+        instance._empresa_id_original = instance.empresa_id
+
+
+@receiver(pre_save, sender=Trabajador)
+@receiver(pre_delete, sender=Trabajador)
+def completar_empresa_trabajador(sender, instance, **kwargs):
+    if hasattr(instance, "_empresa_id_original"):
+        return
+    instance._empresa_id_original = (
+        Trabajador.objects.filter(pk=instance.pk).values_list("empresa_id", flat=True).first()
+    )
+    if "empresa_id" in instance.get_deferred_fields():
+        # No se asigno: se deja cargado para los receivers de post_save/post_delete.
+        instance.empresa_id = instance._empresa_id_original
+
+
+@receiver(post_save, sender=Trabajador)
+@receiver(post_delete, sender=Trabajador)
+def versionar_trabajador(sender, instance, **kwargs):
+    versiones.incrementar("trabajadores", instance.empresa_id, instance._empresa_id_original)
+
+
+@receiver(post_save, sender=Trabajador)
+def mover_historial_trabajador(sender, instance, created, **kwargs):
+    """
+    Si el trabajador cambia de empresa, su historial lo sigue (empresa denormalizada).
+    Sus marcas archivadas quedan en los archivos de la empresa anterior; TrabajadorArchivado
+    las reasigna a la nueva sin reescribirlos.
+    """
+    if created or instance.empresa_id == instance._empresa_id_original:
+        return
+    for modelo, recurso in RECURSOS_POR_TRABAJADOR.items():
+        modelo.objects.filter(trabajador=instance).update(empresa_id=instance.empresa_id)
+        versiones.incrementar(recurso, instance.empresa_id, instance._empresa_id_original)
+    TrabajadorArchivado.objects.filter(trabajador_id=instance.id).update(empresa_id=instance.empresa_id)
+
+
+@receiver(post_save, sender=Trabajador)
+def invalidar_autorizacion_trabajador(sender, instance, created, **kwargs):
+    if not created and instance.empresa_id != instance._empresa_id_original:
+        autorizacion.invalidar(*Usuario.objects.filter(trabajador=instance).values_list("id", flat=True))
+    instance._empresa_id_original = instance.empresa_id
+
+
+@receiver(pre_save, sender=Licencia)
+def recordar_documento_licencia(sender, instance, update_fields=None, **kwargs):
+    """El documento anterior se lee de la base de datos para no contar dos veces con instancias viejas."""
+    instance._documento_id_anterior = instance.documento_id
+    if instance._state.adding or instance.pk is None:
+        instance._documento_id_anterior = None
+    elif update_fields is None or "documento" in update_fields:
+        instance._documento_id_anterior = (
+            Licencia.objects.filter(pk=instance.pk).values_list("documento_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Licencia)
+def contar_referencias_licencia(sender, instance, **kwargs):
+    if instance.documento_id != instance._documento_id_anterior:
+        documentos.ajustar_referencias(agregar=instance.documento_id, quitar=instance._documento_id_anterior)
+
+
+@receiver(post_delete, sender=Licencia)
+def liberar_documento_licencia(sender, instance, **kwargs):
+    documentos.ajustar_referencias(quitar=instance.documento_id)
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def versionar_empresa(sender, instance, **kwargs):
+    versiones.incrementar("empresas", instance.id)
+
+
+@receiver(post_save, sender=Turno)
+@receiver(post_delete, sender=Turno)
+def versionar_turno(sender, instance, **kwargs):
+    versiones.incrementar("turnos", instance.empresa_id)
+
+
+RECURSOS_POR_TRABAJADOR = {Marcas: "marcas", Licencia: "licencias", Vacaciones: "vacaciones"}
+
+
+@receiver(post_save, sender=Marcas)
+@receiver(post_delete, sender=Marcas)
+@receiver(post_save, sender=Licencia)
+@receiver(post_delete, sender=Licencia)
+@receiver(post_save, sender=Vacaciones)
+@receiver(post_delete, sender=Vacaciones)
+def versionar_por_trabajador(sender, instance, **kwargs):
+    versiones.incrementar(RECURSOS_POR_TRABAJADOR[sender], instance.empresa_id or empresa_del_trabajador(instance))
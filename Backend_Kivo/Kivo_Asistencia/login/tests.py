@@ -1,3 +1,1108 @@
-from django.test import TestCase
+import csv
+import hashlib
+import importlib
+import os
+import tempfile
+import time as reloj
+import uuid
+import zipfile
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.test import APIClient
+
+from . import archivo_marcas, auditoria, authentication, cache_referencia, importacion, merkle, reportes, verificacion
+from .models import (
+    AuditoriaCambio,
+    DocumentoAlmacenado,
+    Empresa,
+    EmpresaUsuario,
+    EstadoJornada,
+    ImportacionJob,
+    Licencia,
+    Marcas,
+    PeriodoArchivado,
+    RaizMerkle,
+    ReporteJob,
+    ResumenDiario,
+    Trabajador,
+    Turno,
+    Usuario,
+    Vacaciones,
+    VerificacionMarcas,
+)
+from .motor_asistencia import calcular_periodo
+from .renderers import JSONRapidoRenderer
+from .serializers import MyTokenObtainPairSerializer
+from .views import DescargaArchivoView, LicenciaArchivoView, ReporteArchivoView
+
+
+# Auditoria insertada en el momento y con el spool fuera del proyecto.
+AUDITORIA_PRUEBAS = {"MODO": "sincrono", "SPOOL_DIR": os.path.join(tempfile.gettempdir(), "kivo_auditoria_pruebas")}
+
+
+def crear_empresa(rut="76000000-0", nombre="Empresa"):
+    return Empresa.objects.create(razon_social=nombre, rut_empresa=rut)
+
+
+def crear_trabajador(empresa, rut, nombres="Ana", apellidos="Perez", turno=None):
+    return Trabajador.objects.create(empresa=empresa, rut=rut, nombres=nombres, apellidos=apellidos, turno=turno)
+
+
+def crear_usuario(rut, rol, trabajador=None, empresas=()):
+    usuario = Usuario.objects.create(
+        rut=rut, email=f"{rut}@kivo.cl", password="x", rol=rol, trabajador=trabajador
+    )
+    for empresa in empresas:
+        EmpresaUsuario.objects.create(usuario=usuario, empresa=empresa, rol=rol)
+    return usuario
+
+
+class ReconstruirEstadoJornadaTests(TestCase):
+    def test_borra_estados_sin_marcas_aunque_haya_marcas_sin_trabajador(self):
+        empresa = crear_empresa()
+        trabajador = crear_trabajador(empresa, "11111111-1")
+        EstadoJornada.objects.create(trabajador=trabajador, ultimo_tipo="entrada", entrada_abierta=True)
+        Marcas(trabajador=None, tipo_marca="entrada").save()
+
+        call_command("reconstruir_estado_jornada", stdout=StringIO())
+
+        self.assertFalse(EstadoJornada.objects.filter(trabajador=trabajador).exists())
+
+
+class SincronizarMarcasTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        self.trabajador = crear_trabajador(self.empresa, "11111111-1")
+        self.client = APIClient()
+
+    def sincronizar(self, usuario, marcas):
+        self.client.force_authenticate(usuario)
+        return self.client.post("/api/asistencias/sincronizar/", {"marcas": marcas}, format="json")
+
+    def test_rrhh_sin_trabajador_id_usa_su_propia_ficha(self):
+        rrhh = crear_usuario("22222222-2", "asistente_rrhh", trabajador=self.trabajador, empresas=[self.empresa])
+
+        response = self.sincronizar(
+            rrhh, [{"clave_idempotencia": "a1", "tipo_marca": "entrada", "timestamp": "2024-03-04T09:00:00-03:00"}]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["creadas"], 1)
+        self.assertEqual(Marcas.objects.get().trabajador_id, self.trabajador.id)
+
+    def test_reintento_con_otro_timestamp_es_duplicada(self):
+        usuario = crear_usuario("11111111-1", "trabajador", trabajador=self.trabajador)
+        marca = {"clave_idempotencia": "a1", "tipo_marca": "entrada", "timestamp": "2024-03-04T09:00:00-03:00"}
+        primera = self.sincronizar(usuario, [marca])
+
+        reintento = self.sincronizar(usuario, [dict(marca, timestamp="2024-03-04T09:05:00-03:00")])
+
+        self.assertEqual(reintento.data["duplicadas"], 1)
+        self.assertEqual(reintento.data["resultados"][0]["id"], primera.data["resultados"][0]["id"])
+        self.assertEqual(Marcas.objects.count(), 1)
+
+
+class RangoFechasTests(TestCase):
+    def test_fecha_inexistente_responde_400(self):
+        empresa = crear_empresa()
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+
+        for url in ("/api/asistencias/?desde=2024-02-30", f"/api/empresas/{empresa.id}/nomina/?fecha=2024-13-01"):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 400)
+
+    def test_ids_no_numericos_responden_400(self):
+        empresa = crear_empresa()
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+
+        for url in ("/api/asistencias/", "/api/asistencias/exportar/"):
+            for parametro in ("empresa_id", "trabajador_id"):
+                with self.subTest(url=url, parametro=parametro):
+                    response = client.get(url, {parametro: "abc"})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(parametro, response.data)
+
+    def test_usuario_id_no_numerico_en_auditoria_responde_400(self):
+        empresa = crear_empresa()
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+
+        for url in ("/api/auditoria/", "/api/auditoria/exportar/"):
+            with self.subTest(url=url):
+                response = client.get(url, {"usuario_id": "abc"})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("usuario_id", response.data)
+
+    def test_cierre_rechaza_rangos_de_mas_de_31_dias(self):
+        empresa = crear_empresa()
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+        url = f"/api/empresas/{empresa.id}/cierre/"
+
+        self.assertEqual(client.get(url, {"desde": "2024-01-01", "hasta": "2024-01-31"}).status_code, 200)
+        self.assertEqual(client.get(url, {"desde": "2024-01-01", "hasta": "2024-02-01"}).status_code, 400)
+
+
+def marcar(trabajador, tipo, momento):
+    marca = Marcas(trabajador=trabajador, tipo_marca=tipo, timestamp=momento)
+    marca.save()
+    return marca
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class ReporteJobTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        self.usuario = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.empresa])
+
+    def crear_job(self, **campos):
+        return ReporteJob.objects.create(empresa=self.empresa, anio=2024, mes=3, solicitado_por=self.usuario, **campos)
+
+    def test_retoma_jobs_abandonados_en_procesando(self):
+        vigente = self.crear_job(estado="procesando", iniciado_en=timezone.now() - timedelta(minutes=10))
+        abandonado = self.crear_job(
+            estado="procesando",
+            iniciado_en=timezone.now() - timedelta(seconds=reportes.timeout_procesando() + 60),
+            procesados=7,
+        )
+
+        job = reportes.tomar_siguiente_job()
+
+        self.assertEqual(job.id, abandonado.id)
+        self.assertEqual(job.procesados, 0)
+        self.assertGreater(job.iniciado_en, timezone.now() - timedelta(minutes=1))
+        self.assertIsNone(reportes.tomar_siguiente_job())
+        vigente.refresh_from_db()
+        self.assertEqual(vigente.estado, "procesando")
+
+    def test_genera_el_libro_en_procesos_hijos(self):
+        trabajador = crear_trabajador(self.empresa, "11111111-1")
+        marcar(trabajador, "entrada", local(2024, 3, 4, 9, 0))
+        self.crear_job()
+
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            job = reportes.ejecutar_job(reportes.tomar_siguiente_job(), procesos=2)
+            with zipfile.ZipFile(f"{media}/{job.archivo.name}") as zf:
+                self.assertEqual(len(zf.namelist()), 1)
+
+        self.assertEqual((job.estado, job.procesados), ("completado", 1))
+
+
+class ResumenDiarioTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        turno = Turno.objects.create(nombre="Noche", hora_entrada=time(22), hora_salida=time(6), empresa=self.empresa)
+        self.trabajador = crear_trabajador(self.empresa, "11111111-1", turno=turno)
+
+    def resumenes(self):
+        return {
+            r.fecha: (r.minutos_trabajados, r.minutos_atraso, r.minutos_extra)
+            for r in ResumenDiario.objects.filter(trabajador=self.trabajador)
+        }
+
+    def test_jornada_nocturna_se_atribuye_al_dia_de_la_entrada(self):
+        marcar(self.trabajador, "entrada", local(2024, 3, 4, 22, 10))
+        marcar(self.trabajador, "salida", local(2024, 3, 5, 7, 0))
+
+        self.assertEqual(self.resumenes(), {date(2024, 3, 4): (530, 10, 60)})
+
+    def test_comando_recalcula_igual_que_las_marcas(self):
+        marcar(self.trabajador, "entrada", local(2024, 3, 4, 22, 0))
+        marcar(self.trabajador, "salida", local(2024, 3, 5, 6, 0))
+        marcar(self.trabajador, "entrada", local(2024, 3, 5, 22, 0))
+        marcar(self.trabajador, "salida", local(2024, 3, 6, 6, 30))
+        esperado = self.resumenes()
+        ResumenDiario.objects.all().delete()
+
+        call_command("recalcular_resumen_diario", desde="2024-03-04", hasta="2024-03-06", stdout=StringIO())
+
+        self.assertEqual(self.resumenes(), esperado)
+        self.assertEqual(esperado, {date(2024, 3, 4): (480, 0, 0), date(2024, 3, 5): (510, 0, 30)})
+
+    def test_cierre_atribuye_la_jornada_nocturna_al_dia_de_la_entrada(self):
+        marcar(self.trabajador, "entrada", local(2024, 3, 4, 22, 0))
+        marcar(self.trabajador, "salida", local(2024, 3, 5, 6, 0))
+        marcar(self.trabajador, "entrada", local(2024, 3, 5, 22, 15))
+        marcar(self.trabajador, "salida", local(2024, 3, 6, 6, 30))
+
+        def cierre(desde, hasta):
+            return [
+                (t["dias_trabajados"], t["minutos_trabajados"], t["minutos_atraso"], t["minutos_extra"])
+                for t in calcular_periodo(self.empresa.id, desde, hasta)
+            ]
+
+        self.assertEqual(cierre(date(2024, 3, 4), date(2024, 3, 5)), [(2, 975, 15, 30)])
+        self.assertEqual(cierre(date(2024, 3, 5), date(2024, 3, 5)), [(1, 495, 15, 30)])
+        self.assertEqual(cierre(date(2024, 3, 6), date(2024, 3, 6)), [])
+        resumenes = self.resumenes()
+        self.assertEqual(sum(minutos for minutos, _, _ in resumenes.values()), 975)
+
+    def test_marca_del_mes_vigente_no_consulta_el_archivo(self):
+        ahora = timezone.now()
+        with CaptureQueriesContext(connection) as consultas:
+            marcar(self.trabajador, "entrada", ahora)
+        self.assertFalse([q for q in consultas.captured_queries if "periodos_archivados" in q["sql"]])
+
+        with CaptureQueriesContext(connection) as consultas:
+            marcar(self.trabajador, "entrada", local(2024, 3, 4, 22, 0))
+        self.assertTrue([q for q in consultas.captured_queries if "periodos_archivados" in q["sql"]])
+
+
+class TrabajadorDiferidoTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        self.trabajador = crear_trabajador(self.empresa, "11111111-1")
+
+    def test_cargar_sin_empresa_no_hace_consultas_extra(self):
+        crear_trabajador(self.empresa, "22222222-2")
+
+        with self.assertNumQueries(1):
+            ruts = [t.rut for t in Trabajador.objects.only("id", "rut")]
+
+        self.assertEqual(len(ruts), 2)
+
+    def test_cambio_de_empresa_en_instancia_diferida_mueve_el_historial(self):
+        marca = marcar(self.trabajador, "entrada", local(2024, 3, 4, 9, 0))
+        otra = crear_empresa("77000000-0", "Otra")
+
+        trabajador = Trabajador.objects.only("id", "rut", "nombres", "apellidos").get(pk=self.trabajador.pk)
+        trabajador.empresa = otra
+        trabajador.save()
+
+        marca.refresh_from_db()
+        self.assertEqual(marca.empresa_id, otra.id)
+
+
+class EmpresaDenormalizadaTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        self.otra = crear_empresa("77000000-0", "Otra")
+        self.trabajador = crear_trabajador(self.empresa, "11111111-1")
+        self.companero = crear_trabajador(self.otra, "22222222-2")
+
+    def crear_filas(self, trabajador):
+        return [
+            marcar(trabajador, "entrada", local(2024, 3, 4, 9, 0)),
+            Licencia.objects.create(
+                trabajador=trabajador, tipo="licencia_medica", fecha_inicio=date(2024, 3, 4), fecha_fin=date(2024, 3, 5)
+            ),
+            Vacaciones.objects.create(trabajador=trabajador, fecha_inicio=date(2024, 3, 4), fecha_fin=date(2024, 3, 5)),
+        ]
+
+    def test_migracion_copia_la_empresa_del_trabajador(self):
+        filas = self.crear_filas(self.trabajador) + self.crear_filas(self.companero)
+        sin_trabajador = Marcas(trabajador=None, tipo_marca="entrada")
+        sin_trabajador.save()
+        for modelo in (Marcas, Licencia, Vacaciones):
+            modelo.objects.update(empresa=None)
+
+        migracion = importlib.import_module("login.migrations.0015_empresa_denormalizada")
+        with mock.patch.object(migracion, "LOTE", 2):
+            migracion.poblar_empresa(apps, None)
+
+        for fila in filas:
+            fila.refresh_from_db()
+        self.assertEqual([fila.empresa_id for fila in filas], [self.empresa.id] * 3 + [self.otra.id] * 3)
+        sin_trabajador.refresh_from_db()
+        self.assertIsNone(sin_trabajador.empresa_id)
+
+    def test_guardar_sincroniza_la_empresa_con_el_trabajador(self):
+        for fila in self.crear_filas(self.trabajador):
+            self.assertEqual(fila.empresa_id, self.empresa.id)
+            fila.empresa = self.otra
+            fila.save()
+            fila.refresh_from_db()
+            self.assertEqual(fila.empresa_id, self.empresa.id)
+
+        marca = Marcas.objects.get()
+        marca.trabajador = self.companero
+        marca.save()
+        self.assertEqual(Marcas.objects.values_list("empresa_id", flat=True).get(), self.otra.id)
+
+
+@override_settings(AUDITORIA=AUDITORIA_PRUEBAS)
+class ImportarUsuariosTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.empresa = crear_empresa()
+        self.admin = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.empresa])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def importar(self, contenido):
+        archivo = SimpleUploadedFile("usuarios.csv", contenido, content_type="text/csv")
+        return self.client.post("/api/rrhh/usuarios/importar/", {"archivo": archivo}, format="multipart")
+
+    def test_encola_importa_en_segundo_plano_y_audita_cada_usuario(self):
+        contenido = (
+            "rut;email;password;rol;nombres;apellidos;empresa_id\n"
+            f"11111111-1;ana@kivo.cl;clave-1;trabajador;Ana;Perez;{self.empresa.id}\n"
+            f"22222222-2;luis@kivo.cl;clave-2;asistente_rrhh;;;{self.empresa.id}\n"
+            f"44444444-4;;clave-3;trabajador;;;{self.empresa.id}\n"
+        ).encode("utf-8")
+
+        response = self.importar(contenido)
+
+        self.assertEqual((response.status_code, response.data["estado"]), (202, "pendiente"))
+        self.assertEqual(Usuario.objects.count(), 1)
+        job = ImportacionJob.objects.get(pk=response.data["id"])
+        ruta = job.archivo.path
+        self.assertTrue(os.path.exists(ruta))
+
+        call_command("procesar_importaciones", "--una-vez", "--procesos", "1", stdout=StringIO())
+
+        estado = self.client.get(f"/api/rrhh/usuarios/importar/{job.id}/").data
+        self.assertEqual(
+            (estado["estado"], estado["total"], estado["creados"], estado["con_errores"]), ("completado", 3, 2, 1)
+        )
+        self.assertEqual(estado["errores"][0]["fila"], 4)
+        self.assertFalse(os.path.exists(ruta))
+        creados = set(Usuario.objects.exclude(pk=self.admin.pk).values_list("id", flat=True))
+        auditoria_creados = AuditoriaCambio.objects.filter(accion="crear_usuario")
+        self.assertEqual(set(auditoria_creados.values_list("registro_id", flat=True)), creados)
+        self.assertEqual(set(auditoria_creados.values_list("usuario_id", "empresa_id")), {(self.admin.id, self.empresa.id)})
+
+    def test_estado_solo_para_quien_la_solicito(self):
+        job_id = self.importar(b"rut,email,password,rol\n").data["id"]
+        otro = crear_usuario("44444444-4", "admin_rrhh", empresas=[self.empresa])
+        self.client.force_authenticate(otro)
+
+        self.assertEqual(self.client.get(f"/api/rrhh/usuarios/importar/{job_id}/").status_code, 404)
+
+    def test_lote_revertido_no_deja_auditoria(self):
+        contenido = (
+            "rut,email,password,rol\n"
+            "11111111-1,ana@kivo.cl,clave,asistente_rrhh\n"
+        ).encode()
+        importador = importacion.ImportacionUsuarios(auditor_id=self.admin.id)
+        with mock.patch.object(EmpresaUsuario.objects, "bulk_create", side_effect=IntegrityError):
+            reporte = importador.ejecutar(importacion.leer_csv(BytesIO(contenido)))
+
+        self.assertEqual((reporte["creados"], reporte["con_errores"]), (0, 1))
+        self.assertFalse(AuditoriaCambio.objects.exists())
+        self.assertEqual(Usuario.objects.count(), 1)
+
+    def test_error_de_codificacion_tardio_no_importa_nada(self):
+        filas = [
+            f"1{n:07d}-{n % 10},u{n}@kivo.cl,clave,asistente_rrhh,,,{self.empresa.id}" for n in range(600)
+        ]
+        contenido = ("rut,email,password,rol,nombres,apellidos,empresa_id\n" + "\n".join(filas)).encode()
+
+        response = self.importar(contenido + b"\n\xff\xfe;x\n")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportacionJob.objects.exists())
+
+
+class EscritorAuditoriaTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("33333333-3", "admin_rrhh")
+
+    def entrada(self, **campos):
+        return {
+            "clave": uuid.uuid4().hex,
+            "usuario_id": self.usuario.id,
+            "empresa_id": None,
+            "accion": "crear_usuario",
+            "modelo_afectado": "Usuario",
+            "registro_id": 1,
+            "motivo": None,
+            "fecha": timezone.now(),
+            **campos,
+        }
+
+    def test_temporizador_vacia_el_buffer_sin_otro_registro(self):
+        conf = {"MODO": "buffer", "INTERVALO_SEGUNDOS": 0.05, "SPOOL_DIR": tempfile.mkdtemp()}
+        with override_settings(AUDITORIA=conf), mock.patch.object(auditoria, "insertar") as insertar:
+            escritor = auditoria.EscritorAuditoria()
+            escritor.registrar(self.entrada())
+            limite = reloj.monotonic() + 5
+            while escritor.pendientes and reloj.monotonic() < limite:
+                reloj.sleep(0.01)
+
+        self.assertEqual(escritor.pendientes, 0)
+        insertar.assert_called_once()
+
+    def test_reintento_solo_omite_claves_existentes(self):
+        repetida = self.entrada()
+        auditoria.insertar([repetida])
+        nueva, invalida = self.entrada(), self.entrada(accion=None)
+
+        with self.assertLogs("login.auditoria", "ERROR") as logs:
+            auditoria.insertar([repetida, nueva, invalida])
+
+        self.assertEqual(
+            set(AuditoriaCambio.objects.values_list("clave", flat=True)), {repetida["clave"], nueva["clave"]}
+        )
+        self.assertIn(invalida["clave"], logs.output[0])
+
+
+@override_settings(AUDITORIA=AUDITORIA_PRUEBAS)
+class DocumentoLicenciaTests(TestCase):
+    PDF = b"%PDF-1.4 licencia medica"
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.empresa, self.otra = crear_empresa(), crear_empresa("77000000-0", "Otra")
+        self.sha256 = hashlib.sha256(self.PDF).hexdigest()
+        self.client = APIClient()
+
+    def trabajador(self, empresa, rut):
+        return crear_usuario(rut, "trabajador", trabajador=crear_trabajador(empresa, rut))
+
+    def crear_licencia(self, usuario, **datos):
+        self.client.force_authenticate(usuario)
+        datos = {"tipo": "licencia_medica", "fecha_inicio": "2024-03-04", "fecha_fin": "2024-03-05", **datos}
+        return self.client.post("/api/licencias/", datos, format="multipart")
+
+    def existe(self, usuario):
+        self.client.force_authenticate(usuario)
+        return self.client.get(f"/api/licencias/documentos/{self.sha256}/").data["existe"]
+
+    def test_hash_solo_se_resuelve_en_las_empresas_del_usuario(self):
+        duena = self.trabajador(self.otra, "11111111-1")
+        response = self.crear_licencia(duena, archivo=SimpleUploadedFile("l.pdf", self.PDF, "application/pdf"))
+        self.assertEqual(response.status_code, 201)
+        companera = self.trabajador(self.otra, "22222222-2")
+        ajena = self.trabajador(self.empresa, "33333333-3")
+
+        self.assertTrue(self.existe(companera))
+        self.assertFalse(self.existe(ajena))
+        self.assertEqual(self.crear_licencia(ajena, documento_sha256=self.sha256).status_code, 400)
+        self.assertEqual(self.crear_licencia(companera, documento_sha256=self.sha256).status_code, 201)
+        self.assertEqual(DocumentoAlmacenado.objects.get().referencias, 2)
+
+    def test_descarga_solo_para_su_trabajador_o_la_empresa(self):
+        duena = self.trabajador(self.otra, "11111111-1")
+        licencia_id = self.crear_licencia(
+            duena, archivo=SimpleUploadedFile("l.pdf", self.PDF, "application/pdf")
+        ).data["id"]
+        rrhh = crear_usuario("44444444-4", "admin_rrhh", empresas=[self.otra])
+        ajena = self.trabajador(self.empresa, "33333333-3")
+
+        for usuario, esperado in ((duena, 200), (rrhh, 200), (ajena, 403)):
+            with self.subTest(usuario=usuario.rut):
+                self.client.force_authenticate(usuario)
+                response = self.client.get(f"/api/licencias/{licencia_id}/archivo/")
+                self.assertEqual(response.status_code, esperado)
+                if esperado == 200:
+                    self.assertEqual(b"".join(response.streaming_content), self.PDF)
+
+
+class DescargaArchivoTests(TestCase):
+    def test_la_base_no_se_puede_instanciar_sin_los_hooks(self):
+        with self.assertRaises(TypeError):
+            DescargaArchivoView()
+        LicenciaArchivoView()
+        ReporteArchivoView()
+
+
+class AutenticacionTokenTests(TestCase):
+    def setUp(self):
+        authentication._versiones.clear()
+        self.addCleanup(authentication._versiones.clear)
+        self.usuario = crear_usuario("33333333-3", "admin_rrhh", empresas=[crear_empresa()])
+        self.autenticacion = authentication.UsuarioJWTAuthentication()
+
+    def token(self):
+        return MyTokenObtainPairSerializer.get_token(self.usuario).access_token
+
+    def autenticar(self, token):
+        return self.autenticacion.get_user(self.autenticacion.get_validated_token(str(token)))
+
+    def test_revocar_tokens_invalida_los_emitidos(self):
+        token = self.token()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(client.get("/api/empresas/").status_code, 200)
+
+        self.usuario.revocar_tokens()
+
+        self.assertEqual(client.get("/api/empresas/").status_code, 401)
+        with self.assertRaisesMessage(AuthenticationFailed, "Token revocado"):
+            self.autenticar(token)
+        self.assertIsInstance(self.autenticar(self.token()), authentication.UsuarioToken)
+
+    def test_token_sin_claims_se_valida_contra_la_base_de_datos(self):
+        token = AccessToken.for_user(self.usuario)
+        self.assertNotIn("tv", token)
+
+        usuario = self.autenticar(token)
+
+        self.assertIsInstance(usuario, Usuario)
+        self.assertEqual(usuario.pk, self.usuario.pk)
+        Usuario.objects.filter(pk=self.usuario.pk).update(estado="bloqueado")
+        with self.assertRaisesMessage(AuthenticationFailed, "Usuario inactivo o bloqueado"):
+            self.autenticar(token)
+
+    def test_cambiar_rol_o_estado_revoca_el_token(self):
+        for campo, valor in (("rol", "asistente_rrhh"), ("estado", "bloqueado")):
+            with self.subTest(campo=campo):
+                token = self.token()
+                self.autenticar(token)
+                setattr(self.usuario, campo, valor)
+                self.usuario.save()
+
+                with self.assertRaises(AuthenticationFailed):
+                    self.autenticar(token)
+
+    @override_settings(TOKEN_VERSION_TTL=30)
+    def test_cache_por_proceso_no_extiende_una_revocacion_mas_alla_del_ttl(self):
+        token = self.token()
+        ahora = reloj.monotonic()
+        with mock.patch.object(authentication.time, "monotonic", return_value=ahora):
+            self.autenticar(token)
+            # Revocacion hecha por otro proceso: este no recibe olvidar_version().
+            Usuario.objects.filter(pk=self.usuario.pk).update(token_version=F("token_version") + 1)
+            self.assertIsInstance(self.autenticar(token), authentication.UsuarioToken)
+
+        with mock.patch.object(authentication.time, "monotonic", return_value=ahora + 31):
+            with self.assertRaisesMessage(AuthenticationFailed, "Token revocado"):
+                self.autenticar(token)
+
+
+class RespuestaCondicionalTests(TestCase):
+    def setUp(self):
+        cache_referencia.cache().clear()
+        self.addCleanup(cache_referencia.cache().clear)
+        self.e1, self.e2 = crear_empresa(), crear_empresa("77000000-0", "Otra")
+        self.t1 = crear_trabajador(self.e1, "11111111-1")
+        self.t2 = crear_trabajador(self.e2, "22222222-2")
+        self.client = APIClient()
+        self.client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[self.e1, self.e2]))
+
+    def get(self, url, etag=None):
+        if etag is None:
+            return self.client.get(url)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_if_none_match_vigente_responde_304(self):
+        url = f"/api/asistencias/?empresa_id={self.e1.id}"
+        primera = self.get(url)
+
+        segunda = self.get(url, primera["ETag"])
+
+        self.assertEqual((primera.status_code, segunda.status_code), (200, 304))
+        self.assertEqual((segunda.content, segunda["ETag"]), (b"", primera["ETag"]))
+
+    def test_cada_escritura_invalida_solo_el_etag_de_su_empresa(self):
+        def editar_trabajador(trabajador):
+            trabajador.apellidos = "Editado"
+            trabajador.save()
+
+        casos = {
+            "marcas": ("/api/asistencias/?empresa_id={}", lambda t: marcar(t, "entrada", timezone.now())),
+            "trabajadores": ("/api/asistencias/?empresa_id={}", editar_trabajador),
+            "licencias": (
+                "/api/licencias/?empresa_id={}",
+                lambda t: Licencia.objects.create(
+                    trabajador=t, tipo="licencia_medica", fecha_inicio=date(2024, 3, 4), fecha_fin=date(2024, 3, 5)
+                ),
+            ),
+            "vacaciones": (
+                "/api/vacaciones/?empresa_id={}",
+                lambda t: Vacaciones.objects.create(trabajador=t, fecha_inicio=date(2024, 3, 4), fecha_fin=date(2024, 3, 5)),
+            ),
+            "turnos": (
+                "/api/empresas/{}/turnos/",
+                lambda t: Turno.objects.create(nombre="Dia", hora_entrada=time(9), hora_salida=time(18), empresa=t.empresa),
+            ),
+        }
+        for recurso, (url, escribir) in casos.items():
+            with self.subTest(recurso=recurso):
+                url_1, url_2 = url.format(self.e1.id), url.format(self.e2.id)
+                etag_1, etag_2 = self.get(url_1)["ETag"], self.get(url_2)["ETag"]
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    escribir(self.t2)
+
+                self.assertEqual(self.get(url_1, etag_1).status_code, 304)
+                despues = self.get(url_2, etag_2)
+                self.assertEqual(despues.status_code, 200)
+                self.assertNotEqual(despues["ETag"], etag_2)
+
+
+class TrabajadoresPorEmpresaTests(TestCase):
+    def test_consultas_no_crecen_con_los_trabajadores(self):
+        empresa = crear_empresa()
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+        url = f"/api/empresas/{empresa.id}/trabajadores/"
+
+        def agregar(desde, hasta):
+            for n in range(desde, hasta):
+                trabajador = crear_trabajador(empresa, f"1{n:07d}-{n % 10}", apellidos=f"P{n:02d}")
+                crear_usuario(trabajador.rut, "trabajador", trabajador=trabajador)
+                marcar(trabajador, "entrada", timezone.now())
+
+        agregar(0, 2)
+        client.get(url)  # deja en cache las empresas del usuario
+        with self.assertNumQueries(1):
+            self.assertEqual(len(client.get(url).data), 2)
+
+        agregar(2, 10)
+        with self.assertNumQueries(1):
+            data = client.get(url).data
+        self.assertEqual(len(data), 10)
+        self.assertNotIn("marcas", data[0])
+        self.assertEqual(data[0]["empresa_nombre"], "Empresa")
+        self.assertIsNotNone(data[0]["usuario_id"])
+
+    def test_turno_id_se_omite_si_no_hay_turno(self):
+        empresa = crear_empresa()
+        turno = Turno.objects.create(nombre="Dia", hora_entrada=time(9), hora_salida=time(18), empresa=empresa)
+        con_turno = crear_trabajador(empresa, "11111111-1", apellidos="A", turno=turno)
+        sin_turno = crear_trabajador(empresa, "22222222-2", apellidos="B")
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[empresa]))
+
+        data = client.get(f"/api/empresas/{empresa.id}/trabajadores/").data
+        self.assertEqual(data[0]["turno_id"], turno.id)
+        self.assertNotIn("turno_id", data[1])
+        self.assertEqual(client.get(f"/api/trabajadores/{con_turno.id}/perfil/").data["turno_id"], turno.id)
+        self.assertNotIn("turno_id", client.get(f"/api/trabajadores/{sin_turno.id}/perfil/").data)
+
+
+class DirectorioUsuariosTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        self.admin = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.empresa])
+        crear_usuario("44444444-4", "admin_rrhh", empresas=[crear_empresa("77000000-0", "Otra")])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def agregar(self, desde, hasta):
+        for n in range(desde, hasta):
+            trabajador = crear_trabajador(self.empresa, f"1{n:07d}-{n % 10}")
+            crear_usuario(trabajador.rut, "trabajador", trabajador=trabajador, empresas=[self.empresa])
+
+    def test_consultas_no_crecen_con_los_usuarios(self):
+        url = "/api/usuarios/directorio/?page_size=100"
+        self.agregar(0, 2)
+        self.client.get(url)  # deja en cache las empresas del usuario
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.client.get(url).data["results"]), 3)
+
+        self.agregar(2, 10)
+        with self.assertNumQueries(3):
+            data = self.client.get(url).data["results"]
+        self.assertEqual(len(data), 11)
+        self.assertEqual(data[0]["empresas"], [{"id": self.empresa.id, "razon_social": "Empresa", "rol": "trabajador"}])
+        self.assertEqual(data[0]["empresa_id"], self.empresa.id)
+
+    def test_cursor_recorre_todos_los_usuarios_sin_repetir(self):
+        self.agregar(0, 6)
+        esperados = list(
+            Usuario.objects.filter(empresas_usuario__empresa=self.empresa).order_by("-id").values_list("id", flat=True)
+        )
+
+        vistos, url, paginas = [], "/api/usuarios/directorio/?page_size=3", 0
+        while url:
+            data = self.client.get(url).data
+            vistos += [usuario["id"] for usuario in data["results"]]
+            url, paginas = data["next"], paginas + 1
+
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(paginas, 3)
+        self.assertEqual(self.client.get("/api/usuarios/directorio/?cursor=no-valido").status_code, 404)
+
+
+class CacheReferenciaTests(TestCase):
+    def setUp(self):
+        cache_referencia.cache().clear()
+        self.addCleanup(cache_referencia.cache().clear)
+        self.e1, self.e2 = crear_empresa(), crear_empresa("77000000-0", "Otra")
+        self.turno = Turno.objects.create(nombre="Dia", hora_entrada=time(9), hora_salida=time(18), empresa=self.e1)
+        self.client = APIClient()
+
+    def get(self, usuario, url):
+        self.client.force_authenticate(usuario)
+        return self.client.get(url)
+
+    def test_empresa_ajena_en_la_url_no_envenena_el_cache(self):
+        atacante = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.e1])
+        colega = crear_usuario("44444444-4", "asistente_rrhh", empresas=[self.e1])
+
+        ajena = self.get(atacante, f"/api/empresas/{self.e2.id}/turnos/?empresa_id={self.e1.id}")
+        propia = self.get(colega, f"/api/empresas/{self.e1.id}/turnos/")
+
+        self.assertEqual(ajena.status_code, 403)
+        self.assertEqual([turno["id"] for turno in propia.data], [self.turno.id])
+
+    def test_respuesta_cacheada_por_empresa_de_la_url(self):
+        usuario = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.e1, self.e2])
+        Turno.objects.create(nombre="Noche", hora_entrada=time(22), hora_salida=time(6), empresa=self.e2)
+
+        primera = self.get(usuario, f"/api/empresas/{self.e1.id}/turnos/")
+        otra = self.get(usuario, f"/api/empresas/{self.e2.id}/turnos/")
+        segunda = self.get(usuario, f"/api/empresas/{self.e1.id}/turnos/?x=1")
+
+        self.assertEqual((primera["X-Cache"], otra["X-Cache"], segunda["X-Cache"]), ("MISS", "MISS", "HIT"))
+        self.assertEqual(segunda.data, primera.data)
+        self.assertNotEqual(otra.data, primera.data)
+
+    def test_no_guarda_respuestas_sin_acceso(self):
+        sin_empresas = crear_usuario("33333333-3", "admin_rrhh")
+
+        for _ in range(2):
+            response = self.get(sin_empresas, "/api/empresas/")
+            self.assertEqual((response.data, response["X-Cache"]), ([], "MISS"))
+
+
+class JSONRapidoRendererTests(TestCase):
+    def test_mismos_bytes_que_drf(self):
+        datos = {
+            "texto": "línea\u2028separada",
+            "fecha": date(2024, 3, 4),
+            "momento": local(2024, 3, 4, 9, 30),
+            "monto": Decimal("10.50"),
+            "enteros": [0, -1, 2**40],
+            "floats": [1.5, 0.1, 1 / 3, 1e15, 2.5e-05, 1e-7, 1e16, 1.2345678901234568e16, Decimal("1E-7")],
+            "nulo": None,
+        }
+        for valor in [datos, datos["floats"], {"x": 1.5}, {1e-7: "clave"}]:
+            self.assertEqual(JSONRapidoRenderer().render(valor), JSONRenderer().render(valor))
+
+    def test_no_finitos_fallan_como_en_drf(self):
+        for valor in (float("nan"), float("inf"), float("-inf")):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({"valor": valor})
+            with self.assertRaises(ValueError):
+                JSONRapidoRenderer().render({"valor": [valor]})
+
+    def test_solo_busca_floats_si_la_vista_los_declara(self):
+        class Vista:
+            pass
+
+        class VistaConFloats:
+            floats_en_respuesta = True
+
+        datos = {"valor": 1.5}
+        with mock.patch("login.renderers.tiene_float_distinto", return_value=False) as revisar:
+            JSONRapidoRenderer().render(datos, renderer_context={"view": Vista()})
+            revisar.assert_not_called()
+            JSONRapidoRenderer().render(datos, renderer_context={"view": VistaConFloats()})
+            JSONRapidoRenderer().render(datos)
+        self.assertEqual(revisar.call_count, 2)
+
+        client = APIClient()
+        client.force_authenticate(crear_usuario("33333333-3", "admin_rrhh", empresas=[crear_empresa()]))
+        with mock.patch("login.renderers.tiene_float_distinto", return_value=False) as revisar:
+            self.assertEqual(client.get("/api/asistencias/").status_code, 200)
+        revisar.assert_not_called()
+
+
+class VerificacionMarcasTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+        trabajador = crear_trabajador(self.empresa, "11111111-1")
+        # En UTC, como las guardan la marca en linea y la sincronizacion.
+        self.marcas = [
+            marcar(trabajador, tipo, local(2024, 3, 4, hora).astimezone(dt_timezone.utc))
+            for hora, tipo in ((9, "entrada"), (13, "salida"), (14, "entrada"), (18, "salida"))
+        ]
+        Marcas.objects.filter(id=self.marcas[2].id).update(hash="0" * 64)
+
+    def test_detecta_la_marca_alterada_con_y_sin_pool(self):
+        for procesos in (1, 2):
+            v = VerificacionMarcas.objects.create(empresa=self.empresa)
+            verificacion.VerificadorMarcas(v, procesos=procesos, tamano_bloque=1).ejecutar()
+
+            self.assertEqual((v.estado, v.revisadas, v.discrepancias), ("completada", 4, 1))
+            self.assertEqual(list(v.detalle_discrepancias.values_list("marca_id", flat=True)), [self.marcas[2].id])
+
+    def test_retoma_la_corrida_abandonada_desde_su_punto_de_control(self):
+        v = VerificacionMarcas.objects.create(
+            empresa=self.empresa,
+            estado="procesando",
+            iniciado_en=timezone.now(),
+            hasta_id=self.marcas[-1].id,
+            ultimo_id=self.marcas[1].id,
+            total=4,
+            revisadas=2,
+        )
+        self.assertIsNone(verificacion.tomar_siguiente_verificacion())
+
+        hace_rato = timezone.now() - timedelta(seconds=verificacion.timeout_procesando() + 1)
+        VerificacionMarcas.objects.filter(id=v.id).update(actualizado_en=hace_rato)
+        tomada = verificacion.tomar_siguiente_verificacion()
+        self.assertEqual(tomada.id, v.id)
+
+        verificacion.VerificadorMarcas(tomada, procesos=1).ejecutar()
+        self.assertEqual((tomada.estado, tomada.revisadas, tomada.discrepancias), ("completada", 4, 1))
+
+    def test_post_reencola_la_corrida_abandonada(self):
+        usuario = crear_usuario("22222222-2", "admin_rrhh", empresas=[self.empresa])
+        v = VerificacionMarcas.objects.create(empresa=self.empresa, estado="procesando")
+        client = APIClient()
+        client.force_authenticate(usuario)
+
+        def solicitar():
+            return client.post("/api/marcas/verificaciones/", {"empresa_id": self.empresa.id}, format="json")
+
+        self.assertEqual((solicitar().status_code, VerificacionMarcas.objects.count()), (409, 1))
+
+        hace_rato = timezone.now() - timedelta(seconds=verificacion.timeout_procesando() + 1)
+        VerificacionMarcas.objects.filter(id=v.id).update(actualizado_en=hace_rato)
+        response = solicitar()
+
+        self.assertEqual((response.status_code, response.data["id"], response.data["estado"]), (409, v.id, "pendiente"))
+        self.assertEqual(verificacion.tomar_siguiente_verificacion().id, v.id)
+
+
+VACIO_HEX = "0" * 64
+
+
+class MerkleTests(TestCase):
+    def test_toda_hoja_se_verifica_contra_la_raiz(self):
+        for n in range(1, 10):
+            hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+            arbol = merkle.niveles(hashes)
+            for indice, hash_hex in enumerate(hashes):
+                pasos = merkle.prueba(arbol, indice)
+                self.assertTrue(merkle.verificar_prueba(hash_hex, pasos, merkle.raiz(arbol)))
+                self.assertFalse(merkle.verificar_prueba(VACIO_HEX, pasos, merkle.raiz(arbol)))
+
+    def test_prueba_de_inclusion_y_raiz_alterada(self):
+        empresa = crear_empresa()
+        trabajador = crear_trabajador(empresa, "11111111-1")
+        usuario = crear_usuario("11111111-1", "trabajador", trabajador=trabajador)
+        marcas = [marcar(trabajador, tipo, local(2024, 3, 4, hora)) for hora, tipo in ((9, "entrada"), (18, "salida"))]
+        call_command("construir_raices_merkle", "--fecha", "2024-03-04", "--dias", "1", stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(usuario)
+
+        data = client.get(f"/api/marcas/{marcas[1].id}/prueba/").data
+        self.assertTrue(data["coincide"])
+        self.assertTrue(merkle.verificar_prueba(marcas[1].hash, data["prueba"], data["raiz_publicada"]))
+
+        Marcas.objects.filter(id=marcas[0].id).update(hash="0" * 64)
+        with self.assertRaises(CommandError):
+            call_command("construir_raices_merkle", "--fecha", "2024-03-04", "--dias", "1", stdout=StringIO(),
+                         stderr=StringIO())
+
+        data = client.get(f"/api/marcas/{marcas[1].id}/prueba/").data
+        self.assertEqual((data["estado"], data["coincide"]), ("alterada", False))
+        self.assertFalse(merkle.verificar_prueba(marcas[1].hash, data["prueba"], data["raiz_publicada"]))
+        self.assertEqual(RaizMerkle.objects.get(empresa=empresa).hojas, 2)
+
+
+class ArchivoMarcasTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(ARCHIVO_MARCAS={"DIRECTORIO": directorio.name, "MESES_VIGENTES": 13})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.empresa = crear_empresa()
+        self.trabajador = crear_trabajador(self.empresa, "11111111-1")
+        self.marcas = []
+        for dia in (4, 5):
+            for hora, tipo in ((9, "entrada"), (18, "salida")):
+                marca = Marcas(trabajador=self.trabajador, tipo_marca=tipo, clave_idempotencia=f"{dia}-{hora}",
+                               timestamp=local(2024, 3, dia, hora).astimezone(dt_timezone.utc))
+                marca.save()
+                self.marcas.append(marca)
+
+    def archivar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archivo_marcas.archivar_periodo(self.empresa.id, 2024, 3)
+
+    def test_archivar_y_leer_devuelve_las_mismas_marcas(self):
+        esperadas = list(
+            Marcas.objects.order_by("timestamp", "id").values_list(
+                "id", "timestamp", "trabajador_id", "tipo_marca", "hash", "clave_idempotencia"
+            )
+        )
+
+        periodo = self.archivar()
+
+        self.assertFalse(Marcas.objects.exists())
+        self.assertEqual(periodo.filas, 4)
+        self.assertEqual(archivo_marcas.abrir(periodo).todas(), esperadas)
+        self.assertEqual(list(archivo_marcas.iterar(archivo_marcas.Filtro())), [fila[:5] for fila in esperadas])
+
+    def test_resumenes_se_recalculan_con_las_marcas_archivadas(self):
+        antes = list(ResumenDiario.objects.order_by("fecha").values_list("fecha", "minutos_trabajados"))
+        self.archivar()
+
+        ResumenDiario.recalcular(self.trabajador, date(2024, 3, 4), date(2024, 3, 5))
+        self.assertEqual(list(ResumenDiario.objects.order_by("fecha").values_list("fecha", "minutos_trabajados")), antes)
+
+        call_command("recalcular_resumen_diario", "--desde", "2024-03-01", "--hasta", "2024-03-31", stdout=StringIO())
+        self.assertEqual(list(ResumenDiario.objects.order_by("fecha").values_list("fecha", "minutos_trabajados")), antes)
+        self.assertEqual(antes, [(date(2024, 3, 4), 540), (date(2024, 3, 5), 540)])
+
+    def test_prueba_de_inclusion_de_una_marca_archivada(self):
+        usuario = crear_usuario("11111111-1", "trabajador", trabajador=self.trabajador)
+        ajeno = crear_usuario("22222222-2", "admin_rrhh", empresas=[crear_empresa("77000000-0", "Otra")])
+        raices = ["construir_raices_merkle", "--fecha", "2024-03-05", "--dias", "2"]
+        call_command(*raices, stdout=StringIO())
+        self.archivar()
+
+        call_command(*raices, stdout=StringIO())
+        self.assertEqual(set(RaizMerkle.objects.values_list("estado", flat=True)), {"vigente"})
+
+        client = APIClient()
+        client.force_authenticate(usuario)
+        marca = self.marcas[1]
+        data = client.get(f"/api/marcas/{marca.id}/prueba/").data
+        self.assertEqual((data["marca_id"], data["coincide"]), (marca.id, True))
+        self.assertTrue(merkle.verificar_prueba(marca.hash, data["prueba"], data["raiz_publicada"]))
+
+        client.force_authenticate(ajeno)
+        self.assertEqual(client.get(f"/api/marcas/{marca.id}/prueba/").status_code, 404)
+
+    def test_verificacion_incluye_las_marcas_archivadas(self):
+        self.archivar()
+        marcar(self.trabajador, "entrada", local(2024, 4, 1, 9).astimezone(dt_timezone.utc))
+
+        for procesos in (1, 2):
+            v = VerificacionMarcas.objects.create(empresa=self.empresa)
+            verificacion.VerificadorMarcas(v, procesos=procesos, tamano_bloque=3).ejecutar()
+            self.assertEqual((v.estado, v.total, v.revisadas, v.discrepancias), ("completada", 5, 5, 0))
+
+        Trabajador.objects.filter(id=self.trabajador.id).update(apellidos="Editado")
+        v = VerificacionMarcas.objects.create(empresa=self.empresa)
+        verificacion.VerificadorMarcas(v, procesos=1).ejecutar()
+        self.assertEqual(v.discrepancias, 5)
+        self.assertEqual(
+            set(v.detalle_discrepancias.values_list("marca_id", flat=True)) - {m.id for m in self.marcas},
+            {Marcas.objects.get().id},
+        )
+
+    def test_buscar_solo_abre_archivos_con_el_id_en_su_rango(self):
+        periodo = self.archivar()
+        self.assertEqual((periodo.id_minimo, periodo.id_maximo), (self.marcas[0].id, self.marcas[-1].id))
+
+        with mock.patch.object(archivo_marcas, "abrir", wraps=archivo_marcas.abrir) as abrir:
+            self.assertIsNone(archivo_marcas.buscar(self.marcas[-1].id + 1, archivo_marcas.Filtro()))
+            abrir.assert_not_called()
+            empresa_id, fila = archivo_marcas.buscar(self.marcas[1].id, archivo_marcas.Filtro())
+        self.assertEqual((empresa_id, fila[0]), (self.empresa.id, self.marcas[1].id))
+
+    def test_marcas_archivadas_siguen_al_trabajador_que_cambia_de_empresa(self):
+        otra = crear_empresa("77000000-0", "Otra")
+        companero = crear_trabajador(self.empresa, "22222222-2")
+        self.archivar()
+        self.trabajador.empresa = otra
+        self.trabajador.save()
+        # Volver a archivar el mes de la empresa original no le devuelve las marcas movidas.
+        marcar(companero, "entrada", local(2024, 3, 6, 9).astimezone(dt_timezone.utc))
+        self.archivar()
+
+        def ids(*empresas):
+            return [fila[0] for fila in archivo_marcas.iterar(archivo_marcas.Filtro(empresas=list(empresas)))]
+
+        self.assertEqual(ids(otra.id), [m.id for m in self.marcas])
+        self.assertEqual(len(ids(self.empresa.id)), 1)
+        self.assertEqual(ids(self.empresa.id, otra.id)[:4], [m.id for m in self.marcas])
+        marca_id = self.marcas[0].id
+        self.assertEqual(archivo_marcas.buscar(marca_id, archivo_marcas.Filtro(empresas=[otra.id]))[0], otra.id)
+        self.assertIsNone(archivo_marcas.buscar(marca_id, archivo_marcas.Filtro(empresas=[self.empresa.id])))
+
+    def test_no_archiva_meses_vigentes(self):
+        hoy = timezone.localdate()
+        with self.assertRaises(ValueError):
+            archivo_marcas.archivar_periodo(self.empresa.id, hoy.year, hoy.month)
+        with self.assertRaises(CommandError):
+            call_command("archivar_marcas", "--meses", "2", stdout=StringIO())
+
+    def test_libro_de_asistencia_mezcla_marcas_archivadas_y_de_la_tabla(self):
+        otro = crear_trabajador(self.empresa, "22222222-2", nombres="Luis")
+        antes = reportes.datos_lote(self.empresa, [self.trabajador.id, otro.id], 2024, 3)
+        self.archivar()
+        marcar(self.trabajador, "entrada", local(2024, 3, 6, 9).astimezone(dt_timezone.utc))
+
+        despues = reportes.datos_lote(self.empresa, [self.trabajador.id, otro.id], 2024, 3)
+
+        marcas = {datos["trabajador"]["rut"]: datos["marcas"] for datos in despues}
+        self.assertEqual(marcas["11111111-1"][:4], antes[0]["marcas"])
+        self.assertEqual([m[:3] for m in marcas["11111111-1"][4:]], [("2024-03-06", "09:00:00", "entrada")])
+        self.assertEqual(marcas["22222222-2"], [])
+
+    def exportar(self, formato):
+        admin = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.empresa])
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.archivar()
+        # Marca de la tabla entre dos archivadas: la exportacion debe intercalarla.
+        self.marcas.insert(2, marcar(self.trabajador, "salida", local(2024, 3, 4, 20).astimezone(dt_timezone.utc)))
+        response = client.get(f"/api/asistencias/exportar/?formato={formato}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def filas_esperadas(self):
+        return [
+            [str(m.id), timezone.localtime(m.timestamp).isoformat(), m.tipo_marca, "11111111-1", "Ana", "Perez",
+             "Empresa", m.hash]
+            for m in self.marcas
+        ]
+
+    def test_exportacion_csv_mezcla_marcas_archivadas_en_orden(self):
+        contenido = self.exportar("csv")
+
+        self.assertTrue(contenido.startswith("\ufeff".encode("utf-8")))
+        filas = list(csv.reader(StringIO(contenido.decode("utf-8-sig"))))
+        self.assertEqual(filas[0], ["id", "fecha_hora", "tipo_marca", "rut", "nombres", "apellidos", "empresa", "hash"])
+        self.assertEqual(filas[1:], self.filas_esperadas())
+
+    def test_exportacion_xlsx_mezcla_marcas_archivadas_en_orden(self):
+        contenido = self.exportar("xlsx")
+
+        ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        with zipfile.ZipFile(BytesIO(contenido)) as zf:
+            hoja = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+        filas = [
+            [celda.findtext("x:is/x:t", namespaces=ns) or celda.findtext("x:v", namespaces=ns) for celda in fila]
+            for fila in hoja.iterfind("x:sheetData/x:row", ns)
+        ]
+        self.assertEqual(filas[0], ["id", "fecha_hora", "tipo_marca", "rut", "nombres", "apellidos", "empresa", "hash"])
+        self.assertEqual(filas[1:], self.filas_esperadas())
+
+    def test_cierre_incluye_los_meses_archivados(self):
+        admin = crear_usuario("33333333-3", "admin_rrhh", empresas=[self.empresa])
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = f"/api/empresas/{self.empresa.id}/cierre/?desde=2024-03-01&hasta=2024-03-31"
+        antes = client.get(url).data["trabajadores"]
+
+        self.archivar()
+        despues = client.get(url).data["trabajadores"]
+
+        self.assertEqual(despues, antes)
+        self.assertEqual(
+            (despues[0]["trabajador_id"], despues[0]["dias_trabajados"], despues[0]["minutos_trabajados"]),
+            (self.trabajador.id, 2, 1080),
+        )
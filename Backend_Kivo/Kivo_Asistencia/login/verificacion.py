@@ -0,0 +1,263 @@
+"""
+Verificador de integridad de Marcas: recalcula el hash de cada marca con los datos de su
+trabajador y lo compara con el guardado.
+
+Las marcas se leen por bloques de id ascendente con values_list y los hashes se calculan
+en un pool de procesos. Los bloques se registran en orden: `ultimo_id`, los contadores y
+las discrepancias del bloque se guardan en una misma transaccion, asi una corrida
+interrumpida se reanuda desde el ultimo bloque registrado sin repetir ni saltar filas.
+Despues de la tabla se recorren los periodos archivados (archivo_marcas) del alcance en
+orden de id: cada periodo se registra completo y `ultimo_periodo_id` es su punto de
+control. Cada registro actualiza `actualizado_en`: una corrida en 'procesando' que deja
+de avanzar por mas de timeout_procesando() se da por abandonada y se vuelve a tomar desde
+su punto de control.
+
+El hash incluye rut, nombres y apellidos del trabajador: si esos datos se editan despues
+de la marca, la marca tambien aparece como discrepancia.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import archivo_marcas
+from .models import DiscrepanciaMarca, Marcas, PeriodoArchivado, VerificacionMarcas, hash_marca
+
+COLUMNAS = (
+    "id",
+    "timestamp",
+    "trabajador__rut",
+    "trabajador__nombres",
+    "trabajador__apellidos",
+    "tipo_marca",
+    "hash",
+)
+ESTADOS_REANUDABLES = ("procesando", "interrumpida", "error")
+
+
+def verificar_lote(filas):
+    """[(id, hash guardado, hash calculado)] de las filas que no coinciden. Corre en los procesos hijos."""
+    discrepancias = []
+    for marca_id, ts, rut, nombres, apellidos, tipo, guardado in filas:
+        calculado = hash_marca(ts.isoformat(), rut, nombres, apellidos, tipo)
+        if calculado != guardado:
+            discrepancias.append((marca_id, guardado, calculado))
+    return discrepancias
+
+
+def marcas_de(verificacion):
+    qs = Marcas.objects.all()
+    if verificacion.empresa_id:
+        qs = qs.filter(empresa_id=verificacion.empresa_id)
+    return qs
+
+
+def periodos_de(verificacion):
+    qs = PeriodoArchivado.objects.all()
+    if verificacion.empresa_id:
+        qs = qs.filter(empresa_id=verificacion.empresa_id)
+    return qs.order_by("id")
+
+
+def ultima_corrida_limpia(empresa_id=None):
+    """Ultima corrida completada sin discrepancias que cubre la empresa (o todas las marcas)."""
+    alcance = Q(empresa__isnull=True)
+    if empresa_id:
+        alcance |= Q(empresa_id=empresa_id)
+    return (
+        VerificacionMarcas.objects.filter(alcance, estado="completada", discrepancias=0, hasta_id__isnull=False)
+        .order_by("-hasta_id")
+        .first()
+    )
+
+
+def timeout_procesando():
+    """Segundos sin registrar un bloque tras los que una corrida en 'procesando' se da por abandonada."""
+    return getattr(settings, "VERIFICACION_TIMEOUT_SEGUNDOS", 30 * 60)
+
+
+def verificaciones_abandonadas():
+    return Q(estado="procesando", actualizado_en__lt=timezone.now() - timedelta(seconds=timeout_procesando()))
+
+
+def tomar_siguiente_verificacion():
+    """
+    Marca como 'procesando' la verificacion pendiente mas antigua y la devuelve (None si no hay).
+    Tambien toma las abandonadas, que continuan desde su punto de control.
+    """
+    with transaction.atomic():
+        qs = VerificacionMarcas.objects.filter(Q(estado="pendiente") | verificaciones_abandonadas())
+        qs = qs.order_by("creado_en", "id")
+        qs = qs.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        verificacion = qs.first()
+        if verificacion is None:
+            return None
+        verificacion.estado = "procesando"
+        verificacion.iniciado_en = verificacion.iniciado_en or timezone.now()
+        verificacion.save(update_fields=["estado", "iniciado_en", "actualizado_en"])
+    return verificacion
+
+
+class VerificadorMarcas:
+    """
+    Ejecuta (o reanuda) una VerificacionMarcas. `progreso(verificacion, marcas_por_segundo)`
+    se llama despues de registrar cada bloque.
+    """
+
+    def __init__(self, verificacion, procesos=None, tamano_bloque=5000, progreso=None):
+        self.verificacion = verificacion
+        self.procesos = procesos or os.cpu_count() or 1
+        self.tamano_bloque = tamano_bloque
+        self.progreso = progreso
+        self._revisadas_sesion = 0
+        self._inicio = self._ultimo_registro = None
+
+    def ejecutar(self):
+        v = self.verificacion
+        self._preparar()
+        self._inicio = self._ultimo_registro = time.monotonic()
+        try:
+            if self.procesos <= 1:
+                for filas in self._bloques():
+                    self._registrar(filas[-1][0], len(filas), verificar_lote(filas))
+                for periodo_id, bloques in self._periodos():
+                    discrepancias = [d for filas in bloques for d in verificar_lote(filas)]
+                    self._registrar_periodo(periodo_id, sum(map(len, bloques)), discrepancias)
+            else:
+                self._ejecutar_en_pool()
+        except KeyboardInterrupt:
+            self._terminar("interrumpida")
+            raise
+        except Exception as exc:
+            self._terminar("error", error=str(exc))
+            raise
+        self._terminar("completada")
+        return v
+
+    def marcas_por_segundo(self):
+        transcurrido = time.monotonic() - self._inicio if self._inicio else 0
+        return self._revisadas_sesion / transcurrido if transcurrido else 0.0
+
+    def _preparar(self):
+        v = self.verificacion
+        campos = ["estado", "error", "terminado_en", "actualizado_en"]
+        if v.hasta_id is None:
+            if v.incremental:
+                base = ultima_corrida_limpia(v.empresa_id)
+                v.desde_id = base.hasta_id if base else 0
+            archivos = [archivo_marcas.abrir(periodo) for periodo in periodos_de(v)]
+            v.hasta_id = max(
+                [Marcas.objects.aggregate(maximo=Max("id"))["maximo"] or 0]
+                + [int(archivo.id.max()) for archivo in archivos if archivo.filas]
+            )
+            v.ultimo_id = v.desde_id
+            v.total = marcas_de(v).filter(id__gt=v.desde_id, id__lte=v.hasta_id).count() + sum(
+                len(self._posiciones(archivo)) for archivo in archivos
+            )
+            campos += ["desde_id", "hasta_id", "ultimo_id", "total"]
+        if v.iniciado_en is None:
+            v.iniciado_en = timezone.now()
+            campos.append("iniciado_en")
+        v.estado = "procesando"
+        v.error = None
+        v.terminado_en = None
+        v.save(update_fields=campos)
+
+    def _bloques(self):
+        v = self.verificacion
+        cursor = v.ultimo_id
+        qs = marcas_de(v).filter(id__lte=v.hasta_id).order_by("id")
+        while True:
+            filas = list(qs.filter(id__gt=cursor).values_list(*COLUMNAS)[: self.tamano_bloque])
+            if not filas:
+                return
+            cursor = filas[-1][0]
+            yield filas
+
+    def _posiciones(self, archivo):
+        v = self.verificacion
+        return np.flatnonzero((archivo.id > v.desde_id) & (archivo.id <= v.hasta_id))
+
+    def _periodos(self):
+        """(id, bloques) de los periodos archivados que faltan, con sus filas en el rango de ids."""
+        for periodo in periodos_de(self.verificacion).filter(id__gt=self.verificacion.ultimo_periodo_id):
+            archivo = archivo_marcas.abrir(periodo)
+            filas = list(
+                archivo_marcas.resolver((archivo.fila(int(i)) for i in self._posiciones(archivo)), COLUMNAS)
+            )
+            yield periodo.id, [filas[i : i + self.tamano_bloque] for i in range(0, len(filas), self.tamano_bloque)]
+
+    def _ejecutar_en_pool(self):
+        # spawn: los procesos hijos no heredan las conexiones abiertas a la base de datos.
+        with ProcessPoolExecutor(
+            max_workers=self.procesos, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup
+        ) as pool:
+            # Se registran en el orden en que se enviaron para que el punto de control
+            # nunca quede por delante de un bloque sin verificar.
+            pendientes = deque()
+            try:
+                for filas in self._bloques():
+                    pendientes.append((filas[-1][0], len(filas), pool.submit(verificar_lote, filas)))
+                    if len(pendientes) >= self.procesos * 2:
+                        self._registrar_futuro(*pendientes.popleft())
+                while pendientes:
+                    self._registrar_futuro(*pendientes.popleft())
+                for periodo_id, bloques in self._periodos():
+                    futuros = [pool.submit(verificar_lote, filas) for filas in bloques]
+                    discrepancias = [d for futuro in futuros for d in futuro.result()]
+                    self._registrar_periodo(periodo_id, sum(map(len, bloques)), discrepancias)
+            except BaseException:
+                for _, _, futuro in pendientes:
+                    futuro.cancel()
+                raise
+
+    def _registrar_futuro(self, ultimo_id, cantidad, futuro):
+        self._registrar(ultimo_id, cantidad, futuro.result())
+
+    def _registrar(self, ultimo_id, cantidad, discrepancias):
+        self.verificacion.ultimo_id = ultimo_id
+        self._guardar("ultimo_id", cantidad, discrepancias)
+
+    def _registrar_periodo(self, periodo_id, cantidad, discrepancias):
+        self.verificacion.ultimo_periodo_id = periodo_id
+        self._guardar("ultimo_periodo_id", cantidad, discrepancias)
+
+    def _guardar(self, punto_de_control, cantidad, discrepancias):
+        v = self.verificacion
+        ahora = time.monotonic()
+        with transaction.atomic():
+            if discrepancias:
+                DiscrepanciaMarca.objects.bulk_create(
+                    [
+                        DiscrepanciaMarca(
+                            verificacion=v, marca_id=marca_id, hash_guardado=guardado, hash_calculado=calculado
+                        )
+                        for marca_id, guardado, calculado in discrepancias
+                    ],
+                    ignore_conflicts=True,
+                )
+            v.revisadas += cantidad
+            v.discrepancias += len(discrepancias)
+            v.segundos += ahora - self._ultimo_registro
+            v.save(update_fields=[punto_de_control, "revisadas", "discrepancias", "segundos", "actualizado_en"])
+        self._ultimo_registro = ahora
+        self._revisadas_sesion += cantidad
+        if self.progreso:
+            self.progreso(v, self.marcas_por_segundo())
+
+    def _terminar(self, estado, error=None):
+        v = self.verificacion
+        v.estado = estado
+        v.error = error
+        v.terminado_en = timezone.now() if estado == "completada" else None
+        v.save(update_fields=["estado", "error", "terminado_en", "actualizado_en"])
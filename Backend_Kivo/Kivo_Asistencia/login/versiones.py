@@ -0,0 +1,134 @@
+"""
+Versiones por (recurso, empresa) para responder GET condicionales.
+
+Las signals, y los caminos que usan bulk_create o update(), llaman a incrementar()
+y el contador sube al confirmar la transaccion. Las vistas con RespuestaCondicionalMixin
+leen las versiones de sus recursos en una consulta, arman el ETag y, si el cliente ya
+tiene esa version, responden 304 sin leer ni serializar las filas.
+"""
+
+import hashlib
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import VersionRecurso
+
+# Subirlo cuando cambie el formato de alguna respuesta, para invalidar los ETag emitidos.
+VERSION_FORMATO = 1
+
+
+def incrementar(recurso, *empresa_ids):
+    """Sube la version de `recurso` en cada empresa al confirmarse la transaccion en curso."""
+    empresa_ids = sorted({empresa_id for empresa_id in empresa_ids if empresa_id})
+    if empresa_ids:
+        transaction.on_commit(lambda: _incrementar(recurso, empresa_ids))
+
+
+def _incrementar(recurso, empresa_ids):
+    qs = VersionRecurso.objects.filter(recurso=recurso, empresa_id__in=empresa_ids)
+    if qs.update(version=F("version") + 1, actualizado_en=timezone.now()) == len(empresa_ids):
+        return
+    # Faltan filas: se crean en 0 y se vuelve a incrementar todo. Subir dos veces una
+    # version no hace dano; perder un incremento dejaria respuestas viejas como vigentes.
+    VersionRecurso.objects.bulk_create(
+        [VersionRecurso(recurso=recurso, empresa_id=empresa_id, version=0) for empresa_id in empresa_ids],
+        ignore_conflicts=True,
+    )
+    qs.update(version=F("version") + 1, actualizado_en=timezone.now())
+
+
+def leer(recursos, empresa_ids):
+    """{(recurso, empresa_id): (version, actualizado_en)} de los contadores existentes."""
+    return {
+        (recurso, empresa_id): (version, actualizado_en)
+        for recurso, empresa_id, version, actualizado_en in VersionRecurso.objects.filter(
+            recurso__in=recursos, empresa_id__in=empresa_ids
+        ).values_list("recurso", "empresa_id", "version", "actualizado_en")
+    }
+
+
+def validador(leidas, recursos, empresa_ids, *extra):
+    """(etag sin comillas, ultima modificacion o None) a partir de lo devuelto por leer()."""
+    versiones = sorted((clave, version) for clave, (version, _) in leidas.items())
+    clave = repr((VERSION_FORMATO, sorted(recursos), sorted(empresa_ids), versiones, extra))
+    ultima = max((actualizado_en for _, actualizado_en in leidas.values()), default=None)
+    return hashlib.sha256(clave.encode("utf-8")).hexdigest()[:32], ultima
+
+
+class NoModificado(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class RespuestaCondicionalMixin:
+    """
+    GET condicional para vistas de DRF. `recursos_version` son los recursos cuyas filas
+    aparecen en la respuesta; el ETag cubre esas versiones en las empresas del usuario,
+    el usuario y la URL completa.
+    """
+
+    recursos_version = ()
+    # False si la vista ignora empresa_id y siempre responde con todas las empresas del usuario.
+    filtra_por_empresa = True
+
+    def empresas_version(self, request):
+        """
+        Empresas cuyas versiones cubre el ETag: la pedida (la de la URL antes que la del
+        query string), o ninguna si el usuario no tiene acceso a ella; sin empresa pedida,
+        todas las del usuario.
+        """
+        empresas = set(request.user.empresas_ids())
+        if not self.filtra_por_empresa:
+            return empresas
+        empresa_id = self.kwargs.get("empresa_id") or request.query_params.get("empresa_id")
+        if empresa_id is None:
+            return empresas
+        try:
+            empresa_id = int(empresa_id)
+        except (TypeError, ValueError):
+            return set()
+        return {empresa_id} & empresas
+
+    def extra_validador(self, request):
+        """Otros valores de los que depende la respuesta (p. ej. una ventana de tiempo)."""
+        return ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validador = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        empresa_ids = self.empresas_version(request)
+        self.versiones_leidas = leer(self.recursos_version, empresa_ids)
+        etag, ultima = validador(
+            self.versiones_leidas,
+            self.recursos_version,
+            empresa_ids,
+            request.user.id,
+            request.get_full_path(),
+            *self.extra_validador(request),
+        )
+        self._validador = (quote_etag(etag), int(ultima.timestamp()) if ultima else None)
+        response = get_conditional_response(request, etag=self._validador[0], last_modified=self._validador[1])
+        if response is not None:
+            raise NoModificado(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NoModificado):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validador_actual = getattr(self, "_validador", None)
+        if validador_actual and response.status_code in (200, 304):
+            etag, ultima = validador_actual
+            response["ETag"] = etag
+            if ultima is not None:
+                response["Last-Modified"] = http_date(ultima)
+            response["Cache-Control"] = "private, no-cache"
+        return response
@@ -1,36 +1,72 @@
-from datetime import datetime, time
+import csv
+import heapq
+import mimetypes
+import os
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import RetrieveAPIView, ListAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Sum
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from .models import (
     AuditoriaCambio,
     Empresa,
+    EmpresaUsuario,
+    EstadoJornada,
+    ImportacionJob,
     Licencia,
     Marcas,
+    RaizMerkle,
+    ReporteJob,
+    ResumenDiario,
     Trabajador,
     Turno,
     Usuario,
     Vacaciones,
+    VerificacionMarcas,
 )
+from .importacion import comprobar_csv
+from . import archivo_marcas, auditoria, descargas, documentos, merkle, versiones
+from .cache_referencia import ReferenciaCacheadaMixin
+from .exportacion import COLUMNAS_AUDITORIA, COLUMNAS_MARCAS, csv_stream, iterar_por_bloques, xlsx_stream
+from .motor_asistencia import calcular_periodo
+from .nomina import ESTADOS_DIA, nomina_empresa
+from .normalizacion import normalizar_rut, normalizar_texto
+from .pagination import AuditoriaPagination, IdKeysetPagination, MarcasPagination
 from .serializers import (
     AuditoriaSerializer,
     CrearUsuarioGeneralSerializer,
     EmpresaSerializer,
+    ImportacionJobSerializer,
     LicenciaSerializer,
+    MarcaBasicaProyeccion,
+    MarcaBasicSerializer,
+    MarcaProyeccion,
     MarcaSerializer,
     MyTokenObtainPairSerializer,
+    MyTokenRefreshSerializer,
+    ReporteJobSerializer,
+    SincronizarMarcasSerializer,
+    TrabajadorListSerializer,
     TrabajadorProfileSerializer,
     TurnoSerializer,
     UpdateUsuarioSerializer,
     VacacionesSerializer,
     UsuarioListSerializer,
+    VerificacionMarcasSerializer,
 )
+from .verificacion import verificaciones_abandonadas
 
 
 ROLES_CON_EMPRESAS = {"admin_rrhh", "asistente_rrhh", "fiscalizador"}
@@ -42,23 +78,166 @@ def empresas_autorizadas_ids(user: Usuario, roles=None):
     Devuelve los IDs de empresas asociadas a un usuario.
     - Trabajador: la empresa de su ficha.
     - RRHH/fiscalizador: empresas asociadas via EmpresaUsuario (opcionalmente filtradas por rol).
+    Usa el mapa de autorizacion cacheado del usuario (ver Usuario.mapa_autorizacion).
     """
-    roles_filtrados = set(roles) if roles else None
+    return user.empresas_ids(roles=roles)
+
+
+def leer_fecha(valor):
+    """Fecha YYYY-MM-DD o None si el formato es invalido o la fecha no existe (2024-02-30)."""
+    try:
+        return parse_date(valor)
+    except ValueError:
+        return None
+
+
+def rango_fechas_params(params):
+    """Lee desde/hasta (YYYY-MM-DD) de los query params. Lanza ValidationError si son invalidas."""
+    fechas = []
+    for nombre in ("desde", "hasta"):
+        valor = params.get(nombre)
+        fecha = leer_fecha(valor) if valor else None
+        if valor and fecha is None:
+            raise ValidationError({nombre: "Formato de fecha invalido, use YYYY-MM-DD."})
+        fechas.append(fecha)
+    return fechas
+
+
+def id_param(params, nombre):
+    """Lee un id de los query params (None si no viene). Lanza ValidationError si no es un numero."""
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError({nombre: "Debe ser un numero."})
+
+
+def limites_rango_fechas(desde=None, hasta=None):
+    """[inicio, fin) de los dias locales desde..hasta; None en el extremo que no se indico."""
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(desde, time.min), tz) if desde else None
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min), tz) if hasta else None
+    return inicio, fin
+
+
+def filtrar_rango_fechas(qs, desde=None, hasta=None, campo="timestamp"):
+    """Filtra un DateTimeField por dias locales completos, de forma que use indices (sin __date)."""
+    inicio, fin = limites_rango_fechas(desde, hasta)
+    if inicio:
+        qs = qs.filter(**{f"{campo}__gte": inicio})
+    if fin:
+        qs = qs.filter(**{f"{campo}__lt": fin})
+    return qs
+
+
+def marcas_autorizadas(user: Usuario, params):
+    """
+    Marcas visibles para el usuario segun su rol, con los filtros opcionales
+    empresa_id, trabajador_id, desde y hasta. Lanza ValidationError si un filtro es invalido.
+    """
+    qs = Marcas.objects.order_by("-timestamp", "-id")
+    if user.rol == "trabajador":
+        qs = qs.filter(trabajador=user.trabajador)
+    else:
+        allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
+        if allowed:
+            qs = qs.filter(empresa_id__in=allowed)
+        else:
+            qs = qs.none()
+        empresa_id = id_param(params, "empresa_id")
+        if empresa_id is not None:
+            qs = qs.filter(empresa_id=empresa_id)
+        trabajador_id = id_param(params, "trabajador_id")
+        if trabajador_id is not None:
+            qs = qs.filter(trabajador_id=trabajador_id)
+
+    desde, hasta = rango_fechas_params(params)
+    return filtrar_rango_fechas(qs, desde, hasta)
+
+
+def marcas_archivadas_filtro(user: Usuario, params):
+    """
+    Filtro de archivo_marcas equivalente a marcas_autorizadas(), o None si el usuario
+    no puede ver marcas archivadas con esos parametros.
+    """
+    filtro = archivo_marcas.Filtro()
+    if user.rol == "trabajador":
+        if not user.trabajador_id:
+            return None
+        filtro.trabajador_id = user.trabajador_id
+    else:
+        filtro.empresas = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
+        empresa_id = id_param(params, "empresa_id")
+        if empresa_id is not None:
+            filtro.empresas = [e for e in filtro.empresas if e == empresa_id]
+        filtro.trabajador_id = id_param(params, "trabajador_id")
+        if not filtro.empresas:
+            return None
+
+    filtro.inicio, filtro.fin = limites_rango_fechas(*rango_fechas_params(params))
+    return filtro
 
-    if user.rol == "trabajador" and user.trabajador:
-        if roles_filtrados and "trabajador" not in roles_filtrados:
-            return []
-        return [user.trabajador.empresa_id] if user.trabajador.empresa_id else []
 
-    relaciones = user.empresas_usuario.all()
-    if roles_filtrados:
-        relaciones = relaciones.filter(rol__in=roles_filtrados)
+ROLES_AUDITORIA = {"fiscalizador", "admin_rrhh"}
 
-    empresa_ids = list(relaciones.values_list("empresa_id", flat=True))
 
-    if user.trabajador and user.trabajador.empresa_id and user.trabajador.empresa_id not in empresa_ids:
-        empresa_ids.append(user.trabajador.empresa_id)
-    return empresa_ids
+def auditoria_autorizada(user: Usuario, params):
+    """
+    Registros de auditoria de las empresas del usuario (fiscalizador o admin_rrhh), con los
+    filtros opcionales empresa_id, accion, modelo_afectado, usuario_id, desde y hasta.
+    Lanza ValidationError si un filtro es invalido.
+    """
+    if user.rol not in ROLES_AUDITORIA:
+        return AuditoriaCambio.objects.none()
+
+    allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
+    empresa_id = id_param(params, "empresa_id")
+    if empresa_id is not None:
+        allowed = [empresa_id] if empresa_id in allowed else []
+    usuario_id = id_param(params, "usuario_id")
+    if not allowed:
+        return AuditoriaCambio.objects.none()
+
+    qs = AuditoriaCambio.objects.filter(empresa_id__in=allowed)
+    if usuario_id is not None:
+        qs = qs.filter(usuario_id=usuario_id)
+    for campo in ("accion", "modelo_afectado"):
+        if params.get(campo):
+            qs = qs.filter(**{campo: params[campo]})
+    desde, hasta = rango_fechas_params(params)
+    return filtrar_rango_fechas(qs, desde, hasta, campo="fecha")
+
+
+MARCAS_RECIENTES_PERFIL = 30
+
+
+def trabajadores_con_perfil(queryset):
+    """
+    Agrega lo que necesita TrabajadorProfileSerializer: las ultimas marcas en un solo
+    prefetch limitado por trabajador y el resumen del mes actual desde ResumenDiario.
+    """
+    hoy = timezone.localdate()
+    del_mes = Q(resumenes_diarios__fecha__gte=hoy.replace(day=1), resumenes_diarios__fecha__lte=hoy)
+    recientes = Marcas.objects.order_by("-timestamp", "-id")[:MARCAS_RECIENTES_PERFIL]
+    return (
+        queryset.select_related("empresa", "usuario")
+        .prefetch_related(Prefetch("marcas_set", queryset=recientes, to_attr="marcas_recientes"))
+        .annotate(
+            dias_trabajados_mes=Count(
+                "resumenes_diarios", filter=del_mes & Q(resumenes_diarios__primera_entrada__isnull=False)
+            ),
+            minutos_trabajados_mes=Sum("resumenes_diarios__minutos_trabajados", filter=del_mes),
+            atrasos_mes=Count("resumenes_diarios", filter=del_mes & Q(resumenes_diarios__minutos_atraso__gt=0)),
+            minutos_atraso_mes=Sum("resumenes_diarios__minutos_atraso", filter=del_mes),
+            minutos_extra_mes=Sum("resumenes_diarios__minutos_extra", filter=del_mes),
+        )
+    )
+
+
+def trabajadores_autorizados(user: Usuario):
+    return Trabajador.objects.filter(empresa_id__in=empresas_autorizadas_ids(user))
 
 
 def empresa_permitida(user: Usuario, empresa_id: int, roles=None) -> bool:
@@ -70,7 +249,8 @@ def empresa_permitida(user: Usuario, empresa_id: int, roles=None) -> bool:
 class TieneAccesoEmpresaPermission(IsAuthenticated):
     """
     Permiso reusable para validar acceso a endpoints por empresa.
-    Busca empresa_id en query params o kwargs (empresa_id por defecto).
+    Valida el empresa_id de los kwargs (empresa_id por defecto) y el de los query params:
+    si vienen ambos, el usuario debe tener acceso a los dos.
     """
 
     roles_empresa = None
@@ -81,21 +261,22 @@ class TieneAccesoEmpresaPermission(IsAuthenticated):
             return False
         roles_filtrados = getattr(view, "roles_empresa", self.roles_empresa)
 
-        empresa_id = request.query_params.get("empresa_id") or view.kwargs.get(self.kwarg_name)
-        if empresa_id is None:
+        pedidas = [view.kwargs.get(self.kwarg_name), request.query_params.get("empresa_id")]
+        pedidas = [empresa_id for empresa_id in pedidas if empresa_id is not None]
+        if not pedidas:
             return bool(empresas_autorizadas_ids(request.user, roles=roles_filtrados))
 
         try:
-            empresa_id = int(empresa_id)
+            pedidas = {int(empresa_id) for empresa_id in pedidas}
         except (TypeError, ValueError):
             return False
 
-        return request.user.tiene_acceso_empresa(empresa_id, roles=roles_filtrados)
+        return all(request.user.tiene_acceso_empresa(empresa_id, roles=roles_filtrados) for empresa_id in pedidas)
 
 
 def log_auditoria(usuario: Usuario, empresa_id: int, accion: str, modelo: str, registro_id: int, motivo=None):
-    AuditoriaCambio.objects.create(
-        usuario=usuario,
+    auditoria.registrar(
+        usuario_id=usuario.id,
         empresa_id=empresa_id,
         accion=accion,
         modelo_afectado=modelo,
@@ -108,6 +289,10 @@ class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 
+class MyTokenRefreshView(TokenRefreshView):
+    serializer_class = MyTokenRefreshSerializer
+
+
 class AsistenciasView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -127,25 +312,8 @@ class AsistenciasView(APIView):
         hoy = timezone.localdate()
         tz = timezone.get_current_timezone()
 
-        inicio_dia = timezone.make_aware(datetime.combine(hoy, time.min), tz)
-        fin_dia = timezone.make_aware(datetime.combine(hoy, time.max), tz)
-
-        marcas_hoy = (
-            Marcas.objects.filter(trabajador=trabajador, timestamp__range=(inicio_dia, fin_dia))
-            .select_related("trabajador", "trabajador__empresa")
-            .order_by("timestamp")
-        )
-
-        entrada_activa = False
-        if marcas_hoy.exists():
-            entradas_hoy = marcas_hoy.filter(tipo_marca="entrada")
-            salidas_hoy = marcas_hoy.filter(tipo_marca="salida")
-
-            if entradas_hoy.exists():
-                ultima_entrada = entradas_hoy.last()
-                ultima_salida = salidas_hoy.last() if salidas_hoy.exists() else None
-                if not ultima_salida or ultima_entrada.timestamp > ultima_salida.timestamp:
-                    entrada_activa = True
+        estado = EstadoJornada.objects.filter(trabajador_id=trabajador.id).first()
+        entrada_activa = bool(estado and estado.entrada_activa(hoy))
 
         turno = trabajador.turno
         segundos_restantes = 0
@@ -198,88 +366,277 @@ class AsistenciasView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        hoy = timezone.localdate()
-        tz = timezone.get_current_timezone()
-        inicio_dia = timezone.make_aware(datetime.combine(hoy, time.min), tz)
-        fin_dia = timezone.make_aware(datetime.combine(hoy, time.max), tz)
+        with transaction.atomic():
+            estado = EstadoJornada.bloquear(trabajador.id)
+            error = estado.validar_marca(tipo)
+            if error:
+                return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        marcas_hoy = (
-            Marcas.objects.filter(trabajador=trabajador, timestamp__range=(inicio_dia, fin_dia))
-            .select_related("trabajador")
-            .order_by("timestamp")
-        )
+            marca = Marcas(trabajador=trabajador, tipo_marca=tipo)
+            marca.save(estado_jornada=estado)
 
-        if tipo == "entrada":
-            entradas = marcas_hoy.filter(tipo_marca="entrada")
-            salidas = marcas_hoy.filter(tipo_marca="salida")
-            if entradas.exists():
-                ultima_entrada = entradas.last()
-                ultima_salida = salidas.last() if salidas.exists() else None
-                if not ultima_salida or ultima_entrada.timestamp > ultima_salida.timestamp:
-                    return Response(
-                        {"detail": "Ya tienes una entrada activa hoy."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+        serializer = MarcaSerializer(marca)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        elif tipo == "salida":
-            entradas = marcas_hoy.filter(tipo_marca="entrada")
-            salidas = marcas_hoy.filter(tipo_marca="salida")
-            if not entradas.exists():
-                return Response(
-                    {"detail": "No tienes una entrada registrada hoy."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            ultima_entrada = entradas.last()
-            ultima_salida = salidas.last() if salidas.exists() else None
-            if ultima_salida and ultima_salida.timestamp > ultima_entrada.timestamp:
-                return Response(
-                    {"detail": "Ya tienes una salida registrada despues de la ultima entrada."},
-                    status=status.HTTP_400_BAD_REQUEST,
+
+class SincronizarMarcasView(APIView):
+    """
+    Recibe en un solo request las marcas capturadas sin conexion.
+    Cada marca trae una clave de idempotencia generada por el cliente, por lo que
+    reintentar el mismo lote nunca duplica filas. Es el unico camino que inserta marcas
+    con clave: la unicidad de la clave la garantiza esta vista, no la base de datos
+    (ver Marcas.Meta.constraints).
+    """
+
+    permission_classes = [IsAuthenticated]
+    tolerancia_futuro = timedelta(minutes=5)
+
+    def post(self, request):
+        serializer = SincronizarMarcasSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data["marcas"]
+        resultados = [None] * len(items)
+        trabajadores = self._trabajadores_autorizados(request.user, items)
+        limite = timezone.now() + self.tolerancia_futuro
+
+        por_trabajador = {}
+        for pos, item in enumerate(items):
+            trabajador_id = item.get("trabajador_id") or request.user.trabajador_id
+            if trabajador_id not in trabajadores:
+                resultados[pos] = self._resultado(item, "rechazada", detail="Trabajador no autorizado.")
+                continue
+            # El hash se calcula sobre el timestamp en UTC, igual que las marcas en linea.
+            item["timestamp"] = item["timestamp"].astimezone(dt_timezone.utc)
+            if item["timestamp"] > limite:
+                resultados[pos] = self._resultado(item, "rechazada", detail="La marca tiene fecha futura.")
+                continue
+            por_trabajador.setdefault(trabajador_id, []).append((pos, item))
+
+        with transaction.atomic():
+            estados = self._bloquear_estados(por_trabajador.keys())
+            claves = {item["clave_idempotencia"] for grupo in por_trabajador.values() for _, item in grupo}
+            existentes = {
+                (trabajador_id, clave): marca_id
+                for trabajador_id, clave, marca_id in Marcas.objects.filter(
+                    trabajador_id__in=por_trabajador.keys(), clave_idempotencia__in=claves
+                ).values_list("trabajador_id", "clave_idempotencia", "id")
+            }
+
+            nuevas = []
+            ultimas = {}
+            for trabajador_id, grupo in por_trabajador.items():
+                estado = estados[trabajador_id]
+                grupo.sort(key=lambda par: par[1]["timestamp"])
+                for pos, item in grupo:
+                    clave = (trabajador_id, item["clave_idempotencia"])
+                    if clave in existentes:
+                        resultados[pos] = self._resultado(item, "duplicada", marca_id=existentes[clave])
+                        continue
+                    if estado.ultimo_timestamp and item["timestamp"] < estado.ultimo_timestamp:
+                        resultados[pos] = self._resultado(
+                            item, "rechazada", detail="La marca es anterior a la ultima marca registrada."
+                        )
+                        continue
+                    error = estado.validar_marca(item["tipo_marca"], item["timestamp"])
+                    if error:
+                        resultados[pos] = self._resultado(item, "rechazada", detail=error)
+                        continue
+
+                    marca = Marcas(
+                        trabajador=trabajadores[trabajador_id],
+                        empresa_id=trabajadores[trabajador_id].empresa_id,
+                        tipo_marca=item["tipo_marca"],
+                        timestamp=item["timestamp"],
+                        clave_idempotencia=item["clave_idempotencia"],
+                    )
+                    marca.hash = marca.compute_sha256()
+                    estado.aplicar(marca)
+                    existentes[clave] = marca
+                    ultimas[trabajador_id] = marca
+                    nuevas.append(marca)
+                    resultados[pos] = self._resultado(item, "creada", marca_id=marca)
+
+            if nuevas:
+                Marcas.objects.bulk_create(nuevas, batch_size=500)
+                # bulk_create no devuelve ids en MySQL: se recuperan por la clave de idempotencia.
+                ids = {
+                    (trabajador_id, clave): marca_id
+                    for trabajador_id, clave, marca_id in Marcas.objects.filter(
+                        trabajador_id__in=ultimas.keys(),
+                        clave_idempotencia__in={marca.clave_idempotencia for marca in nuevas},
+                    ).values_list("trabajador_id", "clave_idempotencia", "id")
+                }
+                for marca in nuevas:
+                    marca.id = ids[(marca.trabajador_id, marca.clave_idempotencia)]
+                for trabajador_id, marca in ultimas.items():
+                    estados[trabajador_id].ultima_marca_id = marca.id
+                # bulk_create no dispara signals.
+                versiones.incrementar("marcas", *{trabajadores[trabajador_id].empresa_id for trabajador_id in ultimas})
+                EstadoJornada.objects.bulk_update(
+                    [estados[trabajador_id] for trabajador_id in ultimas],
+                    ["ultima_marca", "ultimo_tipo", "ultimo_timestamp", "entrada_abierta", "inicio_jornada"],
                 )
+                fechas = {}
+                for marca in nuevas:
+                    fechas.setdefault(marca.trabajador_id, set()).update(
+                        ResumenDiario.fechas_afectadas(marca.timestamp)
+                    )
+                for trabajador_id, fechas_trabajador in fechas.items():
+                    ResumenDiario.recalcular(trabajadores[trabajador_id], *sorted(fechas_trabajador))
 
-        marca = Marcas.objects.create(trabajador=trabajador, tipo_marca=tipo)
-        serializer = MarcaSerializer(marca)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        for resultado in resultados:
+            if isinstance(resultado["id"], Marcas):
+                resultado["id"] = resultado["id"].id
 
+        return Response(
+            {
+                "creadas": sum(1 for r in resultados if r["estado"] == "creada"),
+                "duplicadas": sum(1 for r in resultados if r["estado"] == "duplicada"),
+                "rechazadas": sum(1 for r in resultados if r["estado"] == "rechazada"),
+                "resultados": resultados,
+            }
+        )
+
+    def _trabajadores_autorizados(self, user, items):
+        if user.rol == "trabajador":
+            return {user.trabajador_id: user.trabajador} if user.trabajador_id else {}
+
+        # Las marcas sin trabajador_id son del propio usuario (ver post()), si tiene ficha.
+        ids = {item.get("trabajador_id") or user.trabajador_id for item in items} - {None}
+        allowed = empresas_autorizadas_ids(user, roles=ROLES_RRHH)
+        qs = Trabajador.objects.filter(id__in=ids, empresa_id__in=allowed)
+        return {trabajador.id: trabajador for trabajador in qs}
+
+    def _bloquear_estados(self, trabajador_ids):
+        trabajador_ids = list(trabajador_ids)
+        EstadoJornada.objects.bulk_create(
+            [EstadoJornada(trabajador_id=trabajador_id) for trabajador_id in trabajador_ids],
+            ignore_conflicts=True,
+        )
+        return {
+            estado.trabajador_id: estado
+            for estado in EstadoJornada.objects.select_for_update().filter(trabajador_id__in=trabajador_ids)
+        }
+
+    def _resultado(self, item, estado, marca_id=None, detail=None):
+        resultado = {"clave_idempotencia": item["clave_idempotencia"], "estado": estado, "id": marca_id}
+        if detail:
+            resultado["detail"] = detail
+        return resultado
 
-class AsistenciasListView(ListAPIView):
+
+class AsistenciasListView(versiones.RespuestaCondicionalMixin, ListAPIView):
+    """
+    Marcas de las empresas del usuario, paginadas por cursor sobre (timestamp, id).
+    Filtros opcionales: empresa_id, trabajador_id, desde y hasta (YYYY-MM-DD).
+    """
+
+    recursos_version = ("marcas", "trabajadores", "empresas")
     serializer_class = MarcaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MarcasPagination
 
     def get_queryset(self):
-        user = self.request.user
-        empresa_id = self.request.query_params.get("empresa_id")
+        return marcas_autorizadas(self.request.user, self.request.query_params).select_related(
+            "trabajador", "trabajador__empresa"
+        )
 
-        if user.rol == "trabajador":
-            return (
-                Marcas.objects.filter(trabajador=user.trabajador)
-                .select_related("trabajador", "trabajador__empresa")
-                .order_by("-timestamp")
-            )
+    def list(self, request, *args, **kwargs):
+        # Proyeccion: filas desde values_list con los joins ya resueltos (misma salida que MarcaSerializer).
+        proyeccion = MarcaProyeccion()
+        qs = marcas_autorizadas(request.user, request.query_params).values_list(*proyeccion.columnas, named=True)
+        return self.get_paginated_response(proyeccion.filas(self.paginate_queryset(qs)))
 
-        qs = Marcas.objects.select_related("trabajador", "trabajador__empresa").order_by("-timestamp")
-        allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
-        if allowed:
-            qs = qs.filter(trabajador__empresa_id__in=allowed)
-        else:
-            qs = qs.none()
-        if empresa_id:
-            qs = qs.filter(trabajador__empresa_id=empresa_id)
-        return qs
+    def filas_archivadas(self, cursor, limite):
+        filtro = marcas_archivadas_filtro(self.request.user, self.request.query_params)
+        if filtro is None:
+            return []
+        return archivo_marcas.proyectar(archivo_marcas.pagina(filtro, cursor, limite), MarcaProyeccion.columnas)
+
+
+class ExportarAsistenciasView(APIView):
+    """
+    Exporta marcas (con su hash) en CSV o XLSX como respuesta en streaming.
+    Mismos filtros que el listado: empresa_id, trabajador_id, desde, hasta.
+    """
+
+    permission_classes = [IsAuthenticated]
+    formatos = {
+        "csv": ("text/csv; charset=utf-8", csv_stream),
+        "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", xlsx_stream),
+    }
+
+    def get(self, request):
+        formato = request.query_params.get("formato", "csv")
+        if formato not in self.formatos:
+            return Response({"detail": "formato debe ser 'csv' o 'xlsx'."}, status=400)
+
+        qs = marcas_autorizadas(request.user, request.query_params)
+        encabezados = [nombre for nombre, _ in COLUMNAS_MARCAS]
+        campos = [campo for _, campo in COLUMNAS_MARCAS]
+        filas = iterar_por_bloques(qs, campos)
+        filtro = marcas_archivadas_filtro(request.user, request.query_params)
+        if filtro is not None:
+            archivadas = archivo_marcas.resolver(archivo_marcas.iterar(filtro), campos)
+            orden = (campos.index("timestamp"), campos.index("id"))
+            filas = heapq.merge(archivadas, filas, key=lambda fila: (fila[orden[0]], fila[orden[1]]))
+
+        content_type, generador = self.formatos[formato]
+        response = StreamingHttpResponse(generador(encabezados, filas), content_type=content_type)
+        nombre = f"asistencias_{timezone.localdate():%Y%m%d}.{formato}"
+        response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return response
 
 
 class TrabajadorProfileView(RetrieveAPIView):
     serializer_class = TrabajadorProfileSerializer
     permission_classes = [IsAuthenticated]
+    floats_en_respuesta = True  # resumen_mes.horas_trabajadas
 
     def get_queryset(self):
-        user = self.request.user
-        allowed = empresas_autorizadas_ids(user)
-        return Trabajador.objects.filter(empresa_id__in=allowed)
+        return trabajadores_con_perfil(trabajadores_autorizados(self.request.user))
+
+
+class MarcasTrabajadorView(versiones.RespuestaCondicionalMixin, ListAPIView):
+    """
+    Historial completo de marcas de un trabajador, paginado por cursor sobre (timestamp, id).
+    Filtros opcionales: desde y hasta (YYYY-MM-DD).
+    """
+
+    recursos_version = ("marcas", "trabajadores")
+    serializer_class = MarcaBasicSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MarcasPagination
+
+    def get_queryset(self):
+        trabajador_id = self.kwargs["pk"]
+        if not trabajadores_autorizados(self.request.user).filter(pk=trabajador_id).exists():
+            raise NotFound("Trabajador no encontrado")
+        qs = Marcas.objects.filter(trabajador_id=trabajador_id).order_by("-timestamp", "-id")
+        desde, hasta = rango_fechas_params(self.request.query_params)
+        return filtrar_rango_fechas(qs, desde, hasta)
+
+    def list(self, request, *args, **kwargs):
+        proyeccion = MarcaBasicaProyeccion()
+        qs = self.get_queryset().values_list(*proyeccion.columnas, named=True)
+        return self.get_paginated_response(proyeccion.filas(self.paginate_queryset(qs)))
+
+    def filas_archivadas(self, cursor, limite):
+        filtro = archivo_marcas.Filtro(trabajador_id=int(self.kwargs["pk"]))
+        filtro.inicio, filtro.fin = limites_rango_fechas(*rango_fechas_params(self.request.query_params))
+        filas = archivo_marcas.pagina(filtro, cursor, limite)
+        return archivo_marcas.proyectar(filas, MarcaBasicaProyeccion.columnas)
 
 
 class TrabajadoresPorEmpresaView(ListAPIView):
-    serializer_class = TrabajadorProfileSerializer
+    """
+    Trabajadores de la empresa con su ficha, en una consulta: las marcas y el resumen
+    del mes de cada uno estan en su perfil (api/trabajadores/<pk>/perfil/).
+    """
+
+    serializer_class = TrabajadorListSerializer
     permission_classes = [TieneAccesoEmpresaPermission]
     roles_empresa = ROLES_CON_EMPRESAS
 
@@ -288,16 +645,21 @@ class TrabajadoresPorEmpresaView(ListAPIView):
         user = self.request.user
 
         if user.rol in ROLES_CON_EMPRESAS and user.tiene_acceso_empresa(empresa_id):
-            return Trabajador.objects.filter(empresa_id=empresa_id).select_related("empresa")
-
-        if user.rol == "trabajador" and user.tiene_acceso_empresa(empresa_id):
-            return Trabajador.objects.filter(id=user.trabajador_id)
-
-        return Trabajador.objects.none()
+            qs = Trabajador.objects.filter(empresa_id=empresa_id)
+        elif user.rol == "trabajador" and user.tiene_acceso_empresa(empresa_id):
+            qs = Trabajador.objects.filter(id=user.trabajador_id)
+        else:
+            return Trabajador.objects.none()
+        return qs.select_related("empresa", "usuario").order_by("apellidos", "nombres", "id")
 
 
-class LicenciasView(APIView):
+class LicenciasView(versiones.RespuestaCondicionalMixin, APIView):
     permission_classes = [IsAuthenticated]
+    recursos_version = ("licencias", "trabajadores")
+
+    def extra_validador(self, request):
+        # archivo_url lleva una firma que vence: el ETag cambia cada media vigencia.
+        return (int(timezone.now().timestamp()) // max(1, descargas.configuracion()["FIRMA_SEGUNDOS"] // 2),)
 
     def get(self, request):
         empresa_id = request.query_params.get("empresa_id")
@@ -306,14 +668,14 @@ class LicenciasView(APIView):
             qs = Licencia.objects.select_related("trabajador", "trabajador__empresa")
             allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
             if allowed:
-                qs = qs.filter(trabajador__empresa_id__in=allowed)
+                qs = qs.filter(empresa_id__in=allowed)
             else:
                 qs = qs.none()
             if empresa_id:
-                qs = qs.filter(trabajador__empresa_id=empresa_id)
+                qs = qs.filter(empresa_id=empresa_id)
         else:
             qs = Licencia.objects.filter(trabajador=user.trabajador)
-        serializer = LicenciaSerializer(qs, many=True)
+        serializer = LicenciaSerializer(qs, many=True, context={"request": request})
         return Response(serializer.data)
 
     def post(self, request, *args, **kwargs):
@@ -324,7 +686,7 @@ class LicenciasView(APIView):
         data["trabajador"] = request.user.trabajador.id
         data["creado_por"] = request.user.id
 
-        serializer = LicenciaSerializer(data=data)
+        serializer = LicenciaSerializer(data=data, context={"request": request})
         if serializer.is_valid():
             licencia = serializer.save()
             log_auditoria(
@@ -340,9 +702,90 @@ class LicenciasView(APIView):
         return Response(serializer.errors, status=400)
 
 
-class VacacionesView(APIView):
+class DocumentoLicenciaView(APIView):
+    """
+    Permite al cliente consultar por SHA-256 si el servidor ya tiene un PDF antes de
+    subirlo; si existe, la licencia se crea enviando `documento_sha256` sin `archivo`.
+    Solo cuentan los documentos de licencias de las empresas del usuario.
+    """
+
     permission_classes = [IsAuthenticated]
 
+    def get(self, request, sha256):
+        if not documentos.RE_SHA256.match(sha256.lower()):
+            return Response({"detail": "Hash SHA-256 invalido."}, status=400)
+        existe = documentos.buscar(sha256, request.user.empresas_ids()) is not None
+        return Response({"sha256": sha256.lower(), "existe": existe})
+
+
+class DescargaArchivoView(ABC, APIView):
+    """
+    Base abstracta de las descargas de archivos de MEDIA_ROOT (ver login/descargas.py).
+    Acepta el JWT habitual o la firma temporal `?firma=` que traen las URLs de los
+    serializers. Las subclases definen `nombre_ruta` (la ruta firmada) y los tres hooks.
+    """
+
+    permission_classes = [AllowAny]
+    nombre_ruta = None
+
+    @abstractmethod
+    def obtener(self, pk):
+        """Fila (dict) con el archivo a servir y lo que necesita autorizado(), o None si no hay archivo."""
+
+    @abstractmethod
+    def autorizado(self, user, fila):
+        """Si el usuario autenticado puede descargar el archivo de `fila` (no se llama con firma valida)."""
+
+    @abstractmethod
+    def servir(self, request, pk, fila):
+        """Respuesta con el archivo, normalmente descargas.servir_archivo(...)."""
+
+    def get(self, request, pk):
+        fila = self.obtener(pk)
+        if fila is None:
+            return Response({"detail": "Archivo no encontrado"}, status=404)
+        if not descargas.firma_valida(request, self.nombre_ruta, pk):
+            if not request.user.is_authenticated:
+                return Response({"detail": "Debe autenticarse o usar un enlace firmado vigente."}, status=401)
+            if not self.autorizado(request.user, fila):
+                return Response({"detail": "Permiso denegado"}, status=403)
+        return self.servir(request, pk, fila)
+
+
+class LicenciaArchivoView(DescargaArchivoView):
+    """PDF adjunto de una licencia: su trabajador o RRHH/fiscalizador de la empresa."""
+
+    nombre_ruta = "licencia_archivo"
+
+    def obtener(self, pk):
+        return (
+            Licencia.objects.filter(pk=pk)
+            .exclude(archivo="")
+            .exclude(archivo__isnull=True)
+            .values("archivo", "trabajador_id", "empresa_id", "documento__sha256", "documento__tipo_contenido")
+            .first()
+        )
+
+    def autorizado(self, user, fila):
+        if user.rol == "trabajador":
+            return fila["trabajador_id"] == user.trabajador_id
+        return user.tiene_acceso_empresa(fila["empresa_id"], roles=ROLES_CON_EMPRESAS)
+
+    def servir(self, request, pk, fila):
+        extension = os.path.splitext(fila["archivo"])[1] or ".pdf"
+        return descargas.servir_archivo(
+            request,
+            fila["archivo"],
+            nombre_descarga=f"licencia_{pk}{extension}",
+            tipo_contenido=fila["documento__tipo_contenido"] or mimetypes.guess_type(fila["archivo"])[0],
+            etag=fila["documento__sha256"],
+        )
+
+
+class VacacionesView(versiones.RespuestaCondicionalMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    recursos_version = ("vacaciones", "trabajadores")
+
     def get(self, request):
         empresa_id = request.query_params.get("empresa_id")
         user = request.user
@@ -350,11 +793,11 @@ class VacacionesView(APIView):
             qs = Vacaciones.objects.select_related("trabajador", "trabajador__empresa")
             allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
             if allowed:
-                qs = qs.filter(trabajador__empresa_id__in=allowed)
+                qs = qs.filter(empresa_id__in=allowed)
             else:
                 qs = qs.none()
             if empresa_id:
-                qs = qs.filter(trabajador__empresa_id=empresa_id)
+                qs = qs.filter(empresa_id=empresa_id)
         else:
             qs = Vacaciones.objects.filter(trabajador=request.user.trabajador)
 
@@ -404,7 +847,7 @@ class AprobacionVacacionesView(APIView):
             return Response({"detail": "Accion invalida"}, status=400)
 
         vac.estado = "aceptado" if accion == "aceptar" else "rechazado"
-        vac.resuelto_por = request.user
+        vac.resuelto_por_id = request.user.id
         vac.resuelto_en = timezone.now()
         vac.save()
 
@@ -452,7 +895,7 @@ class AprobacionLicenciaView(APIView):
             return Response({"detail": "Accion invalida"}, status=400)
 
         licencia.estado = "aceptado" if accion == "aceptar" else "rechazado"
-        licencia.resuelto_por = request.user
+        licencia.resuelto_por_id = request.user.id
         licencia.resuelto_en = timezone.now()
         licencia.save()
 
@@ -511,6 +954,50 @@ class CrearUsuarioView(APIView):
         return Response(serializer.errors, status=400)
 
 
+class ImportarUsuariosView(APIView):
+    """
+    Importacion masiva desde un CSV (campo multipart `archivo`) con las columnas de
+    FilaImportacionSerializer. `empresa_id` opcional se usa en las filas sin empresa.
+    El POST solo revisa que el archivo se pueda leer y lo encola (202): hashear las
+    contrasenas no cabe en un request. El GET con pk devuelve el total, los creados y
+    los errores por fila cuando procesar_importaciones termina.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            job = ImportacionJob.objects.get(id=pk, solicitado_por_id=request.user.id)
+        except ImportacionJob.DoesNotExist:
+            return Response({"detail": "Importacion no encontrada"}, status=404)
+        return Response(ImportacionJobSerializer(job).data)
+
+    def post(self, request):
+        if request.user.rol != "admin_rrhh":
+            return Response({"detail": "Acceso denegado"}, status=403)
+
+        archivo = request.FILES.get("archivo")
+        if archivo is None:
+            return Response({"detail": "Debe adjuntar el archivo CSV en el campo 'archivo'."}, status=400)
+
+        empresa_id = request.data.get("empresa_id")
+        try:
+            empresa_id = int(empresa_id) if empresa_id else None
+        except (TypeError, ValueError):
+            return Response({"empresa_id": "Debe ser un numero."}, status=400)
+        if empresa_id and not request.user.tiene_acceso_empresa(empresa_id, roles={"admin_rrhh"}):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+
+        archivo = archivo.open("rb")
+        try:
+            comprobar_csv(archivo)
+        except (UnicodeDecodeError, csv.Error):
+            return Response({"detail": "El archivo debe ser un CSV en UTF-8."}, status=400)
+
+        job = ImportacionJob.objects.create(empresa_id=empresa_id, solicitado_por=request.user, archivo=archivo)
+        return Response(ImportacionJobSerializer(job).data, status=202)
+
+
 class ActualizarUsuarioView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -583,8 +1070,64 @@ class UsuariosEmpresaListView(ListAPIView):
         return qs
 
 
-class EmpresaListView(ListAPIView):
+RE_TERMINO_RUT = re.compile(r"^\s*\d[\d.\s-]*[kK]?\s*$")
+
+
+def buscar_usuarios(queryset, texto):
+    """
+    Filtra por prefijo de RUT, nombre, apellido o correo usando las columnas normalizadas.
+    Se usa istartswith porque en MySQL se traduce a LIKE 'x%' (usa el indice); las
+    columnas ya estan en minusculas.
+    """
+    termino = normalizar_texto(texto)
+    if not termino:
+        return queryset
+    condicion = (
+        Q(trabajador__nombre_busqueda__istartswith=termino)
+        | Q(trabajador__apellido_busqueda__istartswith=termino)
+        | Q(email_normalizado__istartswith=termino)
+    )
+    if RE_TERMINO_RUT.match(texto):
+        condicion |= Q(rut_normalizado__istartswith=normalizar_rut(texto))
+    return queryset.filter(condicion)
+
+
+class DirectorioUsuariosView(ListAPIView):
+    """
+    Directorio de usuarios de las empresas autorizadas, paginado por cursor sobre id.
+    Parametros opcionales: q (RUT, nombre, apellido o correo), empresa_id y rol.
+    """
+
     permission_classes = [IsAuthenticated]
+    serializer_class = UsuarioListSerializer
+    pagination_class = IdKeysetPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        allowed = empresas_autorizadas_ids(self.request.user, roles=ROLES_CON_EMPRESAS.union({"trabajador"}))
+        if params.get("empresa_id"):
+            try:
+                empresa_id = int(params["empresa_id"])
+            except ValueError:
+                raise ValidationError({"empresa_id": "Debe ser un numero."})
+            allowed = [empresa_id] if empresa_id in allowed else []
+        if not allowed:
+            return Usuario.objects.none()
+
+        qs = Usuario.objects.filter(
+            Exists(EmpresaUsuario.objects.filter(usuario_id=OuterRef("pk"), empresa_id__in=allowed))
+        )
+        if params.get("rol"):
+            qs = qs.filter(rol=params["rol"])
+        qs = buscar_usuarios(qs, params.get("q", ""))
+        return qs.select_related("trabajador").prefetch_related("empresas_usuario__empresa")
+
+
+class EmpresaListView(ReferenciaCacheadaMixin, ListAPIView):
+    permission_classes = [IsAuthenticated]
+    recursos_version = ("empresas",)
+    filtra_por_empresa = False
+    tipo_referencia = "empresas"
     serializer_class = EmpresaSerializer
 
     def get_queryset(self):
@@ -595,8 +1138,11 @@ class EmpresaListView(ListAPIView):
         return Empresa.objects.filter(id__in=allowed) if allowed else Empresa.objects.none()
 
 
-class EmpresaAsignadaListView(ListAPIView):
+class EmpresaAsignadaListView(ReferenciaCacheadaMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
+    recursos_version = ("empresas",)
+    filtra_por_empresa = False
+    tipo_referencia = "empresas"
     serializer_class = EmpresaSerializer
 
     def get_queryset(self):
@@ -604,8 +1150,10 @@ class EmpresaAsignadaListView(ListAPIView):
         return Empresa.objects.filter(id__in=allowed)
 
 
-class TurnoPorEmpresaView(ListAPIView):
+class TurnoPorEmpresaView(ReferenciaCacheadaMixin, ListAPIView):
     permission_classes = [TieneAccesoEmpresaPermission]
+    recursos_version = ("turnos",)
+    tipo_referencia = "turnos"
     roles_empresa = ROLES_CON_EMPRESAS
     serializer_class = TurnoSerializer
 
@@ -617,21 +1165,287 @@ class TurnoPorEmpresaView(ListAPIView):
 
 
 class AuditoriaListView(ListAPIView):
+    """
+    Auditoria de las empresas del usuario, paginada por cursor sobre (fecha, id).
+    Filtros opcionales: empresa_id, accion, modelo_afectado, usuario_id, desde y hasta.
+    """
+
     permission_classes = [IsAuthenticated]
     serializer_class = AuditoriaSerializer
+    pagination_class = AuditoriaPagination
 
     def get_queryset(self):
-        user = self.request.user
-        if user.rol not in {"fiscalizador", "admin_rrhh"}:
-            return AuditoriaCambio.objects.none()
+        return auditoria_autorizada(self.request.user, self.request.query_params).select_related(
+            "usuario", "empresa"
+        )
 
-        empresa_id = self.request.query_params.get("empresa_id")
-        allowed = empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS)
-        qs = AuditoriaCambio.objects.select_related("usuario", "empresa").order_by("-fecha")
-        if allowed:
-            qs = qs.filter(empresa_id__in=allowed)
+
+class ExportarAuditoriaView(APIView):
+    """Exporta la auditoria en CSV o XLSX (streaming), con los mismos filtros que el listado."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        formato = request.query_params.get("formato", "csv")
+        if formato not in ExportarAsistenciasView.formatos:
+            return Response({"detail": "formato debe ser 'csv' o 'xlsx'."}, status=400)
+
+        qs = auditoria_autorizada(request.user, request.query_params)
+        encabezados = [nombre for nombre, _ in COLUMNAS_AUDITORIA]
+        filas = iterar_por_bloques(qs, [campo for _, campo in COLUMNAS_AUDITORIA], campo_orden="fecha")
+
+        content_type, generador = ExportarAsistenciasView.formatos[formato]
+        if formato == "xlsx":
+            contenido = generador(encabezados, filas, hoja="Auditoria")
         else:
-            qs = qs.none()
-        if empresa_id:
-            qs = qs.filter(empresa_id=empresa_id)
-        return qs
+            contenido = generador(encabezados, filas)
+        response = StreamingHttpResponse(contenido, content_type=content_type)
+        nombre = f"auditoria_{timezone.localdate():%Y%m%d}.{formato}"
+        response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return response
+
+
+class ReporteJobView(APIView):
+    """
+    Encola reportes pesados (libro de asistencia en PDF por trabajador).
+    Los procesa el comando procesar_reportes; el cliente consulta el estado por id.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk=None):
+        if pk is None:
+            qs = ReporteJob.objects.filter(solicitado_por_id=request.user.id).order_by("-creado_en")[:50]
+            return Response(ReporteJobSerializer(qs, many=True, context={"request": request}).data)
+
+        try:
+            job = ReporteJob.objects.get(id=pk)
+        except ReporteJob.DoesNotExist:
+            return Response({"detail": "Reporte no encontrado"}, status=404)
+        if not request.user.tiene_acceso_empresa(job.empresa_id, roles=ROLES_CON_EMPRESAS):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+        return Response(ReporteJobSerializer(job, context={"request": request}).data)
+
+    def post(self, request, pk=None):
+        serializer = ReporteJobSerializer(data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        empresa_id = serializer.validated_data["empresa_id"]
+        if not request.user.tiene_acceso_empresa(empresa_id, roles=ROLES_CON_EMPRESAS):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+
+        job = serializer.save(solicitado_por_id=request.user.id)
+        return Response(ReporteJobSerializer(job, context={"request": request}).data, status=202)
+
+
+class ReporteArchivoView(DescargaArchivoView):
+    """Archivo de un reporte completado, para RRHH/fiscalizador de la empresa."""
+
+    nombre_ruta = "reporte_archivo"
+
+    def obtener(self, pk):
+        return (
+            ReporteJob.objects.filter(pk=pk, estado="completado")
+            .exclude(archivo="")
+            .exclude(archivo__isnull=True)
+            .values("archivo", "empresa_id")
+            .first()
+        )
+
+    def autorizado(self, user, fila):
+        return user.tiene_acceso_empresa(fila["empresa_id"], roles=ROLES_CON_EMPRESAS)
+
+    def servir(self, request, pk, fila):
+        return descargas.servir_archivo(
+            request, fila["archivo"], tipo_contenido=mimetypes.guess_type(fila["archivo"])[0], adjunto=True
+        )
+
+
+class VerificacionMarcasView(APIView):
+    """
+    Verificacion de integridad de las marcas de una empresa, para fiscalizador o admin_rrhh.
+    POST la encola (la procesa `verify_marcas --pendientes`); GET por id devuelve el avance
+    y las marcas cuyo hash no coincide.
+    """
+
+    permission_classes = [IsAuthenticated]
+    limite_discrepancias = 1000
+    floats_en_respuesta = True  # avance
+
+    def get(self, request, pk=None):
+        if request.user.rol not in ROLES_AUDITORIA:
+            return Response({"detail": "No autorizado"}, status=403)
+        if pk is None:
+            allowed = empresas_autorizadas_ids(request.user, roles=ROLES_CON_EMPRESAS)
+            qs = VerificacionMarcas.objects.filter(empresa_id__in=allowed).order_by("-creado_en")[:50]
+            return Response(VerificacionMarcasSerializer(qs, many=True).data)
+
+        try:
+            verificacion = VerificacionMarcas.objects.get(id=pk)
+        except VerificacionMarcas.DoesNotExist:
+            return Response({"detail": "Verificacion no encontrada"}, status=404)
+        if not request.user.tiene_acceso_empresa(verificacion.empresa_id, roles=ROLES_CON_EMPRESAS):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+
+        data = VerificacionMarcasSerializer(verificacion).data
+        data["detalle"] = list(
+            verificacion.detalle_discrepancias.order_by("marca_id").values(
+                "marca_id", "hash_guardado", "hash_calculado"
+            )[: self.limite_discrepancias]
+        )
+        return Response(data)
+
+    def post(self, request, pk=None):
+        if request.user.rol not in ROLES_AUDITORIA:
+            return Response({"detail": "No autorizado"}, status=403)
+        serializer = VerificacionMarcasSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        empresa_id = serializer.validated_data["empresa_id"]
+        if not request.user.tiene_acceso_empresa(empresa_id, roles=ROLES_CON_EMPRESAS):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+        # Una corrida abandonada vuelve a la cola y se reanuda desde su punto de control.
+        VerificacionMarcas.objects.filter(verificaciones_abandonadas(), empresa_id=empresa_id).update(
+            estado="pendiente"
+        )
+        en_curso = VerificacionMarcas.objects.filter(
+            empresa_id=empresa_id, estado__in=["pendiente", "procesando"]
+        ).first()
+        if en_curso is not None:
+            return Response(VerificacionMarcasSerializer(en_curso).data, status=409)
+
+        verificacion = serializer.save(solicitado_por_id=request.user.id)
+        return Response(VerificacionMarcasSerializer(verificacion).data, status=202)
+
+
+class PruebaInclusionMarcaView(APIView):
+    """
+    Prueba de inclusion de una marca en la raiz de Merkle de su empresa y dia, para su
+    trabajador o RRHH/fiscalizador de la empresa. `coincide` indica si el arbol actual
+    sigue dando la raiz publicada. La marca puede estar en la tabla o archivada.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        fila = (
+            Marcas.objects.filter(pk=pk, trabajador__isnull=False)
+            .values("id", "timestamp", "trabajador_id", "empresa_id")
+            .first()
+        ) or self.archivada(request.user, pk)
+        if fila is None:
+            return Response({"detail": "Marca no encontrada"}, status=404)
+        user = request.user
+        if user.rol == "trabajador":
+            if fila["trabajador_id"] != user.trabajador_id:
+                return Response({"detail": "No autorizado"}, status=403)
+        elif not user.tiene_acceso_empresa(fila["empresa_id"], roles=ROLES_CON_EMPRESAS):
+            return Response({"detail": "Empresa no autorizada"}, status=403)
+
+        empresa_id = fila["empresa_id"]
+        fecha = timezone.localdate(fila["timestamp"])
+        publicada = RaizMerkle.objects.filter(empresa_id=empresa_id, fecha=fecha).first()
+        if publicada is None:
+            return Response({"detail": "La raiz de ese dia aun no se calcula."}, status=404)
+
+        datos = merkle.prueba_inclusion(fila["id"], empresa_id, fecha)
+        if datos is None:
+            return Response({"detail": "Marca no encontrada"}, status=404)
+        return Response(
+            {
+                "marca_id": fila["id"],
+                "empresa_id": empresa_id,
+                "fecha": fecha,
+                **datos,
+                "raiz_publicada": publicada.raiz,
+                "hojas_publicadas": publicada.hojas,
+                "estado": publicada.estado,
+                "coincide": datos["raiz"] == publicada.raiz,
+            }
+        )
+
+    def archivada(self, user, pk):
+        """La marca archivada con ese id, buscada solo en los periodos que el usuario puede ver."""
+        if user.rol == "trabajador":
+            if not user.trabajador_id:
+                return None
+            filtro = archivo_marcas.Filtro(trabajador_id=user.trabajador_id)
+        else:
+            filtro = archivo_marcas.Filtro(empresas=empresas_autorizadas_ids(user, roles=ROLES_CON_EMPRESAS))
+        encontrada = archivo_marcas.buscar(pk, filtro)
+        if encontrada is None or encontrada[1][2] is None:
+            return None
+        empresa_id, (marca_id, timestamp, trabajador_id, _, _) = encontrada
+        return {"id": marca_id, "timestamp": timestamp, "trabajador_id": trabajador_id, "empresa_id": empresa_id}
+
+
+class RaicesMerkleView(APIView):
+    """Raices de Merkle publicadas de la empresa; filtros opcionales desde y hasta (YYYY-MM-DD)."""
+
+    permission_classes = [TieneAccesoEmpresaPermission]
+    roles_empresa = ROLES_CON_EMPRESAS
+
+    def get(self, request, empresa_id):
+        desde, hasta = rango_fechas_params(request.query_params)
+        qs = RaizMerkle.objects.filter(empresa_id=empresa_id).order_by("-fecha")
+        if desde:
+            qs = qs.filter(fecha__gte=desde)
+        if hasta:
+            qs = qs.filter(fecha__lte=hasta)
+        campos = ("fecha", "raiz", "hojas", "estado", "raiz_recalculada", "hojas_recalculadas", "verificada_en")
+        return Response(list(qs.values(*campos)[:366]))
+
+
+class CierrePeriodoView(APIView):
+    """
+    Metricas de cierre (horas trabajadas, atrasos, salidas anticipadas y horas extra)
+    de todos los trabajadores de la empresa. Por defecto, el mes en curso; como maximo
+    `dias_maximos` dias, porque el calculo carga todas las marcas del rango en memoria.
+    """
+
+    permission_classes = [TieneAccesoEmpresaPermission]
+    roles_empresa = ROLES_CON_EMPRESAS
+    dias_maximos = 31
+    floats_en_respuesta = True  # horas_trabajadas
+
+    def get(self, request, empresa_id):
+        desde, hasta = rango_fechas_params(request.query_params)
+        hoy = timezone.localdate()
+        desde = desde or hoy.replace(day=1)
+        hasta = hasta or hoy
+        if hasta < desde:
+            return Response({"detail": "El rango de fechas es invalido."}, status=400)
+        if (hasta - desde).days >= self.dias_maximos:
+            return Response({"detail": f"El rango no puede superar {self.dias_maximos} dias."}, status=400)
+
+        trabajadores = calcular_periodo(int(empresa_id), desde, hasta)
+        return Response({"desde": desde, "hasta": hasta, "trabajadores": trabajadores})
+
+
+class NominaEmpresaView(APIView):
+    """
+    Nomina liviana de la empresa: identidad, turno y estado del dia de cada trabajador
+    (presente, atrasado, ausente, licencia o vacaciones). Parametros opcionales:
+    fecha (YYYY-MM-DD, por defecto hoy) y estado_dia para filtrar.
+    """
+
+    permission_classes = [TieneAccesoEmpresaPermission]
+    roles_empresa = ROLES_CON_EMPRESAS
+
+    def get(self, request, empresa_id):
+        fecha = timezone.localdate()
+        if request.query_params.get("fecha"):
+            fecha = leer_fecha(request.query_params["fecha"])
+            if fecha is None:
+                return Response({"detail": "fecha debe tener formato YYYY-MM-DD."}, status=400)
+
+        filtro = request.query_params.get("estado_dia")
+        if filtro and filtro not in ESTADOS_DIA:
+            return Response({"detail": f"estado_dia debe ser uno de: {', '.join(ESTADOS_DIA)}."}, status=400)
+
+        trabajadores = nomina_empresa(int(empresa_id), fecha)
+        if filtro:
+            trabajadores = [t for t in trabajadores if t["estado_dia"] == filtro]
+        return Response({"fecha": fecha, "trabajadores": trabajadores})
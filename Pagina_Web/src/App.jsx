@@ -121,7 +121,7 @@ export default function App() {
       case "vacaciones":
         return <Vacaciones user={user} empresaId={empresaId} />;
       case "reportes":
-        return <Reportes />;
+        return <Reportes empresaId={empresaId} />;
       case "auditoria":
         return <Auditoria user={user} empresaId={empresaId} empresas={empresas} />;
       case "usuarios":
@@ -8,47 +8,49 @@ export default function Asistencias({ onVerPerfil, empresaId }) {
   const [filterFecha, setFilterFecha] = useState("");
   const [filterTipo, setFilterTipo] = useState("");
   const [loading, setLoading] = useState(true);
+  const [nextUrl, setNextUrl] = useState(null);
 
-  useEffect(() => {
-    const fetchAsistencias = async () => {
-      try {
-        const token = localStorage.getItem("accessToken");
-        const url = new URL(`${API_URL}/asistencias/`);
-        if (empresaId) url.searchParams.append("empresa_id", empresaId);
-
-        const res = await fetch(url.toString(), {
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "application/json",
-          },
-        });
+  const fetchAsistencias = async (pageUrl = null) => {
+    try {
+      const token = localStorage.getItem("accessToken");
+      const url = new URL(pageUrl || `${API_URL}/asistencias/`);
+      if (!pageUrl && empresaId) url.searchParams.append("empresa_id", empresaId);
 
-        if (!res.ok) {
-          setLoading(false);
-          return;
-        }
+      const res = await fetch(url.toString(), {
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+        },
+      });
 
-        const json = await res.json();
-        const mapped = json.map((m) => {
-          const dt = new Date(m.timestamp);
-          return {
-            id: m.id,
-            trabajadorId: m.trabajador_id,
-            trabajador: `${m.trabajador_nombre} ${m.trabajador_apellido}`,
-            fecha: dt.toISOString().slice(0, 10),
-            hora: dt.toTimeString().slice(0, 5),
-            tipo: m.tipo_marca === "entrada" ? "Entrada" : "Salida",
-            modificada_por: "-",
-          };
-        });
-        setData(mapped);
-      } catch (err) {
-        // ignore
-      } finally {
+      if (!res.ok) {
         setLoading(false);
+        return;
       }
-    };
 
+      const json = await res.json();
+      const mapped = json.results.map((m) => {
+        const dt = new Date(m.timestamp);
+        return {
+          id: m.id,
+          trabajadorId: m.trabajador_id,
+          trabajador: `${m.trabajador_nombre} ${m.trabajador_apellido}`,
+          fecha: dt.toISOString().slice(0, 10),
+          hora: dt.toTimeString().slice(0, 5),
+          tipo: m.tipo_marca === "entrada" ? "Entrada" : "Salida",
+          modificada_por: "-",
+        };
+      });
+      setData((prev) => (pageUrl ? [...prev, ...mapped] : mapped));
+      setNextUrl(json.next);
+    } catch (err) {
+      // ignore
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
     fetchAsistencias();
   }, [empresaId]);
 
@@ -198,6 +200,13 @@ export default function Asistencias({ onVerPerfil, empresaId }) {
             </tbody>
           </table>
         </div>
+        {nextUrl && (
+          <div className="load-more">
+            <button className="btn-profile" onClick={() => fetchAsistencias(nextUrl)}>
+              Cargar mas
+            </button>
+          </div>
+        )}
       </div>
 
       <style>{`
@@ -220,6 +229,7 @@ export default function Asistencias({ onVerPerfil, empresaId }) {
         .tipo-salida { color:#dc2626; font-weight:500; }
         .btn-profile { padding:0.5rem 1rem; border:none; border-radius:0.5rem; background:#3b82f6; color:white; cursor:pointer; font-weight:500; }
         .btn-profile:hover { background:#2563eb; }
+        .load-more { text-align:center; margin-top:1.5rem; }
         .no-results { text-align:center; padding:2rem; color:#6b7280; font-size:1.125rem; }
       `}</style>
     </>
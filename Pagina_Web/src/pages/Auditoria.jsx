@@ -4,77 +4,135 @@ const API_URL = "http://192.168.1.50:8000/api";
 
 export default function Auditoria({ user, empresaId, empresas = [] }) {
   const [cambios, setCambios] = useState([]);
+  const [nextUrl, setNextUrl] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [filtros, setFiltros] = useState({ accion: "", modelo_afectado: "", desde: "", hasta: "" });
+  const [descargando, setDescargando] = useState(false);
 
-  useEffect(() => {
-    const fetchAuditoria = async () => {
-      try {
-        const token = localStorage.getItem("accessToken");
-        const url = new URL(`${API_URL}/auditoria/`);
-        if (empresaId) url.searchParams.append("empresa_id", empresaId);
-        const res = await fetch(url.toString(), {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) {
-          setLoading(false);
-          return;
-        }
-        const data = await res.json();
-        setCambios(data);
-      } catch (e) {
-        // ignore
-      } finally {
-        setLoading(false);
+  const construirUrl = (ruta) => {
+    const url = new URL(`${API_URL}/${ruta}`);
+    if (empresaId) url.searchParams.append("empresa_id", empresaId);
+    Object.entries(filtros).forEach(([clave, valor]) => {
+      if (valor) url.searchParams.append(clave, valor);
+    });
+    return url;
+  };
+
+  const fetchAuditoria = async (pagina = null) => {
+    try {
+      const token = localStorage.getItem("accessToken");
+      const res = await fetch(pagina || construirUrl("auditoria/").toString(), {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) {
+        return;
       }
-    };
+      const data = await res.json();
+      setCambios((prev) => (pagina ? [...prev, ...data.results] : data.results));
+      setNextUrl(data.next);
+    } catch (e) {
+      // ignore
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    setLoading(true);
     fetchAuditoria();
-  }, [empresaId]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [empresaId, filtros]);
 
-  if (loading) {
-    return (
-      <div className="card">
-        <h2>Registro de Auditoria</h2>
-        <p>Cargando...</p>
-      </div>
-    );
-  }
+  const exportar = async (formato) => {
+    const url = construirUrl("auditoria/exportar/");
+    url.searchParams.append("formato", formato);
+    setDescargando(true);
+    try {
+      const token = localStorage.getItem("accessToken");
+      const res = await fetch(url.toString(), {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) {
+        return;
+      }
+      const blob = await res.blob();
+      const link = document.createElement("a");
+      link.href = URL.createObjectURL(blob);
+      link.setAttribute("download", `auditoria.${formato}`);
+      link.click();
+      URL.revokeObjectURL(link.href);
+    } finally {
+      setDescargando(false);
+    }
+  };
+
+  const cambiarFiltro = (e) => {
+    const { name, value } = e.target;
+    setFiltros((prev) => ({ ...prev, [name]: value }));
+  };
 
   return (
     <div className="card">
       <h2>Registro de Auditoria</h2>
-      <table className="table">
-        <thead>
-          <tr>
-            <th>Usuario</th>
-            <th>Accion</th>
-            <th>Empresa</th>
-            <th>Modelo</th>
-            <th>Registro</th>
-            <th>Fecha</th>
-            <th>Motivo</th>
-          </tr>
-        </thead>
-        <tbody>
-          {cambios.map((c) => (
-            <tr key={c.id}>
-              <td>{c.usuario_rut || c.usuario_email}</td>
-              <td>{c.accion}</td>
-              <td>{c.empresa_nombre || "-"}</td>
-              <td>{c.modelo_afectado}</td>
-              <td>{c.registro_id}</td>
-              <td>{c.fecha}</td>
-              <td>{c.motivo || "-"}</td>
-            </tr>
-          ))}
-          {cambios.length === 0 && (
+      <div className="filters" style={{ display: "flex", gap: 8, flexWrap: "wrap", marginBottom: 12 }}>
+        <input name="accion" placeholder="Accion" value={filtros.accion} onChange={cambiarFiltro} />
+        <input
+          name="modelo_afectado"
+          placeholder="Modelo"
+          value={filtros.modelo_afectado}
+          onChange={cambiarFiltro}
+        />
+        <input name="desde" type="date" value={filtros.desde} onChange={cambiarFiltro} />
+        <input name="hasta" type="date" value={filtros.hasta} onChange={cambiarFiltro} />
+        <button className="btn" disabled={descargando} onClick={() => exportar("csv")}>
+          Exportar CSV
+        </button>
+        <button className="btn" disabled={descargando} onClick={() => exportar("xlsx")}>
+          Exportar Excel
+        </button>
+      </div>
+      {loading ? (
+        <p>Cargando...</p>
+      ) : (
+        <table className="table">
+          <thead>
             <tr>
-              <td colSpan="7" style={{ textAlign: "center", padding: "1rem" }}>
-                No hay eventos para mostrar.
-              </td>
+              <th>Usuario</th>
+              <th>Accion</th>
+              <th>Empresa</th>
+              <th>Modelo</th>
+              <th>Registro</th>
+              <th>Fecha</th>
+              <th>Motivo</th>
             </tr>
-          )}
-        </tbody>
-      </table>
+          </thead>
+          <tbody>
+            {cambios.map((c) => (
+              <tr key={c.id}>
+                <td>{c.usuario_rut || c.usuario_email}</td>
+                <td>{c.accion}</td>
+                <td>{c.empresa_nombre || "-"}</td>
+                <td>{c.modelo_afectado}</td>
+                <td>{c.registro_id}</td>
+                <td>{c.fecha}</td>
+                <td>{c.motivo || "-"}</td>
+              </tr>
+            ))}
+            {cambios.length === 0 && (
+              <tr>
+                <td colSpan="7" style={{ textAlign: "center", padding: "1rem" }}>
+                  No hay eventos para mostrar.
+                </td>
+              </tr>
+            )}
+          </tbody>
+        </table>
+      )}
+      {nextUrl && (
+        <button className="btn" onClick={() => fetchAuditoria(nextUrl)}>
+          Cargar mas
+        </button>
+      )}
     </div>
   );
 }
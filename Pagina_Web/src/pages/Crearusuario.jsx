@@ -8,6 +8,8 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
   const [usuarios, setUsuarios] = useState([]);
   const [empresaListadoId, setEmpresaListadoId] = useState(empresaId || "");
   const [loadingUsuarios, setLoadingUsuarios] = useState(false);
+  const [busqueda, setBusqueda] = useState("");
+  const [usuariosNext, setUsuariosNext] = useState(null);
 
   const [form, setForm] = useState({
     rut: "",
@@ -68,31 +70,35 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
       .catch(() => setError("Error al cargar turnos."));
   };
 
-  // cargar usuarios por empresa
-  const fetchUsuarios = async (empId) => {
+  // buscar usuarios (directorio paginado; la busqueda se hace en el servidor)
+  const fetchUsuarios = async (empId, q = busqueda, url = null) => {
     setLoadingUsuarios(true);
     try {
-      const res = await fetch(`${API_URL}/usuarios/?empresa_id=${empId || ""}`, {
+      const params = new URLSearchParams();
+      if (empId) params.set("empresa_id", empId);
+      if (q) params.set("q", q);
+      const res = await fetch(url || `${API_URL}/usuarios/directorio/?${params.toString()}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (!res.ok) {
-        setUsuarios([]);
+        if (!url) setUsuarios([]);
         return;
       }
       const data = await res.json();
-      setUsuarios(data);
+      setUsuarios((prev) => (url ? [...prev, ...data.results] : data.results));
+      setUsuariosNext(data.next);
     } catch (e) {
-      setUsuarios([]);
+      if (!url) setUsuarios([]);
     } finally {
       setLoadingUsuarios(false);
     }
   };
 
   useEffect(() => {
-    if (empresaListadoId) {
-      fetchUsuarios(empresaListadoId);
-    }
-  }, [empresaListadoId]);
+    const timer = setTimeout(() => fetchUsuarios(empresaListadoId, busqueda), 300);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [empresaListadoId, busqueda]);
 
   const handleChange = (e) => {
     const { name, value } = e.target;
@@ -133,9 +139,7 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
         empresa_id: empresaId ? String(empresaId) : "",
         turno_id: "",
       });
-      if (empresaListadoId) {
-        fetchUsuarios(empresaListadoId);
-      }
+      fetchUsuarios(empresaListadoId);
     } catch (err) {
       setError("Error de conexión con el servidor.");
     } finally {
@@ -174,10 +178,20 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
                 ))}
               </select>
             </div>
+            <div className="form-group">
+              <label className="form-label">Buscar</label>
+              <input
+                type="text"
+                className="form-input"
+                placeholder="RUT, nombre o correo"
+                value={busqueda}
+                onChange={(e) => setBusqueda(e.target.value)}
+              />
+            </div>
           </div>
 
           <div style={{ marginTop: 12 }}>
-            {loadingUsuarios ? (
+            {loadingUsuarios && usuarios.length === 0 ? (
               <p>Cargando usuarios...</p>
             ) : (
               <table className="table" style={{ fontSize: 13 }}>
@@ -194,7 +208,7 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
                 <tbody>
                   {usuarios.length === 0 && (
                     <tr>
-                      <td colSpan={6}>No hay usuarios para esta empresa.</td>
+                      <td colSpan={6}>No hay usuarios que coincidan.</td>
                     </tr>
                   )}
                   {usuarios.map((u) => (
@@ -220,6 +234,15 @@ export default function CrearUsuario({ onVerPerfil, empresaId, empresas: empresa
                 </tbody>
               </table>
             )}
+            {usuariosNext && (
+              <button
+                className="btn"
+                disabled={loadingUsuarios}
+                onClick={() => fetchUsuarios(empresaListadoId, busqueda, usuariosNext)}
+              >
+                Cargar mas
+              </button>
+            )}
           </div>
         </div>
 
@@ -169,8 +169,8 @@ export default function Licencias({ user, empresaId }) {
                   <td>{l.fecha_inicio}</td>
                   <td>{l.fecha_fin}</td>
                   <td>
-                    {l.archivo ? (
-                      <a href={`${API}${l.archivo}`} target="_blank" rel="noreferrer" className="link-pdf">
+                    {l.archivo_url ? (
+                      <a href={l.archivo_url} target="_blank" rel="noreferrer" className="link-pdf">
                         <svg className="link-icon" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                           <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M12 10v6m0 0l-3-3m3 3l3-3m2 8H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" />
                         </svg>
@@ -18,6 +18,8 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
   const [error, setError] = useState("");
   const [message, setMessage] = useState("");
   const [editMode, setEditMode] = useState(false);
+  const [historial, setHistorial] = useState(null);
+  const [historialNext, setHistorialNext] = useState(null);
 
   const canEdit = ["admin_rrhh", "asistente_rrhh"].includes(user?.role);
 
@@ -44,6 +46,8 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
 
       const data = await res.json();
       setPerfil(data);
+      setHistorial(null);
+      setHistorialNext(null);
       setForm({
         nombres: data.nombres || "",
         apellidos: data.apellidos || "",
@@ -70,6 +74,27 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [trabajadorId]);
 
+  const cargarHistorial = async (url) => {
+    try {
+      const token = localStorage.getItem("accessToken");
+      const res = await fetch(url || `${API_URL}/trabajadores/${trabajadorId}/marcas/`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+        },
+      });
+      if (!res.ok) {
+        setError("No se pudo cargar el historial de marcaciones");
+        return;
+      }
+      const json = await res.json();
+      setHistorial((prev) => (url && prev ? [...prev, ...json.results] : json.results));
+      setHistorialNext(json.next);
+    } catch (e) {
+      setError("Error de conexión con el servidor");
+    }
+  };
+
   const handleChange = (e) => {
     const { name, value } = e.target;
     setForm((prev) => ({ ...prev, [name]: value }));
@@ -149,6 +174,7 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
   }
 
   const nombreCompleto = `${perfil.nombres} ${perfil.apellidos}`;
+  const marcas = historial || perfil.marcas || [];
 
   return (
     <div className="card">
@@ -294,8 +320,22 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
         <p><strong>Empresa actual:</strong> {perfil.empresa_nombre || "-"}</p>
       </div>
 
-      <h3 style={{ marginTop: 24 }}>Historial de marcaciones</h3>
-      {perfil.marcas && perfil.marcas.length > 0 ? (
+      {perfil.resumen_mes && (
+        <div style={{ marginTop: 16 }}>
+          <h3>Resumen del mes</h3>
+          <p><strong>Días trabajados:</strong> {perfil.resumen_mes.dias_trabajados}</p>
+          <p><strong>Horas trabajadas:</strong> {perfil.resumen_mes.horas_trabajadas}</p>
+          <p>
+            <strong>Atrasos:</strong> {perfil.resumen_mes.atrasos} ({perfil.resumen_mes.minutos_atraso} min)
+          </p>
+          <p><strong>Minutos extra:</strong> {perfil.resumen_mes.minutos_extra}</p>
+        </div>
+      )}
+
+      <h3 style={{ marginTop: 24 }}>
+        {historial ? "Historial de marcaciones" : "Últimas marcaciones"}
+      </h3>
+      {marcas.length > 0 ? (
         <table className="table">
           <thead>
             <tr>
@@ -305,7 +345,7 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
             </tr>
           </thead>
           <tbody>
-            {perfil.marcas.map((m) => {
+            {marcas.map((m) => {
               const dt = new Date(m.timestamp);
               const fecha = dt.toISOString().slice(0, 10);
               const hora = dt.toTimeString().slice(0, 5);
@@ -323,6 +363,16 @@ export default function PerfilTrabajador({ trabajadorId, user, empresas = [] })
       ) : (
         <p>No hay marcaciones registradas.</p>
       )}
+      {!historial && marcas.length > 0 && (
+        <button className="btn-profile" onClick={() => cargarHistorial()}>
+          Ver historial completo
+        </button>
+      )}
+      {historial && historialNext && (
+        <button className="btn-profile" onClick={() => cargarHistorial(historialNext)}>
+          Cargar mas
+        </button>
+      )}
     </div>
   );
 }
@@ -1,8 +1,74 @@
-import React from "react";
+import React, { useState } from "react";
 
-export default function Reportes() {
-  const handleExport = (type) => {
-    alert(`Mock: exportando reporte en formato ${type}`);
+const API_URL = "http://192.168.1.50:8000/api";
+
+export default function Reportes({ empresaId }) {
+  const [desde, setDesde] = useState("");
+  const [hasta, setHasta] = useState("");
+  const [descargando, setDescargando] = useState(false);
+
+  const headers = () => ({
+    Authorization: `Bearer ${localStorage.getItem("accessToken")}`,
+    "Content-Type": "application/json",
+  });
+
+  const solicitarLibroPdf = async () => {
+    if (!empresaId) return alert("Selecciona una empresa.");
+    const hoy = new Date();
+    const res = await fetch(`${API_URL}/reportes/`, {
+      method: "POST",
+      headers: headers(),
+      body: JSON.stringify({ empresa_id: empresaId, anio: hoy.getFullYear(), mes: hoy.getMonth() + 1 }),
+    });
+    if (!res.ok) return alert("No se pudo solicitar el reporte.");
+    const job = await res.json();
+    setDescargando(true);
+
+    const consultar = async () => {
+      const estadoRes = await fetch(`${API_URL}/reportes/${job.id}/`, { headers: headers() });
+      const estado = await estadoRes.json();
+      if (estado.estado === "completado") {
+        setDescargando(false);
+        window.open(estado.archivo_url, "_blank");
+      } else if (estado.estado === "error") {
+        setDescargando(false);
+        alert(`El reporte fallo: ${estado.error}`);
+      } else {
+        setTimeout(consultar, 3000);
+      }
+    };
+    setTimeout(consultar, 3000);
+  };
+
+  const handleExport = async (formato) => {
+    if (formato === "pdf") {
+      await solicitarLibroPdf();
+      return;
+    }
+    const url = new URL(`${API_URL}/asistencias/exportar/`);
+    url.searchParams.append("formato", formato);
+    if (empresaId) url.searchParams.append("empresa_id", empresaId);
+    if (desde) url.searchParams.append("desde", desde);
+    if (hasta) url.searchParams.append("hasta", hasta);
+
+    setDescargando(true);
+    try {
+      const res = await fetch(url.toString(), {
+        headers: { Authorization: `Bearer ${localStorage.getItem("accessToken")}` },
+      });
+      if (!res.ok) {
+        alert("No se pudo generar la exportacion.");
+        return;
+      }
+      const blob = await res.blob();
+      const link = document.createElement("a");
+      link.href = URL.createObjectURL(blob);
+      link.setAttribute("download", `asistencias.${formato}`);
+      link.click();
+      URL.revokeObjectURL(link.href);
+    } finally {
+      setDescargando(false);
+    }
   };
 
   return (
@@ -10,8 +76,13 @@ export default function Reportes() {
       <h2>Reportes y Exportaciones</h2>
       <p style={{color:"#6b7280"}}>Genera reportes en PDF o Excel para fiscalización.</p>
       <div style={{marginTop:12, display:"flex", gap:10}}>
-        <button className="btn btn-primary" onClick={()=>handleExport("PDF")}>Exportar PDF</button>
-        <button className="btn" onClick={()=>handleExport("Excel")}>Exportar Excel</button>
+        <input type="date" value={desde} onChange={(e)=>setDesde(e.target.value)} />
+        <input type="date" value={hasta} onChange={(e)=>setHasta(e.target.value)} />
+      </div>
+      <div style={{marginTop:12, display:"flex", gap:10}}>
+        <button className="btn btn-primary" disabled={descargando} onClick={()=>handleExport("pdf")}>Exportar PDF</button>
+        <button className="btn" disabled={descargando} onClick={()=>handleExport("xlsx")}>Exportar Excel</button>
+        <button className="btn" disabled={descargando} onClick={()=>handleExport("csv")}>Exportar CSV</button>
       </div>
     </div>
   );